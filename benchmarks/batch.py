@@ -0,0 +1,53 @@
+"""Compare per-doc and columnar batch generation on the searchable_test preset
+
+Usage: python benchmarks/batch.py [COUNT]
+
+Both paths load the preset's own doc_generator and batch_generator, as a testbed
+does, and each generates and encodes the same COUNT docs (default 100000) into the
+NDJSON lines sent to _bulk. The best of three runs is reported.
+"""
+
+import sys
+import time
+from es_testbed.ingest import doc_lines, preset_generators
+
+RUNS: int = 3
+
+PRESET: str = "es_testbed.presets.searchable_test"
+"""The module path of the benchmarked preset"""
+
+
+def bench(count: int, batch: bool) -> float:
+    """Return the best time in seconds to generate and encode count docs"""
+    doc_generator, batch_generator = preset_generators(PRESET)
+    if batch and batch_generator is None:
+        raise SystemExit("NumPy is not installed. Install es-testbed[fast].")
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        lines = doc_lines(
+            doc_generator,
+            options={"count": count},
+            batch_generator=batch_generator if batch else None,
+        )
+        for _ in lines:
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Run the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    baseline = None
+    for name, batch in (("per-doc", False), ("batch", True)):
+        elapsed = bench(count, batch)
+        baseline = baseline or elapsed
+        print(
+            f"{name:>8}: {elapsed:.3f}s  {count / elapsed:>12,.0f} docs/s  "
+            f"x{baseline / elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
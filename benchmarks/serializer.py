@@ -0,0 +1,45 @@
+"""Compare document encoders on the searchable_test doc shape
+
+Usage: python benchmarks/serializer.py [COUNT]
+
+Each available encoder encodes the same COUNT docs (default 100000) from the
+searchable_test preset, including its nested ``deep.l1.l2.l3`` fields. The best
+of three runs is reported.
+"""
+
+import sys
+import time
+from es_testbed.ingest.serializer import get_encoder
+from es_testbed.presets.searchable_test.functions import doc_generator
+
+RUNS: int = 3
+
+
+def bench(name: str, docs: list) -> float:
+    """Return the best time in seconds for encoder name to encode every doc"""
+    encoder = get_encoder(name)
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for doc in docs:
+            encoder(doc)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Run the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    docs = list(doc_generator(count=count))
+    baseline = None
+    for name in ("json", "orjson"):
+        elapsed = bench(name, docs)
+        baseline = baseline or elapsed
+        print(
+            f"{name:>8}: {elapsed:.3f}s  {count / elapsed:>12,.0f} docs/s  "
+            f"x{baseline / elapsed:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
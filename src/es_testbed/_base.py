@@ -9,7 +9,9 @@ from .debug import debug, begin_end
 from .defaults import NAMEMAPPER
 from .es_api import delete, get
 from .exceptions import ResultNotExpected
+from .ingest import install_serializer, restore_serializer
 from .utils import prettystr, process_preset
+from .waits import HISTORY
 from ._plan import PlanBuilder
 from .mgrs import (
     ComponentMgr,
@@ -59,7 +61,15 @@ class TestBed:
         ref: t.Optional[str] = None,
         url: t.Optional[str] = None,
         scenario: t.Optional[str] = None,
+        serializer: t.Union[str, t.Callable[[t.Any], bytes], None] = None,
     ):
+        """
+        :param serializer: How documents are encoded: ``json``, ``orjson``,
+            ``preset`` (the ``serializer`` function in the preset's
+            ``functions.py``) or a callable returning a document as bytes.
+            Overrides the ``serializer`` of the preset's plan. ``orjson`` also
+            replaces the client's JSON serializers until :py:meth:`teardown`.
+        """
         debug.lv2("Initializing TestBed object...")
         #: The plan settings
         self.settings = None
@@ -87,11 +97,16 @@ class TestBed:
         if tmpdir:
             debug.lv5(f"Using tmpdir: {tmpdir}")
             self.settings["tmpdir"] = tmpdir
+        if serializer is not None:
+            debug.lv5(f"Using serializer: {serializer}")
+            self.settings["serializer"] = serializer
 
         #: The Elasticsearch client object
         self.client = client
         #: The test plan
         self.plan = None
+        #: The client serializers replaced during setup, restored at teardown
+        self.saved_serializers = {}
 
         # Set up for tracking
         #: The ILM entity manager
@@ -204,11 +219,13 @@ class TestBed:
         # If we build self.plan here, then we can modify settings before setup()
         self.plan = PlanBuilder(settings=self.settings).plan
         self.get_ilm_polling()
+        self.saved_serializers = install_serializer(self.client, self.plan.serializer)
         debug.lv5(f'Setting: {self.ilm_polling(interval="1s")}')
         self.client.cluster.put_settings(persistent=self.ilm_polling(interval="1s"))
         self.setup_entitymgrs()
         end = datetime.now(timezone.utc)
         debug.lv1(f"Testbed setup elapsed time: {(end - start).total_seconds()}")
+        logger.info(HISTORY.summary())
 
     @begin_end()
     def setup_entitymgrs(self) -> None:
@@ -226,10 +243,18 @@ class TestBed:
         self.snapshotmgr = SnapshotMgr(**kw)
         self.snapshotmgr.setup()
         if self.plan.type == "indices":
-            self.indexmgr = IndexMgr(**kw, snapmgr=self.snapshotmgr)
+            self.indexmgr = IndexMgr(
+                **kw,
+                snapmgr=self.snapshotmgr,
+                policy_cache=self.ilmmgr.policy_cache,
+            )
             self.indexmgr.setup()
         if self.plan.type == "data_stream":
-            self.data_streammgr = DataStreamMgr(**kw, snapmgr=self.snapshotmgr)
+            self.data_streammgr = DataStreamMgr(
+                **kw,
+                snapmgr=self.snapshotmgr,
+                policy_cache=self.ilmmgr.policy_cache,
+            )
             self.data_streammgr.setup()
 
     @begin_end()
@@ -249,6 +274,8 @@ class TestBed:
             f"{self.plan.ilm_polling_interval}"
         )
         self.client.cluster.put_settings(persistent=persist)
+        restore_serializer(self.client, self.saved_serializers)
+        self.saved_serializers = {}
         end = datetime.now(timezone.utc)
         debug.lv1(f"Testbed teardown elapsed time: {(end - start).total_seconds()}")
         if successful:
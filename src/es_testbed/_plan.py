@@ -47,6 +47,13 @@ class PlanBuilder:
                    'forcemerge': False,
                    'max_num_segments': 1,
                    'policy': {}           # Define full ILM policy in advance.
+                   'mount_concurrency': 4, # Indices moved to cold/frozen at once
+               },
+               'serializer': 'json',    # json, orjson, preset, or a callable
+               'infer_mappings': 0,     # Docs to sample per entry to infer mappings
+               'strict_mappings': False, # Set dynamic: strict in the mappings
+               'ingest': {              # Default ingest settings for every entry
+                   'bulk_profile': False, # Tune index settings while filling
                },
                'index_buildlist': [],   # List of indices to create
            }
@@ -62,7 +69,16 @@ class PlanBuilder:
                    'docs': 10,
                    'start_at': 0,
                    'match': True,
-                 }
+                   'pools': {'host': 50},  # Keyword fields with 50 distinct values.
+                 }                         # See ingest.ValuePool
+                 'ingest': {               # Optional _bulk settings for this entry
+                   'workers': 4,           # Threads sending _bulk requests
+                   'queue_depth': 8,       # Max chunks waiting for the workers
+                   'processes': 4,         # Generate docs in a process pool
+                   'target_store_size': None,  # Fill until primaries are this big,
+                 }                             # not count docs. See ingest.FillTarget
+                 'corpus': None,           # Optional file of docs to use instead of
+                                           # the generator. See ingest.Corpus
                  'target_tier': 'frozen'   # Target tier for 1st (oldest) index created
                },
                {
@@ -123,6 +139,7 @@ class PlanBuilder:
             "ilm_policies",
             "index_templates",
             "component_templates",
+            "ingest_stats",
         ]
         for name in names:
             self._plan[name] = []
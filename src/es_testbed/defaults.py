@@ -33,12 +33,141 @@ PAUSE_DEFAULT: str = "1.0"
 PAUSE_ENVVAR: str = "ES_TESTBED_PAUSE"
 """Environment variable for the pause time"""
 
+BULK_BACKOFF: float = 0.5
+"""Initial delay in seconds before retrying failed _bulk items"""
+
+BULK_BACKOFF_MAX: float = 30.0
+"""Longest delay in seconds before retrying a rejected _bulk request or items"""
+
+BULK_CHUNK_BYTES: int = 10 * 1024 * 1024
+"""Default maximum size in bytes of a single _bulk request body"""
+
+BULK_CHUNK_DOCS: int = 1000
+"""Default maximum number of documents in a single _bulk request"""
+
+BULK_MAX_RETRIES: int = 3
+"""Default number of times to retry _bulk items that failed with a retryable status"""
+
+BULK_MIN_CHUNK_DOCS: int = 10
+"""Smallest number of documents adaptive chunk sizing shrinks a _bulk request to"""
+
+BULK_PROFILE: t.Dict[str, t.Any] = {
+    "index.refresh_interval": "-1",
+    "index.number_of_replicas": 0,
+    "index.translog.durability": "async",
+}
+"""Index settings applied while filling an index when ``bulk_profile`` is enabled"""
+
+BULK_QUEUE_DEPTH: int = 4
+"""Default maximum number of chunks waiting to be sent by parallel _bulk workers"""
+
+BULK_RETRY_STATUS: t.Tuple[int, ...] = (429,)
+"""HTTP status codes of _bulk items that will be retried"""
+
+BULK_TARGET_LATENCY: float = 2.0
+"""Default latency in seconds a single _bulk request should stay under"""
+
+BULK_WORKERS: int = 1
+"""Default number of threads sending _bulk requests for a single index"""
+
+CACHE_DEFAULT: str = "~/.cache/es-testbed"
+"""Default directory of the on-disk generated corpus cache"""
+CACHE_ENVVAR: str = "ES_TESTBED_CACHE"
+"""Environment variable for the corpus cache directory"""
+
+CACHE_TIMESTAMP_FIELDS: t.Tuple[str, ...] = ("@timestamp",)
+"""Default timestamp fields shifted to the present when replaying a cached corpus"""
+
+CARDINALITY_PRECISION: int = 40000
+"""
+The ``precision_threshold`` of the cardinality aggregation that checks value pools,
+the highest Elasticsearch allows. Counts below it are expected to be exact.
+"""
+
+CARDINALITY_TOLERANCE: float = 0.02
+"""
+How far, as a share of the expected count, a cardinality above
+CARDINALITY_PRECISION may be off, as it is then approximated
+"""
+
+CORPUS_BATCH_ROWS: int = 10000
+"""Rows read at a time from a Parquet corpus file"""
+
+CORPUS_READ_BYTES: int = 1048576
+"""Bytes read at a time from a compressed corpus file (1 MiB)"""
+
+FILL_CONCURRENCY: int = 1
+"""
+Default number of non-rollover indices filled at the same time. Filling several at
+once is opt-in, with the plan-wide ``ingest`` setting ``concurrency``.
+"""
+
+GEN_BATCH_SIZE: int = 1000
+"""Default number of documents in each batch from a preset's batch_generator"""
+
+GEN_PARTITION_DOCS: int = 10000
+"""Default number of documents each generator process builds per task"""
+
+ILM_ACTIONS: t.Dict[str, t.Tuple[str, ...]] = {
+    "hot": (
+        "set_priority",
+        "unfollow",
+        "rollover",
+        "readonly",
+        "downsample",
+        "shrink",
+        "forcemerge",
+        "searchable_snapshot",
+    ),
+    "warm": (
+        "set_priority",
+        "unfollow",
+        "readonly",
+        "downsample",
+        "allocate",
+        "migrate",
+        "shrink",
+        "forcemerge",
+    ),
+    "cold": (
+        "set_priority",
+        "unfollow",
+        "readonly",
+        "downsample",
+        "searchable_snapshot",
+        "allocate",
+        "migrate",
+        "freeze",
+    ),
+    "frozen": ("unfollow", "searchable_snapshot"),
+    "delete": ("wait_for_snapshot", "delete"),
+}
+"""The order in which ILM runs the actions of each phase"""
+
+ILM_EXPLAIN_TTL: float = 2.0
+"""
+Seconds the ILM explain data shared by the IlmTracker of every index of a testbed is
+reused before it is fetched again
+"""
+
+ILM_PHASES: t.Tuple[str, ...] = ("new", "hot", "warm", "cold", "frozen", "delete")
+"""Every ILM phase, in the order an index goes through them"""
+
+MOUNT_CONCURRENCY: int = 4
+"""Default number of indices ILM moves to a searchable snapshot tier at the same time"""
+
 PLURALMAP: t.Dict[str, str] = {
     "ilm": "ILM Policies",
     "index": "indices",
 }
 """Mapping of singular to plural names for use in the CLI"""
 
+TARGET_CHECK_DOCS: int = 100000
+"""
+Default number of docs generated between checks of the index size, when filling to
+a target size
+"""
+
 TESTPLAN: dict = {
     "type": "indices",
     "prefix": "es-testbed",
@@ -52,6 +181,8 @@ TESTPLAN: dict = {
         "max_num_segments": 1,
     },
     "entities": [],
+    "ingest": {},
+    "serializer": "json",
 }
 """Default values for the TestPlan settings"""
 
@@ -76,6 +207,24 @@ TIMEOUT_DEFAULT: str = "30"
 TIMEOUT_ENVVAR: str = "ES_TESTBED_TIMEOUT"
 """Environment variable for the testbed timeout"""
 
+WAIT_BACKOFF: float = 1.5
+"""How much each pause between the checks of a wait grows over the previous one"""
+
+WAIT_HISTORY_SIZE: int = 20
+"""How many of the most recent waits of each kind are remembered"""
+
+WAIT_INITIAL_PAUSE: float = 0.1
+"""Seconds of the first pause between the checks of a wait"""
+
+WAIT_LEARNED_SHARE: float = 0.8
+"""
+Share of the median time of earlier waits of the same kind that passes before the
+second check of a wait
+"""
+
+WAIT_SETTLE_SECONDS: float = 1.0
+"""Seconds of the fixed settle delays that readiness conditions replaced"""
+
 # Define IlmPhase as a typing alias to be reused multiple times
 #
 # In all currently supported Python versions (3.8 -> 3.12), the syntax:
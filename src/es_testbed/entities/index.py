@@ -10,8 +10,9 @@ from ..debug import debug, begin_end
 from ..defaults import PAUSE_DEFAULT, PAUSE_ENVVAR, TIMEOUT_DEFAULT, TIMEOUT_ENVVAR
 from ..es_api import snapshot_name
 from ..exceptions import TestbedFailure
-from ..ilm import IlmTracker
+from ..ilm import ExplainCache, IlmTracker, PolicyCache
 from ..utils import mounted_name, prettystr
+from ..waits import adaptive
 from .entity import Entity
 
 if t.TYPE_CHECKING:
@@ -32,35 +33,29 @@ class Index(Entity):
         name: t.Union[str, None] = None,
         snapmgr=None,
         policy_name: str = None,
+        explain_cache: t.Optional[ExplainCache] = None,
+        policy_cache: t.Optional[PolicyCache] = None,
     ):
         debug.lv2("Initializing Index entity object...")
         super().__init__(client=client, name=name)
         self.policy_name = policy_name
+        self.explain_cache = explain_cache
+        self.policy_cache = policy_cache
         self.ilm_tracker = None
         self.snapmgr = snapmgr
         debug.lv3("Index entity object initialized")
 
     @property
-    @begin_end()
     def _get_target(self) -> str:
-        target = None
-        phases = self.ilm_tracker.policy_phases
+        """
+        Return the searchable snapshot phase the index moves to next, or its
+        current phase if there is none
+        """
+        graph = self.ilm_tracker.graph
         curr = self.ilm_tracker.explain.phase
-        if not bool(("cold" in phases) or ("frozen" in phases)):
+        if not graph.searchable:
             debug.lv3(f'ILM Policy for "{self.name}" has no cold/frozen phases')
-            target = curr  # Keep the same
-        if bool(("cold" in phases) and ("frozen" in phases)):
-            if self.ilm_tracker.pname(curr) < self.ilm_tracker.pname("cold"):
-                target = "cold"
-            elif curr == "cold":
-                target = "frozen"
-            elif self.ilm_tracker.pname(curr) >= self.ilm_tracker.pname("frozen"):
-                target = curr
-        elif bool(("cold" in phases) and ("frozen" not in phases)):
-            target = "cold"
-        elif bool(("cold" not in phases) and ("frozen" in phases)):
-            target = "frozen"
-        return target
+        return graph.targets.get(curr, curr)
 
     @property
     def phase_tuple(self) -> t.Tuple[str, str]:
@@ -86,6 +81,7 @@ class Index(Entity):
         step = IlmStep(
             self.client, pause=PAUSE_VALUE, timeout=TIMEOUT_VALUE, name=self.name
         )
+        adaptive(step, key="ilm_step")
         try:
             debug.lv4("TRY: Waiting for ILM step to complete...")
             self._wait_try(step.wait)
@@ -101,6 +97,8 @@ class Index(Entity):
         try:
             debug.lv4("TRY: To run func()...")
             func()
+            if self.ilm_tracker is not None:
+                self.ilm_tracker.invalidate()
         except EsWaitFatal as wait:
             # EsWaitFatal indicates we had more than the allowed number of exceptions
             msg = f"{wait.message}. Elapsed time: {wait.elapsed}. Errors: {wait.errors}"
@@ -139,7 +137,7 @@ class Index(Entity):
             "timeout": TIMEOUT_VALUE,
         }
 
-        test = Exists(self.client, **wait_kwargs)
+        test = adaptive(Exists(self.client, **wait_kwargs), key=f"mount:{target}")
         debug.lv5(f"Exists response: {prettystr(test)}")
         try:
             debug.lv4(f'TRY: Waiting for "{newidx}" to exist...')
@@ -179,8 +177,16 @@ class Index(Entity):
             self.name = mounted_name(self.name, scheme["target_tier"])
 
     @begin_end()
-    def mount_ss(self, scheme: dict) -> None:
-        """If the index is planned to become a searchable snapshot, we do that now"""
+    def mount_ss(self, scheme: dict, add_snapshot: bool = True) -> bool:
+        """
+        If the index is planned to become a searchable snapshot, we do that now
+
+        Return True if ILM mounted the index as a searchable snapshot.
+
+        :param add_snapshot: Add the snapshot behind the mounted index to snapmgr.
+            If False, the caller must call :py:meth:`record_snapshot`, e.g. to add
+            the snapshots of indices mounted concurrently in a deterministic order.
+        """
         debug.lv3(f'Checking if "{self.name}" should be a searchable snapshot')
         if self.am_i_write_idx:
             debug.lv5(
@@ -188,13 +194,13 @@ class Index(Entity):
                 f"snapshot"
             )
 
-            return
+            return False
         if not self.policy_name:  # If we have this, chances are we have a policy
             debug.lv3(f'No ILM policy for "{self.name}". Trying manual...')
             self.manual_ss(scheme)
 
-            return
-        phase = self.ilm_tracker.next_phase
+            return False
+        phase = self.ilm_tracker.next_phase()
         debug.lv5(f'Next phase for "{self.name}" = {phase}')
         current = self.ilm_tracker.explain.phase
         debug.lv5(f'Current phase for "{self.name}" = {current}')
@@ -210,8 +216,9 @@ class Index(Entity):
                 pause=PAUSE_VALUE,
                 timeout=TIMEOUT_VALUE,
                 name=self.name,
-                phase=self.ilm_tracker.next_phase,
+                phase=phase,
             )
+            adaptive(phasenext, key=f"ilm_phase:{phase}")
             try:
                 debug.lv4("TRY: Waiting for ILM phase to complete...")
                 self._wait_try(phasenext.wait)
@@ -237,8 +244,17 @@ class Index(Entity):
             debug.lv3(f'ILM advance to phase "{target}" completed')
 
             # Record the snapshot in our tracker
-            debug.lv5("Adding snapshot step to snapmgr...")
-            self._add_snap_step()
+            if add_snapshot:
+                debug.lv5("Adding snapshot step to snapmgr...")
+                self._add_snap_step()
+
+            return True
+        return False
+
+    @begin_end()
+    def record_snapshot(self) -> None:
+        """Add the snapshot behind the mounted index to snapmgr"""
+        self._add_snap_step()
 
     @begin_end()
     def track_ilm(self, name: str) -> None:
@@ -249,7 +265,12 @@ class Index(Entity):
         if self.policy_name:
             debug.lv5(f"ILM policy name: {self.policy_name}")
             debug.lv5(f'Creating ILM tracker for "{name}"')
-            self.ilm_tracker = IlmTracker(self.client, name)
+            self.ilm_tracker = IlmTracker(
+                self.client,
+                name,
+                cache=self.explain_cache,
+                policies=self.policy_cache,
+            )
             debug.lv5(f'Updating ILM tracker for "{name}"')
             self.ilm_tracker.update()
         else:
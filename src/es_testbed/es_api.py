@@ -4,24 +4,33 @@
 import typing as t
 import logging
 from os import getenv
+from time import monotonic
 from elasticsearch8.exceptions import NotFoundError, TransportError
 from es_wait import Exists, Snapshot
 from es_wait import debug as es_wait_debug
 from es_wait.exceptions import EsWaitFatal, EsWaitTimeout
 from .debug import debug, begin_end
-from .defaults import PAUSE_DEFAULT, PAUSE_ENVVAR  # MAPPING
+from .defaults import (  # MAPPING
+    BULK_PROFILE,
+    CARDINALITY_PRECISION,
+    PAUSE_DEFAULT,
+    PAUSE_ENVVAR,
+)
 from .exceptions import (
     NameChanged,
     ResultNotExpected,
     TestbedFailure,
     TestbedMisconfig,
 )
+from .ingest import BulkLoader, Corpus, FillTarget, doc_lines, encode_doc
+from .ingest.generate import range_options, resolve_range
 from .utils import (
     get_routing,
     mounted_name,
     prettystr,
     storage_type,
 )
+from .waits import adaptive
 
 if t.TYPE_CHECKING:
     from elasticsearch8 import Elasticsearch
@@ -126,7 +135,7 @@ def wait_wrapper(
         debug.lv5(f"wait_cls kwargs: {wait_kwargs}")
         test = wait_cls(client, **wait_kwargs)
         debug.lv4("TRY: wait()")
-        test.wait()
+        adaptive(test, key=f"create:{wait_kwargs.get('kind', 'snapshot')}").wait()
     except EsWaitFatal as wait:
         msg = f"{wait.message}. Elapsed time: {wait.elapsed}. Errors: {wait.errors}"
         debug.lv3("Exiting function, raising exception")
@@ -330,28 +339,219 @@ def exists(
     return retval
 
 
+@begin_end()
+def field_cardinality(
+    client: "Elasticsearch",
+    name: str,
+    field: str,
+    precision_threshold: int = CARDINALITY_PRECISION,
+) -> int:
+    """
+    Return the number of distinct values of field in name, from a ``cardinality``
+    aggregation, which is exact up to about precision_threshold values
+
+    :raises TestbedFailure: If the search fails
+    """
+    aggs = {
+        "values": {
+            "cardinality": {"field": field, "precision_threshold": precision_threshold}
+        }
+    }
+    try:
+        debug.lv4(f'TRY: cardinality of "{field}" in {name}')
+        res = client.search(index=name, size=0, aggs=aggs, track_total_hits=False)
+    except Exception as err:
+        msg = f'Unable to count the values of "{field}" in {name}: {prettystr(err)}'
+        logger.error(msg)
+        raise TestbedFailure(msg) from err
+    retval = int(res["aggregations"]["values"]["value"])
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
 @begin_end()
 def fill_index(
     client: "Elasticsearch",
     name: t.Optional[str] = None,
     doc_generator: t.Optional[t.Generator[t.Dict, None, None]] = None,
     options: t.Optional[t.Dict] = None,
-) -> None:
+    ingest: t.Optional[t.Dict] = None,
+    encoder: t.Callable[[t.Any], bytes] = encode_doc,
+    batch_generator: t.Optional[t.Callable] = None,
+    corpus: t.Union[str, t.Dict, None] = None,
+) -> t.Dict[str, t.Any]:
     """
-    Create and fill the named index with mappings and settings as directed
+    Fill the named index or data_stream with docs from doc_generator via _bulk
+
+    If ``name`` is a data_stream, ``op_type`` ``create`` is used, as that is the
+    only operation a data_stream accepts.
 
     :param client: ES client
-    :param name: Index name
+    :param name: Index or data_stream name
     :param doc_generator: The generator function
-
-    :returns: No return value
+    :param options: The kwargs passed to doc_generator
+    :param ingest: The ``ingest`` settings of the ``index_buildlist`` entry, e.g.
+        ``workers``, ``queue_depth`` or ``processes``. See
+        :py:attr:`~.es_testbed.ingest.BulkLoader.settings_keys` and
+        :py:func:`~.es_testbed.ingest.doc_lines`
+    :param encoder: Returns a document as one line of UTF-8 JSON. See
+        :py:func:`~.es_testbed.ingest.get_encoder`
+    :param batch_generator: The preset's columnar batch generator function, used
+        instead of doc_generator unless ``ingest`` sets ``batch`` to False
+    :param corpus: The ``corpus`` of the ``index_buildlist`` entry. If set, docs
+        are read from that file instead of generated. See
+        :py:class:`~.es_testbed.ingest.Corpus`
+
+    If ``ingest`` enables ``bulk_profile``, the settings in
+    :py:data:`~.es_testbed.defaults.BULK_PROFILE` are applied to the index being
+    written to before filling starts. After a single flush and refresh, the
+    settings it had before are restored. For a data_stream, that is the current
+    write (backing) index. Its settings came from the index template built by
+    :py:meth:`~.es_testbed.mgrs.TemplateMgr.setup`, which is never modified, so
+    backing indices created by later rollovers are unaffected.
+
+    If ``ingest`` enables ``defer_refresh``, the index is neither flushed nor
+    refreshed here. The caller is expected to do so for every index at once with
+    :py:func:`flush_refresh`. With ``bulk_profile`` as well, the saved settings
+    are restored here, as soon as the docs are sent, so that later flush and
+    refresh happen with the index's own settings in place.
+
+    If ``ingest`` sets ``target_store_size`` or ``target_docs_per_shard``, docs are
+    generated until the index (for a data_stream, its write index) reaches that
+    size, and the ``count`` option is ignored. As docs that failed to index never
+    count toward the target, filling stops at the first round after any did. See
+    :py:class:`~.es_testbed.ingest.FillTarget` and :py:func:`target_lines`.
+
+    :returns: The ingest metrics of ``name``: ``docs``, ``bytes``, ``seconds``
+        (wall time of generating and sending), ``docs_per_sec``, ``requests``
+        (count of _bulk requests) and ``retries``. See
+        :py:meth:`~.es_testbed.ingest.BulkLoader.stats`
     """
     if not options:
         options = {}
-    for doc in doc_generator(**options):
-        client.index(index=name, document=doc)
-    client.indices.flush(index=name)
-    client.indices.refresh(index=name)
+    op_type = "create" if is_data_stream(client, name) else "index"
+    debug.lv5(f'Filling "{name}" using op_type "{op_type}"')
+    loader = BulkLoader.from_settings(client, name, op_type=op_type, settings=ingest)
+    saved = None
+    target = name
+    if ingest and "bulk_profile" in ingest and ingest["bulk_profile"]:
+        if op_type == "create":
+            target = get_ds_current(client, name)
+        saved = get_settings(client, target, list(BULK_PROFILE.keys()))
+        debug.lv3(f'Applying bulk-load profile to "{target}"')
+        put_settings(client, target, BULK_PROFILE)
+    try:
+        if ingest and "batch" in ingest and not ingest["batch"]:
+            batch_generator = None
+        source = Corpus.from_settings(corpus)
+        fill_target = FillTarget.from_settings(ingest)
+        if source is not None and fill_target is not None:
+            raise TestbedMisconfig("A corpus file cannot be filled to a target size")
+        if source is not None:
+            lines = source.lines(encoder)
+        elif fill_target is not None:
+            write_index = get_ds_current(client, name) if op_type == "create" else name
+            lines = target_lines(
+                client,
+                write_index,
+                fill_target,
+                doc_generator,
+                options,
+                ingest,
+                encoder,
+                batch_generator,
+                errors=loader.errors,
+            )
+        else:
+            lines = doc_lines(
+                doc_generator,
+                options=options,
+                settings=ingest,
+                encoder=encoder,
+                batch_generator=batch_generator,
+            )
+        start = monotonic()
+        loader.load_lines(lines)
+        retval = loader.stats(monotonic() - start)
+        if ingest and "defer_refresh" in ingest and ingest["defer_refresh"]:
+            debug.lv3(f'Deferring flush and refresh of "{name}"')
+        else:
+            client.indices.flush(index=name)
+            client.indices.refresh(index=name)
+    finally:
+        if saved is not None:
+            debug.lv3(f'Restoring the intended settings of "{target}"')
+            put_settings(client, target, saved)
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
+def target_lines(
+    client: "Elasticsearch",
+    name: str,
+    fill_target: FillTarget,
+    doc_generator: t.Callable,
+    options: t.Dict,
+    ingest: t.Optional[t.Dict] = None,
+    encoder: t.Callable[[t.Any], bytes] = encode_doc,
+    batch_generator: t.Optional[t.Callable] = None,
+    errors: t.Optional[t.Sequence] = None,
+) -> t.Iterable[bytes]:
+    """
+    Return docs from doc_generator, or batch_generator, a round at a time, until
+    the concrete index ``name`` reaches fill_target (see
+    :py:meth:`~.es_testbed.ingest.FillTarget.lines`)
+
+    The ``timestamps`` and ``pools`` options, and the preset's own random choices,
+    are resolved once, here, for the whole fill, starting at the first doc, so
+    every round continues where the one before it stopped. As the number of docs
+    a fill takes is not known up front, a ``timestamps`` window is spread over
+    ``target_max_docs`` docs if set, or otherwise the ``count`` option. Any docs
+    past that get the end of the window.
+
+    :param errors: The :py:attr:`~.es_testbed.ingest.BulkLoader.errors` of the
+        loader the docs are sent with. Docs that failed to index never count
+        toward the target, so filling stops once there are any.
+
+    :raises TestbedMisconfig: If the generator does not take ``count`` and
+        ``start_at``, which rounds need
+    :raises TestbedFailure: If docs failed to index
+    """
+    source = doc_generator if batch_generator is None else batch_generator
+    rng = range_options(source, options)
+    if rng is None:
+        msg = "Filling to a target size needs a generator with count and start_at"
+        logger.critical(msg)
+        raise TestbedMisconfig(msg)
+    resolved = dict(options)
+    if fill_target.max_docs is not None:
+        resolved["count"] = fill_target.max_docs
+    resolved = resolve_range(source, resolved)
+
+    def generate(start_at: int, count: int) -> t.Iterable[bytes]:
+        kwargs = dict(resolved)
+        kwargs.update({"start_at": start_at, "count": count})
+        return doc_lines(
+            doc_generator,
+            options=kwargs,
+            settings=ingest,
+            encoder=encoder,
+            batch_generator=batch_generator,
+        )
+
+    refresh = fill_target.store_size is not None
+
+    def check() -> t.Dict[str, int]:
+        if errors:
+            msg = (
+                f"{len(errors)} document(s) failed to index into {name}. Stopped "
+                f"filling to the target size."
+            )
+            logger.error(msg)
+            raise TestbedFailure(msg)
+        return index_stats(client, name, refresh=refresh)
+
+    return fill_target.lines(generate, check, start_at=rng[0])
 
 
 @begin_end()
@@ -380,6 +580,37 @@ def fix_aliases(client: "Elasticsearch", oldidx: str, newidx: str) -> None:
     client.indices.put_alias(index=f"{newidx}", name=oldidx)
 
 
+@begin_end()
+def flush_refresh(client: "Elasticsearch", pattern: str) -> t.Dict[str, int]:
+    """
+    Flush, then refresh, every index matching pattern in one call each
+
+    Hidden indices, like data_stream backing indices, are included.
+
+    :returns: The ``_shards`` summary of the refresh, e.g.
+        ``{'total': 2, 'successful': 2, 'failed': 0}``
+    :raises TestbedFailure: If either call fails, or any shard failed
+    """
+    kwargs = {"index": pattern, "expand_wildcards": ["open", "hidden"]}
+    retval = {}
+    for action in ("flush", "refresh"):
+        try:
+            debug.lv4(f"TRY: indices.{action} {pattern}")
+            res = getattr(client.indices, action)(**kwargs)
+            debug.lv5(f"indices.{action} response: {res}")
+        except Exception as err:
+            msg = f"Unable to {action} {pattern}. Error: {prettystr(err)}"
+            logger.error(msg)
+            raise TestbedFailure(msg) from err
+        retval = dict(res["_shards"]) if "_shards" in res else {}
+        if "failed" in retval and retval["failed"]:
+            msg = f"indices.{action} of {pattern} failed on {retval['failed']} shards"
+            logger.error(msg)
+            raise TestbedFailure(msg)
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
 @begin_end()
 def get(
     client: "Elasticsearch",
@@ -500,6 +731,29 @@ def get_ilm_phases(client: "Elasticsearch", name: str) -> t.Dict:
     return retval
 
 
+@begin_end()
+def get_settings(
+    client: "Elasticsearch", name: str, keys: t.Sequence[str]
+) -> t.Dict[str, t.Any]:
+    """
+    Return the flat settings named in keys for the concrete index ``name``
+
+    Keys not explicitly set on the index have a value of None, which resets them
+    to their default value when passed to :py:func:`put_settings`.
+    """
+    try:
+        debug.lv4("TRY: indices.get_settings")
+        res = client.indices.get_settings(index=name, name=keys, flat_settings=True)
+    except Exception as err:
+        msg = f"Unable to get settings of index {name}. Error: {prettystr(err)}"
+        logger.critical(msg)
+        raise ResultNotExpected(msg) from err
+    current = res[name]["settings"] if name in res else {}
+    retval = {key: current.get(key) for key in keys}
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
 @begin_end()
 def get_write_index(client: "Elasticsearch", name: str) -> str:
     """
@@ -530,15 +784,15 @@ def get_write_index(client: "Elasticsearch", name: str) -> str:
 
 @begin_end()
 def ilm_explain(client: "Elasticsearch", name: str) -> t.Union[t.Dict, None]:
-    """Return the results from the ILM Explain API call for the named index"""
+    """
+    Return the results from the ILM Explain API call for the named index
+
+    If name is not an index itself, e.g. an alias, the results of the index it
+    resolved to are returned. They are in the same response.
+    """
     try:
         debug.lv4("TRY: ilm.explain_lifecycle")
-        retval = client.ilm.explain_lifecycle(index=name)["indices"][name]
-    except KeyError:
-        debug.lv5("Index name changed")
-        new = list(client.ilm.explain_lifecycle(index=name)["indices"].keys())[0]
-        debug.lv5(f"ilm.explain_lifecycle response: {new}")
-        retval = client.ilm.explain_lifecycle(index=new)["indices"][new]
+        indices = client.ilm.explain_lifecycle(index=name)["indices"]
     except NotFoundError as err:
         logger.warning(f"Datastream/Index Name changed. {name} was not found")
         debug.lv3("Exiting function, raising exception")
@@ -550,10 +804,39 @@ def ilm_explain(client: "Elasticsearch", name: str) -> t.Union[t.Dict, None]:
         debug.lv3("Exiting function, raising exception")
         debug.lv5(f"Exception: {prettystr(err)}")
         raise ResultNotExpected(f"{msg}. Exception: {prettystr(err)}") from err
+    try:
+        retval = indices[name]
+    except KeyError:
+        if not indices:
+            raise NameChanged(f"{name} was not found, likely due to a name change")
+        debug.lv5("Index name changed")
+        retval = next(iter(indices.values()))
     debug.lv5(f"Return value = {retval}")
     return retval
 
 
+@begin_end()
+def ilm_explain_all(client: "Elasticsearch", pattern: str) -> t.Dict[str, t.Dict]:
+    """
+    Return the results from one ILM Explain API call for every index matching
+    pattern, by index name. The backing indices of matching data_streams are
+    included.
+    """
+    try:
+        debug.lv4(f"TRY: ilm.explain_lifecycle {pattern}")
+        res = client.ilm.explain_lifecycle(index=pattern)
+    except NotFoundError:
+        debug.lv3(f"No indices match {pattern}")
+        return {}
+    except Exception as err:
+        msg = f"Unable to get ILM information for {pattern}"
+        logger.critical(msg)
+        raise ResultNotExpected(f"{msg}. Exception: {prettystr(err)}") from err
+    retval = dict(res["indices"])
+    debug.lv5(f"Explained {len(retval)} indices")
+    return retval
+
+
 @begin_end()
 def ilm_move(
     client: "Elasticsearch", name: str, current_step: t.Dict, next_step: t.Dict
@@ -574,6 +857,49 @@ def ilm_move(
         raise ResultNotExpected(msg, (err,))
 
 
+@begin_end()
+def index_stats(
+    client: "Elasticsearch", name: str, refresh: bool = False
+) -> t.Dict[str, int]:
+    """
+    Return the ``docs`` indexed into, and ``store_bytes`` of, the primary shards of
+    the concrete index ``name``, and its number of primary ``shards``
+
+    :param refresh: Refresh the index first, so docs still in the indexing buffer
+        count toward its store size
+    :raises TestbedFailure: If any call fails
+    """
+    try:
+        if refresh:
+            debug.lv4(f"TRY: indices.refresh {name}")
+            client.indices.refresh(index=name)
+        debug.lv4(f"TRY: indices.stats {name}")
+        res = client.indices.stats(index=name, metric=["indexing", "store"])
+        shards = client.indices.get_settings(
+            index=name, name="index.number_of_shards", flat_settings=True
+        )
+    except Exception as err:
+        msg = f"Unable to get the stats of index {name}. Error: {prettystr(err)}"
+        logger.error(msg)
+        raise TestbedFailure(msg) from err
+    primaries = res["_all"]["primaries"]
+    retval = {
+        "docs": int(primaries["indexing"]["index_total"]),
+        "store_bytes": int(primaries["store"]["size_in_bytes"]),
+        "shards": int(shards[name]["settings"]["index.number_of_shards"]),
+    }
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
+@begin_end()
+def is_data_stream(client: "Elasticsearch", name: str) -> bool:
+    """Return True if name resolves to a data_stream"""
+    retval = bool(resolver(client, name)["data_streams"])
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
 @begin_end()
 def put_comp_tmpl(client: "Elasticsearch", name: str, component: t.Dict) -> None:
     """Publish a component template"""
@@ -630,6 +956,20 @@ def put_ilm(
         raise TestbedFailure(msg) from err
 
 
+@begin_end()
+def put_settings(client: "Elasticsearch", name: str, settings: t.Dict) -> None:
+    """Update the dynamic index settings of the index (or indices) ``name``"""
+    try:
+        debug.lv4("TRY: indices.put_settings")
+        debug.lv5(f"indices.put_settings index: {name}, settings: {settings}")
+        res = client.indices.put_settings(index=name, settings=settings)
+        debug.lv5(f"indices.put_settings response: {res}")
+    except Exception as err:
+        msg = f"Unable to update settings of {name}. Error: {prettystr(err)}"
+        logger.error(msg)
+        raise TestbedFailure(msg) from err
+
+
 @begin_end()
 def resolver(client: "Elasticsearch", name: str) -> dict:
     """
@@ -655,6 +995,29 @@ def rollover(client: "Elasticsearch", name: str) -> None:
     debug.lv5(f"rollover response: {res}")
 
 
+@begin_end()
+def shards_started(client: "Elasticsearch", name: str) -> bool:
+    """
+    Return whether every primary shard of the index name has started, i.e. its
+    health is at least yellow
+
+    :raises TestbedFailure: If the cluster health call fails
+    """
+    try:
+        debug.lv4(f"TRY: cluster.health {name}")
+        res = client.cluster.health(index=name)
+    except NotFoundError:
+        debug.lv3(f"Index {name} does not exist yet")
+        return False
+    except Exception as err:
+        msg = f"Unable to get the health of index {name}. Error: {prettystr(err)}"
+        logger.error(msg)
+        raise TestbedFailure(msg) from err
+    retval = res["status"] in ("yellow", "green")
+    debug.lv5(f"Return value = {retval}")
+    return retval
+
+
 @begin_end()
 def snapshot_name(client: "Elasticsearch", name: str) -> t.Union[t.AnyStr, None]:
     """Get the name of the snapshot behind the mounted index data"""
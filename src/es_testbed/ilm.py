@@ -3,14 +3,20 @@
 import typing as t
 import logging
 from os import getenv
+import threading
 import time
+from types import MappingProxyType
 from dotmap import DotMap
 from es_wait import IlmPhase, IlmStep
 from es_wait.exceptions import EsWaitFatal, EsWaitTimeout
 from .debug import debug, begin_end
 from .defaults import (
+    ILM_ACTIONS,
+    ILM_EXPLAIN_TTL,
+    ILM_PHASES,
     PAUSE_ENVVAR,
     PAUSE_DEFAULT,
+    SS_PREFIX,
     TIMEOUT_DEFAULT,
     TIMEOUT_ENVVAR,
 )
@@ -20,8 +26,16 @@ from .exceptions import (
     TestbedMisconfig,
     TestbedFailure,
 )
-from .es_api import get_ilm_phases, ilm_explain, ilm_move, resolver
+from .es_api import (
+    get_ilm_phases,
+    ilm_explain,
+    ilm_explain_all,
+    ilm_move,
+    resolver,
+    shards_started,
+)
 from .utils import prettystr
+from .waits import adaptive, settle
 
 if t.TYPE_CHECKING:
     from elasticsearch8 import Elasticsearch
@@ -65,17 +79,247 @@ logger = logging.getLogger("es_testbed.IlmTracker")
 # }
 
 
+class PhaseGraph:
+    """
+    The phases of an ILM policy, compiled once into immutable lookup tables, so
+    that finding the next phase of an index, or where it goes to become a
+    searchable snapshot, takes no more than a dictionary lookup
+
+    :param phases: The ``phases`` of an ILM policy, by name
+    """
+
+    __slots__ = (
+        "definitions",
+        "order",
+        "number",
+        "names",
+        "next",
+        "searchable",
+        "targets",
+        "actions",
+    )
+
+    def __init__(self, phases: t.Mapping[str, t.Any]):
+        if hasattr(phases, "toDict"):
+            phases = phases.toDict()
+        number = {name: num for num, name in enumerate(ILM_PHASES)}
+        order = tuple(sorted(phases, key=lambda x: number[x]))
+        searchable = tuple(x for x in order if x in SS_PREFIX)
+        nxt, targets = {}, {}
+        for name in ILM_PHASES:
+            later = [x for x in order if number[x] > number[name]]
+            nxt[name] = later[0] if later else None
+            later = [x for x in searchable if number[x] > number[name]]
+            targets[name] = later[0] if later else name
+        actions = {}
+        for name in order:
+            defined = list((phases[name] or {}).get("actions", {}))
+            known = ILM_ACTIONS.get(name, ())
+            ordered = [x for x in known if x in defined]
+            ordered += [x for x in defined if x not in known]
+            actions[name] = tuple(ordered) + ("complete",)
+        setter = super().__setattr__
+        #: The phases as defined in the policy
+        setter("definitions", MappingProxyType(dict(phases)))
+        #: The phases of the policy, in the order an index goes through them
+        setter("order", order)
+        #: The number of every ILM phase, and the phase of every number
+        setter("number", MappingProxyType(number))
+        setter("names", MappingProxyType({v: k for k, v in number.items()}))
+        #: The next phase of the policy after any ILM phase, or None
+        setter("next", MappingProxyType(nxt))
+        #: The searchable snapshot phases of the policy
+        setter("searchable", frozenset(searchable))
+        #: The searchable snapshot phase of the policy an index in any ILM phase
+        #: moves to next, or the phase itself if there is none
+        setter("targets", MappingProxyType(targets))
+        #: The actions of every phase of the policy in the order ILM runs them,
+        #: ending with ``complete``. The steps of each action are ILM's own.
+        setter("actions", MappingProxyType(actions))
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        raise AttributeError(f"PhaseGraph is immutable. Cannot set {name}")
+
+    def __repr__(self) -> str:
+        return f"PhaseGraph({self.order})"
+
+
+class ExplainCache:
+    """
+    ILM explain data of every index matching pattern, fetched with one call, and
+    shared by the IlmTracker of every index of a testbed
+
+    Data is reused for up to ``ttl`` seconds. Anything that changes the ILM state
+    of an index, like moving it to another step, or a wait for such a change to
+    finish, must call :py:meth:`invalidate`, so the next lookup fetches fresh data.
+    An index missing from fresh data, e.g. one that is not in pattern, is explained
+    on its own.
+    """
+
+    def __init__(
+        self, client: "Elasticsearch", pattern: str, ttl: float = ILM_EXPLAIN_TTL
+    ):
+        debug.lv2("Initializing ExplainCache object...")
+        self.client = client
+        self.pattern = pattern
+        self.ttl = ttl
+        self.calls = 0  # ILM explain API calls made, for the curious
+        self._data = {}
+        self._fetched = None
+        self._generation = 0  # Counts invalidations
+        self._lock = threading.Lock()
+        self._state = threading.Lock()  # Guards _fetched and _generation
+        debug.lv3("ExplainCache object initialized")
+
+    @property
+    def stale(self) -> bool:
+        """Whether the data is older than ttl, or was invalidated"""
+        return self._fetched is None or time.monotonic() - self._fetched > self.ttl
+
+    def invalidate(self) -> None:
+        """Make the next lookup fetch fresh data"""
+        debug.lv5(f"Invalidating ILM explain data of {self.pattern}")
+        with self._state:
+            self._generation += 1
+            self._fetched = None
+
+    def fetch(self) -> None:
+        """
+        Replace the data with that of every index matching pattern
+
+        If :py:meth:`invalidate` is called while the data is fetched, the data may
+        be from before the change, so it is not marked fresh.
+        """
+        with self._state:
+            generation = self._generation
+        self._data = dict(ilm_explain_all(self.client, self.pattern))
+        self.calls += 1
+        with self._state:
+            if self._generation == generation:
+                self._fetched = time.monotonic()
+            else:
+                debug.lv5("ILM explain data was invalidated while fetching it")
+
+    @begin_end()
+    def get(self, name: str) -> t.Dict:
+        """
+        Return the ILM explain data of the index name
+
+        :raises NameChanged: If name is no longer found
+        :raises ResultNotExpected: If the ILM explain API call fails
+        """
+        with self._lock:
+            fetched = self.stale
+            if fetched:
+                self.fetch()
+            if name not in self._data and not fetched:
+                self.fetch()
+            if name not in self._data:
+                debug.lv3(f'"{name}" is not in {self.pattern}. Explaining it alone.')
+                self._data[name] = ilm_explain(self.client, name)
+                self.calls += 1
+            retval = self._data[name]
+        debug.lv5(f"Return value = {prettystr(retval)}")
+        return retval
+
+
+class PolicyCache:
+    """
+    The phases of ILM policies by name, shared by the IlmTracker of every index of
+    a testbed, so creating a tracker does not read its policy back
+
+    :py:class:`~.es_testbed.mgrs.IlmMgr` seeds it with every policy it writes,
+    and invalidates a policy it replaces. A policy that was not seeded is read
+    once, on first use.
+    """
+
+    def __init__(self, client: "Elasticsearch"):
+        debug.lv2("Initializing PolicyCache object...")
+        self.client = client
+        self.reads = 0  # ILM policies read back, for the curious
+        self._graphs = {}
+        self._lock = threading.Lock()
+        debug.lv3("PolicyCache object initialized")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._graphs
+
+    def put(self, name: str, policy: t.Mapping) -> None:
+        """
+        Seed, or replace, the phases of the policy name with those of policy, as
+        written with the ILM put lifecycle API (``{'phases': {...}}``)
+        """
+        if hasattr(policy, "toDict"):
+            policy = policy.toDict()
+        graph = PhaseGraph(policy["phases"])
+        with self._lock:
+            self._graphs[name] = graph
+        debug.lv5(f"Cached ILM policy {name}: {prettystr(policy)}")
+
+    def invalidate(self, name: t.Optional[str] = None) -> None:
+        """Forget the policy name, or every policy, to read it again when next used"""
+        with self._lock:
+            if name is None:
+                self._graphs.clear()
+            else:
+                self._graphs.pop(name, None)
+
+    def graph(self, name: str) -> PhaseGraph:
+        """
+        Return the compiled phases of the ILM policy name
+
+        :raises ResultNotExpected: If the policy was not seeded and cannot be read
+        """
+        with self._lock:
+            if name not in self._graphs:
+                debug.lv3(f"ILM policy {name} is not cached. Reading it.")
+                self._graphs[name] = PhaseGraph(get_ilm_phases(self.client, name))
+                self.reads += 1
+            return self._graphs[name]
+
+    def phases(self, name: str) -> t.Mapping:
+        """Return the phases of the ILM policy name, as defined"""
+        return self.graph(name).definitions
+
+
 class IlmTracker:
-    """ILM Phase Tracking Class"""
+    """
+    ILM Phase Tracking Class
 
-    def __init__(self, client: "Elasticsearch", name: str):
+    :param cache: The ILM explain data shared by every tracker of the testbed. If
+        None, the tracker calls the ILM explain API for its own index.
+    :param policies: The ILM policies shared by every tracker of the testbed. If
+        None, the tracker reads the policy of its own index.
+    """
+
+    def __init__(
+        self,
+        client: "Elasticsearch",
+        name: str,
+        cache: t.Optional[ExplainCache] = None,
+        policies: t.Optional[PolicyCache] = None,
+    ):
         debug.lv2("Initializing IlmTracker object...")
         self.client = client
+        self.cache = cache
+        self.policies = policies
         self.name = self.resolve(name)  # A single index name
         self._explain = DotMap(self.get_explain_data())
-        self._phases = get_ilm_phases(self.client, self._explain.policy)
+        if self.policies is not None:
+            self.graph = self.policies.graph(self._explain.policy)
+        else:
+            self.graph = PhaseGraph(get_ilm_phases(self.client, self._explain.policy))
         debug.lv3("IlmTracker object initialized")
 
+    @property
+    def _phases(self) -> t.Mapping:
+        """The phases of the ILM policy, as defined. Setting them compiles them."""
+        return self.graph.definitions
+
+    @_phases.setter
+    def _phases(self, value: t.Mapping) -> None:
+        self.graph = PhaseGraph(value)
+
     @property
     def explain(self) -> DotMap:
         """Return the current stored value of ILM Explain"""
@@ -84,7 +328,7 @@ class IlmTracker:
     @property
     def policy_phases(self) -> t.Sequence[str]:
         """Return a list of phases in the ILM policy"""
-        return list(self._phases.keys())
+        return list(self.graph.order)
 
     def _log_phase(self, phase: str) -> None:
         debug.lv3(f"ILM Explain Index: {self._explain.index}")
@@ -100,7 +344,8 @@ class IlmTracker:
         phasechk = IlmPhase(self.client, **kw)
         try:
             debug.lv4("TRY: Waiting for ILM phase to complete")
-            phasechk.wait()
+            adaptive(phasechk, key=f"ilm_phase:{phase}").wait()
+            self.invalidate()
         except EsWaitFatal as wait:
             msg = (
                 f"{wait.message}. Total elapsed time: {wait.elapsed}. "
@@ -113,12 +358,9 @@ class IlmTracker:
             logger.error(msg)
             raise TestbedFailure(msg) from wait
 
-    @begin_end()
     def _ssphz(self, phase: str) -> bool:
         """Return True if the phase is for searchable snapshots (> 'warm')"""
-        retval = bool(self.pnum(phase) > self.pnum("warm"))
-        debug.lv5(f"Return value = {retval}")
-        return retval
+        return self.graph.number[phase] > self.graph.number["warm"]
 
     @begin_end()
     def advance(
@@ -141,7 +383,11 @@ class IlmTracker:
             # It won't be for very long.
             debug.lv5('Waiting for phase to fully reach "hot"...')
             self._phase_wait("hot")
-            time.sleep(1)  # Just to make sure the new index is ready
+            settle(
+                lambda: shards_started(self.client, self.name),
+                f'for the primary shards of "{self.name}" to start',
+                key="shards_started",
+            )
 
         # Regardless of the remaining phases, the current phase steps must be
         # complete before proceeding with ilm_move
@@ -168,9 +414,14 @@ class IlmTracker:
             debug.lv5("Waiting for steps for non-cold/frozen phases to complete")
             wait4steps = not self._ssphz(phase)
             debug.lv5("Running ilm_move()...")
-            ilm_move(self.client, self.name, self.current_step(), next_step)
-            # Let the cluster catch up before proceeding.
-            time.sleep(1)  # Just to make sure the cluster state has gelled
+            current = self.current_step()
+            ilm_move(self.client, self.name, current, next_step)
+            # Only wait for the phase once the move shows up in ILM explain
+            settle(
+                lambda: self._moved_from(current),
+                f'for "{self.name}" to move from {prettystr(current)}',
+                key="ilm_move",
+            )
             debug.lv5("Running self._phase_wait()...")
             self._phase_wait(phase)
             # If cold or frozen, we can return now. We let the calling function
@@ -211,7 +462,10 @@ class IlmTracker:
         """Get the ILM explain data and return it"""
         try:
             debug.lv4("TRY: Getting ILM explain data")
-            retval = ilm_explain(self.client, self.name)
+            if self.cache is not None:
+                retval = self.cache.get(self.name)
+            else:
+                retval = ilm_explain(self.client, self.name)
 
             debug.lv5(f"Return value = {prettystr(retval)}")
             return retval
@@ -226,24 +480,23 @@ class IlmTracker:
             logger.critical(msg)
             raise err
 
-    @begin_end()
-    def next_phase(self) -> str:
-        """Return the next phase in the index's ILM journey"""
-        retval = None
-        if self._explain.phase == "delete":
-            debug.lv3('Already on "delete" phase. No more phases to advance')
-        else:
-            curr = self.pnum(self._explain.phase)  # A numeric representation
-            # A list of any remaining phases in the policy with a higher number than
-            # the current
-            remaining = [
-                self.pnum(x) for x in self.policy_phases if self.pnum(x) > curr
-            ]
-            if remaining:  # If any:
-                retval = self.pname(remaining[0])
-                # Get the phase name from the number stored in the first element
-        debug.lv5(f"Return value = {retval}")
-        return retval
+    def invalidate(self) -> None:
+        """
+        Make the next :py:meth:`update` fetch fresh ILM explain data, after the
+        ILM state of the index changed
+        """
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def _moved_from(self, step: t.Dict[str, str]) -> bool:
+        """Return whether fresh ILM explain data shows the index is no longer at step"""
+        self.invalidate()
+        self.update()
+        return self.current_step() != step
+
+    def next_phase(self) -> t.Union[str, None]:
+        """Return the next phase in the index's ILM journey, or None"""
+        return self.graph.next.get(self._explain.phase)
 
     @begin_end()
     def next_step(
@@ -277,19 +530,13 @@ class IlmTracker:
         debug.lv5(f"Return value = {prettystr(retval)}")
         return retval
 
-    @begin_end()
     def pnum(self, phase: str) -> int:
         """Map a phase name to a phase number"""
-        _ = {"new": 0, "hot": 1, "warm": 2, "cold": 3, "frozen": 4, "delete": 5}
-        debug.lv5(f"Return value = {_[phase]}")
-        return _[phase]
+        return self.graph.number[phase]
 
-    @begin_end()
     def pname(self, num: int) -> str:
         """Map a phase number to a phase name"""
-        _ = {0: "new", 1: "hot", 2: "warm", 3: "cold", 4: "frozen", 5: "delete"}
-        debug.lv5(f"Return value = {_[num]}")
-        return _[num]
+        return self.graph.names[num]
 
     @begin_end()
     def resolve(self, name: str) -> str:
@@ -341,9 +588,10 @@ class IlmTracker:
         step = IlmStep(self.client, **kw)
         try:
             debug.lv4("TRY: Waiting for ILM step to complete")
-            step.wait()
+            adaptive(step, key="ilm_step").wait()
             debug.lv3("ILM Step successful. The wait is over")
-            time.sleep(1)  # Just to make sure the cluster state has gelled
+            # The step is complete in ILM explain, so there is nothing left to settle
+            self.invalidate()
         except EsWaitFatal as wait:
             debug.lv3("Exiting method, raising exception")
             debug.lv5(f"Exception = {prettystr(wait)}")
@@ -0,0 +1,32 @@
+"""Module to make class imports nicer for the ingest package."""
+
+from .bulk import BulkLoader, encode_doc
+from .cache import CorpusCache
+from .corpus import Corpus
+from .generate import doc_lines, preset_generators
+from .mappings import infer_mappings, merge_mappings, preset_mappings
+from .pools import ValuePool, expected_cardinality, pool_settings, value_pools
+from .serializer import get_encoder, install_serializer, restore_serializer
+from .target import FillTarget
+from .template import DocTemplate
+
+__all__ = [
+    "BulkLoader",
+    "Corpus",
+    "CorpusCache",
+    "DocTemplate",
+    "FillTarget",
+    "ValuePool",
+    "doc_lines",
+    "encode_doc",
+    "expected_cardinality",
+    "get_encoder",
+    "infer_mappings",
+    "install_serializer",
+    "merge_mappings",
+    "pool_settings",
+    "preset_generators",
+    "preset_mappings",
+    "restore_serializer",
+    "value_pools",
+]
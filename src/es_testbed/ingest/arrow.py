@@ -0,0 +1,132 @@
+"""Parquet and Arrow IPC files as columnar sources of docs"""
+
+import typing as t
+import logging
+import json
+from pathlib import Path
+from ..debug import debug
+from ..defaults import CORPUS_BATCH_ROWS
+from ..exceptions import TestbedMisconfig
+from .columnar import encode_column, encoded_lines
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc, parquet
+except ImportError:
+    pa = ipc = parquet = None
+
+HAS_PYARROW: bool = pa is not None
+"""Whether pyarrow, which Parquet and Arrow corpus files need, is installed"""
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_value(value: t.Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def arrow_column(array: "pa.Array") -> t.List[str]:
+    """
+    Return every value in an Arrow array as a JSON string
+
+    Numbers, booleans, timestamps and strings are converted as a whole, through
+    NumPy (see :py:func:`~.es_testbed.ingest.columnar.encode_column`). Dates become
+    timestamps at midnight UTC, decimals become floats, and dictionary arrays are
+    decoded first. Nulls are ``null``. Anything else, like lists, is converted one
+    value at a time.
+    """
+    kind = array.type
+    if pa.types.is_dictionary(kind):
+        return arrow_column(array.dictionary_decode())
+    if pa.types.is_date(kind):
+        return arrow_column(array.cast(pa.timestamp("ms")))
+    if pa.types.is_decimal(kind):
+        return arrow_column(array.cast(pa.float64()))
+    vectorized = (
+        pa.types.is_integer(kind)
+        or pa.types.is_floating(kind)
+        or pa.types.is_boolean(kind)
+        or pa.types.is_timestamp(kind)
+        or pa.types.is_string(kind)
+        or pa.types.is_large_string(kind)
+    )
+    if not vectorized:
+        return [_encode_value(value) for value in array.to_pylist()]
+    if array.null_count == 0:
+        return encode_column(array.to_numpy(zero_copy_only=False))
+    valid = encode_column(array.drop_null().to_numpy(zero_copy_only=False))
+    retval = ["null"] * len(array)
+    nums = array.is_valid().to_numpy(zero_copy_only=False).nonzero()[0]
+    for num, value in zip(nums.tolist(), valid):
+        retval[num] = value
+    return retval
+
+
+def record_batch_lines(batch: "pa.RecordBatch") -> t.List[bytes]:
+    """
+    Return the rows of an Arrow record batch, each as one line of UTF-8 encoded
+    JSON. Struct columns become nested objects.
+    """
+    table = pa.Table.from_batches([batch])
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    columns = [arrow_column(column.combine_chunks()) for column in table.columns]
+    return encoded_lines(table.column_names, columns)
+
+
+def record_batches(
+    path: t.Union[str, Path],
+    fmt: str,
+    batch_rows: int = CORPUS_BATCH_ROWS,
+    stream: t.Optional[t.BinaryIO] = None,
+) -> t.Iterator["pa.RecordBatch"]:
+    """
+    Yield the record batches of a ``parquet`` or ``arrow`` (IPC) file, so only one
+    batch of it is in memory at a time
+
+    Parquet is read batch_rows rows at a time. An uncompressed Arrow IPC file is
+    memory-mapped. If a (decompressed) stream is given, it is read as the Arrow IPC
+    stream format instead. Arrow record batches larger than batch_rows are sliced,
+    without copying, into batches of at most batch_rows rows.
+
+    :raises TestbedMisconfig: If pyarrow is not installed
+    """
+    if not HAS_PYARROW:
+        msg = f"pyarrow is not installed. Unable to read {fmt} corpus {path}"
+        logger.critical(msg)
+        raise TestbedMisconfig(msg)
+    if fmt == "parquet":
+        debug.lv3(f"Reading {path} in batches of {batch_rows} rows")
+        yield from parquet.ParquetFile(str(path)).iter_batches(batch_size=batch_rows)
+        return
+    if stream is not None:
+        yield from _sliced(ipc.open_stream(stream), batch_rows)
+        return
+    with pa.memory_map(str(path), "r") as source:
+        try:
+            reader = ipc.open_file(source)
+        except pa.ArrowInvalid:
+            source.seek(0)
+            yield from _sliced(ipc.open_stream(source), batch_rows)
+            return
+        batches = (reader.get_batch(num) for num in range(reader.num_record_batches))
+        yield from _sliced(batches, batch_rows)
+
+
+def _sliced(
+    batches: t.Iterable["pa.RecordBatch"], batch_rows: int
+) -> t.Iterator["pa.RecordBatch"]:
+    for batch in batches:
+        for offset in range(0, len(batch), batch_rows):
+            yield batch.slice(offset, batch_rows)
+
+
+def arrow_lines(
+    path: t.Union[str, Path],
+    fmt: str,
+    batch_rows: int = CORPUS_BATCH_ROWS,
+    stream: t.Optional[t.BinaryIO] = None,
+) -> t.Generator[bytes, None, None]:
+    """Yield the rows of a Parquet or Arrow IPC file as lines of NDJSON"""
+    for batch in record_batches(path, fmt, batch_rows, stream):
+        yield from record_batch_lines(batch)
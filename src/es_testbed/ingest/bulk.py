@@ -0,0 +1,417 @@
+"""Streaming _bulk ingestion engine"""
+
+# pylint: disable=R0902,R0913,R0917
+import typing as t
+import logging
+import json
+import queue
+import random
+import threading
+import time
+from ..debug import debug, begin_end
+from ..defaults import (
+    BULK_BACKOFF,
+    BULK_BACKOFF_MAX,
+    BULK_CHUNK_BYTES,
+    BULK_CHUNK_DOCS,
+    BULK_MAX_RETRIES,
+    BULK_MIN_CHUNK_DOCS,
+    BULK_QUEUE_DEPTH,
+    BULK_RETRY_STATUS,
+    BULK_TARGET_LATENCY,
+    BULK_WORKERS,
+)
+from ..exceptions import TestbedFailure, TestbedMisconfig
+from ..utils import prettystr
+
+if t.TYPE_CHECKING:
+    from elasticsearch8 import Elasticsearch
+
+logger = logging.getLogger(__name__)
+
+OP_LINES: t.Dict[str, bytes] = {
+    "create": b'{"create":{}}\n',
+    "index": b'{"index":{}}\n',
+}
+"""Pre-encoded _bulk action lines. The target index is part of the request URL."""
+
+
+def encode_doc(doc: t.Any) -> bytes:
+    """Return ``doc`` as a compact, single line of UTF-8 encoded JSON"""
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def backoff(attempt: int) -> float:
+    """
+    Return the jittered delay in seconds before retry ``attempt`` (1 for the first)
+
+    The delay doubles with every attempt, up to
+    :py:data:`~.es_testbed.defaults.BULK_BACKOFF_MAX`, and a random half of it is
+    dropped so parallel workers do not retry in lockstep.
+    """
+    cap = min(BULK_BACKOFF_MAX, BULK_BACKOFF * 2 ** (attempt - 1))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def status_of(err: Exception) -> t.Union[int, None]:
+    """Return the HTTP status of a client exception, if it has one"""
+    status = getattr(err, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+class BulkLoader:
+    """
+    Send documents to a single index or data_stream using the _bulk API
+
+    Documents are encoded once, then chunked by document count and by request
+    body size. Each item in a _bulk response is checked individually. Items that
+    failed with a retryable status (see
+    :py:data:`~.es_testbed.defaults.BULK_RETRY_STATUS`) are the only ones re-sent.
+    Any other item failure is recorded in :py:attr:`errors`. A whole request
+    rejected with a retryable status is re-sent as well. Retries wait for a
+    jittered, exponentially growing delay (see :py:func:`backoff`).
+
+    The number of documents per request adapts to the cluster: it is halved after
+    any rejection or a request slower than ``target_latency`` seconds, and grows
+    back by a tenth of ``chunk_docs`` after a request faster than half of that.
+    ``chunk_docs`` is the ceiling. A ``target_latency`` of ``None`` or ``0`` turns
+    off latency-based sizing, but rejections still shrink requests.
+
+    With more than one worker, chunks are handed to a pool of sender threads
+    through a queue holding at most ``queue_depth`` chunks, so memory use stays
+    flat no matter how many documents the generator produces. Every worker's
+    client view shares the client's transport and its connection pool, and
+    holds one of its connections per request, so no more workers are started
+    than the client's ``connections_per_node``. Build the client with at least
+    ``workers`` connections per node to use them all.
+    """
+
+    #: The keys of an ``index_buildlist`` entry's ``ingest`` settings that are
+    #: accepted as keyword arguments
+    settings_keys = (
+        "chunk_docs",
+        "chunk_bytes",
+        "max_retries",
+        "workers",
+        "queue_depth",
+        "target_latency",
+    )
+
+    def __init__(
+        self,
+        client: "Elasticsearch",
+        name: str,
+        op_type: str = "index",
+        chunk_docs: int = BULK_CHUNK_DOCS,
+        chunk_bytes: int = BULK_CHUNK_BYTES,
+        max_retries: int = BULK_MAX_RETRIES,
+        workers: int = BULK_WORKERS,
+        queue_depth: int = BULK_QUEUE_DEPTH,
+        target_latency: t.Optional[float] = BULK_TARGET_LATENCY,
+    ):
+        debug.lv2("Initializing BulkLoader object...")
+        if op_type not in OP_LINES:
+            msg = f'op_type must be one of {list(OP_LINES.keys())}, not "{op_type}"'
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        self.client = client
+        self.name = name
+        self.op_type = op_type
+        #: The most documents ever sent in a single _bulk request
+        self.max_chunk_docs = max(1, int(chunk_docs))
+        #: The number of documents per _bulk request, adapted while loading
+        self.chunk_docs = self.max_chunk_docs
+        self.min_chunk_docs = min(BULK_MIN_CHUNK_DOCS, self.max_chunk_docs)
+        self.target_latency = target_latency
+        self.chunk_bytes = chunk_bytes
+        self.max_retries = max_retries
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(1, int(queue_depth))
+        #: Count of documents successfully indexed
+        self.docs = 0
+        #: Total bytes of request bodies sent, including retries
+        self.bytes = 0
+        #: Count of _bulk requests sent
+        self.requests = 0
+        #: Count of items re-sent after a retryable failure
+        self.retries = 0
+        #: The response of every item that failed and will not be retried
+        self.errors = []
+        #: The latency in seconds of the slowest _bulk request
+        self.max_latency = 0.0
+        self._opline = OP_LINES[op_type]
+        self._lock = threading.Lock()
+        debug.lv3("BulkLoader object initialized")
+
+    @classmethod
+    def from_settings(
+        cls,
+        client: "Elasticsearch",
+        name: str,
+        op_type: str = "index",
+        settings: t.Optional[t.Mapping[str, t.Any]] = None,
+    ) -> "BulkLoader":
+        """
+        Return a BulkLoader configured from an ``index_buildlist`` entry's
+        ``ingest`` settings. Keys not in :py:attr:`settings_keys` are ignored.
+        """
+        kwargs = {}
+        if settings:
+            kwargs = {k: settings[k] for k in cls.settings_keys if k in settings}
+        debug.lv5(f"BulkLoader settings: {kwargs}")
+        return cls(client, name, op_type=op_type, **kwargs)
+
+    def chunks(
+        self, lines: t.Iterable[bytes]
+    ) -> t.Generator[t.List[bytes], None, None]:
+        """
+        Group encoded documents into chunks no larger than :py:attr:`chunk_docs`
+        documents or :py:attr:`chunk_bytes` bytes, whichever comes first.
+
+        A single document larger than :py:attr:`chunk_bytes` is sent by itself.
+        """
+        oplen = len(self._opline) + 1  # The trailing newline of each document
+        chunk = []
+        size = 0
+        for line in lines:
+            linesize = len(line) + oplen
+            if chunk and (
+                len(chunk) >= self.chunk_docs or size + linesize > self.chunk_bytes
+            ):
+                yield chunk
+                chunk = []
+                size = 0
+            chunk.append(line)
+            size += linesize
+        if chunk:
+            yield chunk
+
+    def payload(self, chunk: t.Sequence[bytes]) -> bytes:
+        """Return the NDJSON _bulk request body for the encoded documents in chunk"""
+        opline = self._opline
+        return b"".join([opline + line + b"\n" for line in chunk])
+
+    @begin_end()
+    def send(
+        self, chunk: t.Sequence[bytes], client: t.Optional["Elasticsearch"] = None
+    ) -> None:
+        """
+        Send chunk, re-sending only those items which failed with a retry status
+
+        If the whole request is rejected, :py:attr:`chunk_docs` is reduced and the
+        chunk is re-sent in pieces of the reduced size.
+
+        :param chunk: Encoded documents
+        :param client: The client to send with. Defaults to :py:attr:`client`
+        """
+        if client is None:
+            client = self.client
+        self._send(chunk, client, 0)
+
+    def _send(
+        self, chunk: t.Sequence[bytes], client: "Elasticsearch", attempt: int
+    ) -> None:
+        pending = chunk
+        while pending:
+            body = self.payload(pending)
+            start = time.monotonic()
+            try:
+                debug.lv4(f"TRY: Sending _bulk request of {len(pending)} docs")
+                res = client.bulk(index=self.name, operations=body)
+            except Exception as err:
+                if status_of(err) in BULK_RETRY_STATUS and attempt < self.max_retries:
+                    with self._lock:
+                        self.requests += 1
+                        self.bytes += len(body)
+                        self.retries += len(pending)
+                    self.adapt(None, rejected=True)
+                    attempt += 1
+                    self._wait(len(pending), attempt)
+                    size = self.chunk_docs
+                    if len(pending) > size:
+                        for offset in range(0, len(pending), size):
+                            self._send(pending[offset : offset + size], client, attempt)
+                        return
+                    continue
+                debug.lv3("Exiting method, raising exception")
+                debug.lv5(f"Exception: {prettystr(err)}")
+                raise TestbedFailure(
+                    f"_bulk request to {self.name} failed: {prettystr(err)}"
+                ) from err
+            latency = time.monotonic() - start
+            sent = 0
+            retry = []
+            errors = []
+            if not res["errors"]:
+                sent = len(pending)
+            else:
+                for line, item in zip(pending, res["items"]):
+                    result = next(iter(item.values()))
+                    status = result.get("status", 0)
+                    if status < 300:
+                        sent += 1
+                    elif status in BULK_RETRY_STATUS and attempt < self.max_retries:
+                        retry.append(line)
+                    else:
+                        debug.lv3(f"_bulk item failed: {prettystr(result)}")
+                        errors.append(result)
+            with self._lock:
+                self.requests += 1
+                self.bytes += len(body)
+                self.docs += sent
+                self.retries += len(retry)
+                self.errors.extend(errors)
+            self.adapt(latency, rejected=bool(retry))
+            if retry:
+                attempt += 1
+                self._wait(len(retry), attempt)
+            pending = retry
+
+    def _wait(self, count: int, attempt: int) -> None:
+        delay = backoff(attempt)
+        debug.lv3(f"Retrying {count} docs (attempt {attempt}) in {delay:.2f}s...")
+        time.sleep(delay)
+
+    def adapt(self, latency: t.Optional[float], rejected: bool = False) -> None:
+        """
+        Resize :py:attr:`chunk_docs` after a _bulk request
+
+        :param latency: How long the request took in seconds, or None if the whole
+            request was rejected
+        :param rejected: Whether the cluster rejected the request or any of its items
+        """
+        with self._lock:
+            if latency is not None:
+                self.max_latency = max(self.max_latency, latency)
+            current = self.chunk_docs
+            if rejected or (self.target_latency and latency > self.target_latency):
+                self.chunk_docs = max(self.min_chunk_docs, current // 2)
+            elif self.target_latency and latency < self.target_latency / 2:
+                step = max(1, self.max_chunk_docs // 10)
+                self.chunk_docs = min(self.max_chunk_docs, current + step)
+            if self.chunk_docs != current:
+                debug.lv3(f"Docs per _bulk request: {current} -> {self.chunk_docs}")
+
+    def _send_parallel(self, chunks: t.Iterable[t.List[bytes]]) -> None:
+        """
+        Send chunks from a pool of :py:attr:`workers` threads
+
+        The queue between the producer (this thread) and the senders holds at most
+        :py:attr:`queue_depth` chunks. After the first failure, the remaining queued
+        chunks are discarded and the exception is raised here.
+        """
+        workers = self._check_pool()
+        work = queue.Queue(maxsize=self.queue_depth)
+        failures = []
+
+        def worker() -> None:
+            client = self.client.options()  # Shares the transport and its pool
+            while True:
+                chunk = work.get()
+                if chunk is None:
+                    return
+                if failures:
+                    continue  # Drain the queue so the producer never blocks
+                try:
+                    self.send(chunk, client=client)
+                except Exception as err:  # pylint: disable=W0718
+                    failures.append(err)
+
+        threads = [
+            threading.Thread(target=worker, name=f"bulk-{self.name}-{num}")
+            for num in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for chunk in chunks:
+                if failures:
+                    break
+                work.put(chunk)
+        finally:
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
+        if failures:
+            raise failures[0]
+
+    def _check_pool(self) -> int:
+        """
+        Return how many workers to start: :py:attr:`workers`, or fewer if the
+        client's per-node connection pool is smaller, as the extra workers would
+        only wait for a free connection
+        """
+        try:
+            sizes = [
+                node.config.connections_per_node
+                for node in self.client.transport.node_pool.all()
+            ]
+        except (AttributeError, TypeError):
+            sizes = []
+        if sizes and min(sizes) < self.workers:
+            logger.warning(
+                f"Client connections_per_node ({min(sizes)}) is lower than the "
+                f"number of bulk workers ({self.workers}). Using {min(sizes)} "
+                f"workers. Build the client with connections_per_node >= "
+                f"{self.workers} to use them all."
+            )
+            return max(1, min(sizes))
+        return self.workers
+
+    def stats(self, seconds: float) -> t.Dict[str, t.Any]:
+        """
+        Return the ingest metrics of this loader
+
+        :param seconds: The wall time the load took
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "docs": self.docs,
+                "bytes": self.bytes,
+                "seconds": round(seconds, 3),
+                "docs_per_sec": round(self.docs / seconds, 1) if seconds > 0 else 0.0,
+                "requests": self.requests,
+                "retries": self.retries,
+            }
+
+    @begin_end()
+    def load(
+        self,
+        docs: t.Iterable[t.Any],
+        encoder: t.Callable[[t.Any], bytes] = encode_doc,
+    ) -> None:
+        """
+        Encode, chunk and send every document in docs
+
+        :param encoder: Returns a document as a single line of UTF-8 JSON
+
+        :raises TestbedFailure: If any document could not be indexed
+        """
+        self.load_lines(encoder(doc) for doc in docs)
+
+    @begin_end()
+    def load_lines(self, lines: t.Iterable[bytes]) -> None:
+        """
+        Chunk and send every already encoded document in lines
+
+        :raises TestbedFailure: If any document could not be indexed
+        """
+        chunks = self.chunks(lines)
+        if self.workers > 1:
+            debug.lv3(f"Sending with {self.workers} workers")
+            self._send_parallel(chunks)
+        else:
+            for chunk in chunks:
+                self.send(chunk)
+        debug.lv3(
+            f"Sent {self.docs} docs to {self.name} in {self.requests} _bulk requests"
+        )
+        if self.errors:
+            msg = (
+                f"{len(self.errors)} document(s) failed to index into {self.name}. "
+                f"First error: {prettystr(self.errors[0])}"
+            )
+            logger.error(msg)
+            raise TestbedFailure(msg)
@@ -0,0 +1,251 @@
+"""On-disk, content-addressed cache of generated documents"""
+
+import typing as t
+import logging
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from ..debug import debug, begin_end
+from ..defaults import CACHE_DEFAULT, CACHE_ENVVAR, CACHE_TIMESTAMP_FIELDS
+from .corpus import chunked_lines, mmap_lines
+from .timestamps import format_epoch
+
+logger = logging.getLogger(__name__)
+
+
+def generator_version(doc_generator: t.Callable) -> str:
+    """
+    Return the version of doc_generator for use in a cache key
+
+    A preset can declare ``GENERATOR_VERSION`` in its functions module. Otherwise,
+    a hash of the generator's source code is used, so editing the generator
+    invalidates its cached corpora. A generator that is a method of an object with
+    a ``version``, like a compiled
+    :py:class:`~.es_testbed.ingest.template.DocTemplate`, uses that.
+    """
+    owner = getattr(doc_generator, "__self__", None)
+    if getattr(owner, "version", None) is not None:
+        return str(owner.version)
+    module = inspect.getmodule(doc_generator)
+    version = getattr(module, "GENERATOR_VERSION", None)
+    if version is not None:
+        return str(version)
+    try:
+        source = inspect.getsource(doc_generator)
+    except (OSError, TypeError):
+        source = repr(doc_generator)
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def cacheable(doc_generator: t.Callable, options: t.Mapping) -> bool:
+    """
+    Return whether doc_generator(**options) generates the same docs every time,
+    so they can be cached
+
+    A preset declares ``CACHEABLE = False`` in its functions module if its docs
+    are random. A generator that is a method of an object with a ``cacheable``
+    attribute, like a compiled
+    :py:class:`~.es_testbed.ingest.template.DocTemplate`, uses that. A generator
+    that takes a ``seed`` is random if it gets none.
+    """
+    owner = getattr(doc_generator, "__self__", None)
+    if not getattr(owner, "cacheable", True):
+        return False
+    module = inspect.getmodule(doc_generator)
+    if not getattr(module, "CACHEABLE", True):
+        return False
+    try:
+        params = inspect.signature(doc_generator).parameters
+    except (TypeError, ValueError):
+        return True
+    if "seed" in params:
+        seed = options["seed"] if "seed" in options else params["seed"].default
+        if seed is None or seed is inspect.Parameter.empty:
+            return False
+    return True
+
+
+class TimestampRewriter:
+    """
+    Shift the values of timestamp fields in encoded documents by ``offset``
+    seconds, so the spacing between them stays as it was generated
+
+    Values that are not ISO8601 strings are left as they are.
+    """
+
+    def __init__(
+        self, fields: t.Sequence[str] = CACHE_TIMESTAMP_FIELDS, offset: float = 0.0
+    ):
+        names = b"|".join(re.escape(x.encode("utf-8")) for x in fields)
+        self.regex = re.compile(b'("(?:' + names + b')":)"([^"]*)"')
+        self.offset = offset
+
+    def _shift(self, match: "re.Match") -> bytes:
+        value = match.group(2).decode("utf-8")
+        try:
+            stamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return match.group(0)
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=timezone.utc)
+        shifted = format_epoch(stamp.timestamp() + self.offset)
+        return match.group(1) + b'"' + shifted.encode("utf-8") + b'"'
+
+    def __call__(self, line: bytes) -> bytes:
+        return self.regex.sub(self._shift, line)
+
+
+class CorpusCache:
+    """
+    Content-addressed cache of generated NDJSON corpora
+
+    The key is a hash of the preset's generator (module, name and version) and
+    the options it is called with. The value is the NDJSON the generator
+    produced, optionally gzip compressed, stored in ``path``.
+    """
+
+    def __init__(
+        self,
+        path: t.Optional[str] = None,
+        compress: bool = False,
+        timestamp_fields: t.Sequence[str] = CACHE_TIMESTAMP_FIELDS,
+    ):
+        debug.lv2("Initializing CorpusCache object...")
+        if path is None:
+            path = os.getenv(CACHE_ENVVAR, default=CACHE_DEFAULT)
+        self.path = Path(path).expanduser()
+        self.compress = compress
+        self.timestamp_fields = list(timestamp_fields)
+        debug.lv3("CorpusCache object initialized")
+
+    @classmethod
+    def from_settings(
+        cls, settings: t.Optional[t.Mapping[str, t.Any]] = None
+    ) -> t.Union["CorpusCache", None]:
+        """
+        Return a CorpusCache from the ``cache`` key of an entry's ``ingest``
+        settings, or None if caching is not enabled.
+
+        ``cache`` can be ``True``, or a dictionary with any of the keys ``path``,
+        ``compress`` and ``timestamp_fields``.
+        """
+        if not settings or "cache" not in settings or not settings["cache"]:
+            return None
+        cfg = settings["cache"]
+        if not isinstance(cfg, t.Mapping):
+            return cls()
+        keys = ("path", "compress", "timestamp_fields")
+        return cls(**{k: cfg[k] for k in keys if k in cfg})
+
+    def key(self, doc_generator: t.Callable, options: t.Mapping) -> str:
+        """Return the cache key for doc_generator(**options)"""
+        if hasattr(options, "toDict"):
+            options = options.toDict()
+        data = {
+            "module": doc_generator.__module__,
+            "name": doc_generator.__qualname__,
+            "version": generator_version(doc_generator),
+            "options": options,
+        }
+        raw = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def filename(self, key: str) -> Path:
+        """Return the path of the cached corpus for key"""
+        suffix = ".ndjson.gz" if self.compress else ".ndjson"
+        return self.path / f"{key}{suffix}"
+
+    def lookup(self, key: str) -> t.Union[Path, None]:
+        """Return the path to the cached corpus for key, if there is one"""
+        for compress in (self.compress, not self.compress):
+            suffix = ".ndjson.gz" if compress else ".ndjson"
+            path = self.path / f"{key}{suffix}"
+            if path.is_file():
+                debug.lv3(f"Corpus cache hit: {path}")
+                return path
+        debug.lv3(f"Corpus cache miss: {key}")
+        return None
+
+    def record(
+        self, key: str, lines: t.Iterable[bytes]
+    ) -> t.Generator[bytes, None, None]:
+        """
+        Yield every line while also writing it to the cache
+
+        The corpus is written to a temporary file that only replaces the final
+        file once every line was consumed, so an interrupted run never leaves a
+        partial corpus behind. Its modification time is set to when generating
+        started, which :py:meth:`replay` shifts the timestamps from.
+
+        Every writer, in any thread or process, gets a temporary file of its own.
+        If another writer stored the same corpus first, that one is kept.
+        """
+        generated = time.time()
+        self.path.mkdir(parents=True, exist_ok=True)
+        final = self.filename(key)
+        handle, name = tempfile.mkstemp(
+            dir=self.path, prefix=f"{final.name}.", suffix=".tmp"
+        )
+        os.close(handle)
+        tmp = Path(name)
+        opener = gzip.open if self.compress else open
+        done = False
+        try:
+            with opener(tmp, "wb") as fh:
+                for line in lines:
+                    fh.write(line + b"\n")
+                    yield line
+            try:
+                os.replace(tmp, final)
+            except OSError:
+                if not final.is_file():
+                    raise
+                debug.lv3(f"Corpus was stored in cache by another writer: {final}")
+                return
+            os.utime(final, (generated, generated))
+            done = True
+            debug.lv3(f"Stored corpus in cache: {final}")
+        finally:
+            if not done and tmp.exists():
+                tmp.unlink()
+
+    @begin_end()
+    def replay(self, path: Path) -> t.Generator[bytes, None, None]:
+        """
+        Yield the docs of a cached corpus, read as a corpus file is (see
+        :py:func:`~.es_testbed.ingest.corpus.mmap_lines`), with every timestamp
+        field shifted by how long ago the corpus was generated, so the
+        docs look as fresh as they did then, spread over time as they were
+        """
+        offset = time.time() - os.stat(path).st_mtime
+        debug.lv3(f"Shifting replayed timestamps by {offset:.0f} seconds")
+        rewrite = TimestampRewriter(self.timestamp_fields, offset=offset)
+        if path.name.endswith(".gz"):
+            with gzip.open(path, "rb") as gz:
+                yield from map(rewrite, chunked_lines(gz))
+            return
+        yield from map(rewrite, mmap_lines(path))
+
+
+def cached_lines(
+    cache: CorpusCache,
+    doc_generator: t.Callable,
+    options: t.Mapping,
+    generate: t.Callable[[], t.Iterable[bytes]],
+) -> t.Iterable[bytes]:
+    """
+    Replay the cached corpus for doc_generator(**options) if there is one.
+    Otherwise, generate it with ``generate()`` and record it on the way through.
+    """
+    key = cache.key(doc_generator, options)
+    path = cache.lookup(key)
+    if path is not None:
+        return cache.replay(path)
+    return cache.record(key, generate())
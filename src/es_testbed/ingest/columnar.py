@@ -0,0 +1,163 @@
+"""Columnar (batch) document generation for the _bulk ingestion engine"""
+
+import typing as t
+import logging
+import json
+from json.encoder import encode_basestring
+from ..debug import debug
+from ..defaults import GEN_BATCH_SIZE
+from ..exceptions import TestbedMisconfig
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY: bool = np is not None
+"""Whether NumPy, which batch generators need, is installed"""
+
+logger = logging.getLogger(__name__)
+
+Batch = t.Mapping[str, t.Sequence[t.Any]]
+"""
+Type alias for one batch of docs: a column of values per field, keyed by the
+field's dotted path, e.g. ``{'number': array([1, 2]), 'deep.l1.l2.l3': [...]}``
+"""
+
+BatchGenerator = t.Callable[..., t.Iterable[Batch]]
+"""Type alias for a preset's batch_generator function"""
+
+
+def template(fields: t.Sequence[str]) -> t.Tuple[str, t.List[int]]:
+    """
+    Return a ``%`` format string for a doc with the dotted field paths in fields,
+    and the order in which the fields' encoded values must be passed to it
+
+    >>> template(['b', 'a.x', 'a.y'])
+    ('{"b":%s,"a":{"x":%s,"y":%s}}', [0, 1, 2])
+
+    :raises TestbedMisconfig: If a field is both a value and an object
+    """
+    tree = {}
+    for num, field in enumerate(fields):
+        node = tree
+        parts = field.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise TestbedMisconfig(f"Field {field} is inside a value field")
+        if parts[-1] in node:
+            raise TestbedMisconfig(f"Field {field} is also an object field")
+        node[parts[-1]] = num
+    order = []
+
+    def render(node: t.Dict) -> str:
+        items = []
+        for key, value in node.items():
+            name = encode_basestring(key).replace("%", "%%")
+            if isinstance(value, dict):
+                items.append(f"{name}:{render(value)}")
+            else:
+                order.append(value)
+                items.append(f"{name}:%s")
+        return "{" + ",".join(items) + "}"
+
+    return render(tree), order
+
+
+def _encode_value(value: t.Any) -> str:
+    if isinstance(value, str):
+        return encode_basestring(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_column(values: t.Sequence[t.Any]) -> t.List[str]:
+    """
+    Return every value in a column as a JSON string
+
+    NumPy integer, boolean, float, datetime64 and string arrays are converted as
+    a whole. Anything else is converted one value at a time. Float NaN and
+    infinity, which JSON has no numbers for, are ``null``. Floats are written with
+    the fewest digits that read back the same value at their precision, so a
+    ``float32`` array is shorter than the same values as ``float64``.
+
+    Each row of a 2-D array, e.g. of ``dense_vector`` values, is one JSON array.
+    """
+    if np is not None and isinstance(values, np.ndarray):
+        if values.ndim > 1:
+            width = values.shape[1]
+            if width == 0:
+                return ["[]"] * len(values)
+            inner = encode_column(values.reshape(-1, *values.shape[2:]))
+            return [
+                "[" + ",".join(inner[num : num + width]) + "]"
+                for num in range(0, len(inner), width)
+            ]
+        kind = values.dtype.kind
+        if kind in "iu":
+            return values.astype(str).tolist()
+        if kind == "b":
+            return np.where(values, "true", "false").tolist()
+        if kind == "f":
+            encoded = values.astype(str).astype(object)
+            encoded[~np.isfinite(values)] = "null"
+            return encoded.tolist()
+        if kind == "M":
+            stamps = np.datetime_as_string(values).tolist()
+            return [f'"{stamp}Z"' for stamp in stamps]
+        if kind == "U":
+            return list(map(encode_basestring, values.tolist()))
+        values = values.tolist()
+    return list(map(_encode_value, values))
+
+
+def batch_to_lines(batch: Batch) -> t.List[bytes]:
+    """
+    Return the docs in a columnar batch, each as one line of UTF-8 encoded JSON
+
+    :raises TestbedMisconfig: If the columns are not all the same length
+    """
+    fields = list(batch.keys())
+    return encoded_lines(fields, [encode_column(batch[field]) for field in fields])
+
+
+def encoded_lines(
+    fields: t.Sequence[str], columns: t.Sequence[t.Sequence[str]]
+) -> t.List[bytes]:
+    """
+    Return the docs of already JSON encoded columns, one per dotted field path in
+    fields, each as one line of UTF-8 encoded JSON
+
+    :raises TestbedMisconfig: If the columns are not all the same length
+    """
+    if not fields:
+        return []
+    sizes = {len(column) for column in columns}
+    if len(sizes) > 1:
+        lengths = dict(zip(fields, map(len, columns)))
+        msg = f"Batch columns differ in length: {lengths}"
+        logger.critical(msg)
+        raise TestbedMisconfig(msg)
+    fmt, order = template(fields)
+    rows = zip(*[columns[num] for num in order])
+    return [(fmt % row).encode("utf-8") for row in rows]
+
+
+def batch_lines(
+    batch_generator: BatchGenerator,
+    options: t.Dict,
+    settings: t.Optional[t.Mapping[str, t.Any]] = None,
+) -> t.Generator[bytes, None, None]:
+    """
+    Yield the encoded docs of every batch from
+    ``batch_generator(batch_size=..., **options)``
+
+    ``batch_size`` comes from the ``ingest`` settings, or defaults to
+    :py:data:`~.es_testbed.defaults.GEN_BATCH_SIZE`.
+    """
+    batch_size = GEN_BATCH_SIZE
+    if settings and "batch_size" in settings:
+        batch_size = int(settings["batch_size"])
+    debug.lv3(f"Generating docs in batches of {batch_size}")
+    for batch in batch_generator(batch_size=batch_size, **options):
+        yield from batch_to_lines(batch)
@@ -0,0 +1,292 @@
+"""Existing NDJSON, CSV, Parquet and Arrow corpus files as a source of docs"""
+
+# pylint: disable=R0902,R0913,R0917
+import typing as t
+import logging
+import csv
+import gzip
+import io
+import json
+import mmap
+import os
+from importlib import import_module
+from itertools import islice
+from pathlib import Path
+from ..debug import debug, begin_end
+from ..defaults import CORPUS_BATCH_ROWS, CORPUS_READ_BYTES
+from ..exceptions import TestbedMisconfig
+from .arrow import arrow_lines
+from .bulk import encode_doc
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS: t.Tuple[str, ...] = ("ndjson", "csv", "parquet", "arrow")
+"""The corpus file formats"""
+
+FORMAT_SUFFIXES: t.Dict[str, str] = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+"""The format of a corpus file, by file name suffix. Anything else is NDJSON."""
+
+COMPRESSIONS: t.Dict[str, str] = {".gz": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+"""The compression of a corpus file, by file name suffix"""
+
+Transform = t.Callable[[t.Dict[str, t.Any]], t.Optional[t.Dict[str, t.Any]]]
+"""Type alias for a function that changes a doc, or returns None to drop it"""
+
+
+def mmap_lines(path: t.Union[str, Path]) -> t.Generator[bytes, None, None]:
+    """Yield every non-empty line of an uncompressed file, using memory-mapped reads"""
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            end = len(mm)
+            while pos < end:
+                nl = mm.find(b"\n", pos)
+                if nl == -1:
+                    nl = end
+                line = mm[pos:nl].rstrip(b"\r")
+                if line:
+                    yield line
+                pos = nl + 1
+
+
+def chunked_lines(
+    stream: t.BinaryIO, size: int = CORPUS_READ_BYTES
+) -> t.Generator[bytes, None, None]:
+    """Yield every non-empty line of stream, read size bytes at a time"""
+    rest = b""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if line:
+                yield line
+    rest = rest.rstrip(b"\r")
+    if rest:
+        yield rest
+
+
+def get_transform(transform: t.Union[str, Transform, None]) -> t.Optional[Transform]:
+    """
+    Return the transform function for transform: a callable, or the import path
+    of one, as ``package.module:function``
+
+    :raises TestbedMisconfig: If transform cannot be imported
+    """
+    if transform is None or callable(transform):
+        return transform
+    modname, _, funcname = str(transform).partition(":")
+    try:
+        return getattr(import_module(modname), funcname)
+    except (ImportError, AttributeError, ValueError) as err:
+        msg = f'Unable to import corpus transform "{transform}": {err}'
+        logger.critical(msg)
+        raise TestbedMisconfig(msg) from err
+
+
+def nest(row: t.Mapping[str, str], fields: t.Mapping[str, str]) -> t.Dict:
+    """
+    Return a doc with the value of each column of row in fields under its mapped,
+    dotted field path. Empty values are left out.
+
+    >>> nest({'ts': '2024', 'host': 'a'}, {'ts': '@timestamp', 'host': 'host.name'})
+    {'@timestamp': '2024', 'host': {'name': 'a'}}
+    """
+    doc = {}
+    for column, field in fields.items():
+        value = row.get(column)
+        if value is None or value == "":
+            continue
+        node = doc
+        parts = field.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return doc
+
+
+class Corpus:
+    """
+    A file of existing docs that an ``index_buildlist`` entry fills its index from,
+    instead of a generator
+
+    :param path: The path of the file. ``~`` is expanded.
+    :param format: ``ndjson`` (one JSON doc per line), ``csv`` (with a header
+        row), ``parquet`` or ``arrow`` (IPC file or stream format, or Feather V2).
+        Defaults to the one the file name suffix implies (see
+        :py:data:`FORMAT_SUFFIXES`), or ``ndjson``.
+    :param compression: ``gzip``, ``zstd`` or None. Defaults to the one the file
+        name suffix implies (``.gz``, ``.zst``). Parquet files are compressed
+        internally, so they cannot be.
+    :param fields: For CSV, the field path (dotted for nested objects) of each
+        column, by column name. Columns not listed are left out. Defaults to every
+        column, as a field of the same name.
+    :param transform: A function that takes a doc and returns it changed, or None
+        to drop it, or its import path (``package.module:function``)
+    :param start_at: How many docs at the start of the file to skip
+    :param count: The most docs to read. Defaults to the whole file.
+    :param read_bytes: Bytes read at a time from a compressed file
+    :param batch_rows: Rows read at a time from a Parquet file, and the most rows
+        of an Arrow record batch converted at a time
+
+    Uncompressed NDJSON and Arrow files are read through ``mmap``. Without a
+    ``transform``, NDJSON lines are sent as they are, never decoded, and Parquet and
+    Arrow record batches are converted to NDJSON a column at a time (see
+    :py:func:`~.es_testbed.ingest.arrow.record_batch_lines`), so only one record
+    batch is in memory at a time.
+
+    :raises TestbedMisconfig: If the file does not exist, or the format,
+        compression or transform is invalid
+    """
+
+    def __init__(
+        self,
+        path: t.Union[str, Path],
+        format: t.Optional[str] = None,  # pylint: disable=W0622
+        compression: t.Optional[str] = None,
+        fields: t.Optional[t.Mapping[str, str]] = None,
+        transform: t.Union[str, Transform, None] = None,
+        start_at: int = 0,
+        count: t.Optional[int] = None,
+        read_bytes: int = CORPUS_READ_BYTES,
+        batch_rows: int = CORPUS_BATCH_ROWS,
+    ):
+        debug.lv2("Initializing Corpus object...")
+        self.path = Path(path).expanduser()
+        if not self.path.is_file():
+            msg = f"Corpus file not found: {self.path}"
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        suffixes = [x.lower() for x in self.path.suffixes]
+        if compression is None:
+            compression = COMPRESSIONS.get(suffixes[-1] if suffixes else "")
+        if compression not in (None, *COMPRESSIONS.values()):
+            msg = f'Corpus compression must be gzip, zstd or None, not "{compression}"'
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        if compression == "zstd" and zstandard is None:
+            msg = "zstandard is not installed. Unable to read a zstd compressed corpus"
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        if format is None:
+            known = [FORMAT_SUFFIXES[x] for x in suffixes if x in FORMAT_SUFFIXES]
+            format = known[-1] if known else "ndjson"
+        if format not in FORMATS:
+            msg = f'Corpus format must be one of {FORMATS}, not "{format}"'
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        if format == "parquet" and compression is not None:
+            msg = f"A Parquet corpus cannot be {compression} compressed: {self.path}"
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        self.format = format
+        self.compression = compression
+        self.fields = dict(fields) if fields else None
+        self.transform = get_transform(transform)
+        self.start_at = max(0, int(start_at))
+        self.count = None if count is None else max(0, int(count))
+        self.read_bytes = max(1, int(read_bytes))
+        self.batch_rows = max(1, int(batch_rows))
+        debug.lv3("Corpus object initialized")
+
+    @classmethod
+    def from_settings(
+        cls, settings: t.Union[str, t.Mapping[str, t.Any], None]
+    ) -> t.Union["Corpus", None]:
+        """
+        Return a Corpus from the ``corpus`` of an ``index_buildlist`` entry: a path,
+        or a dictionary of the keyword arguments of Corpus. None if there is none.
+        """
+        if not settings:
+            return None
+        if isinstance(settings, (str, Path)):
+            return cls(settings)
+        if hasattr(settings, "toDict"):
+            settings = settings.toDict()
+        return cls(**settings)
+
+    def _open(self) -> t.BinaryIO:
+        if self.compression == "gzip":
+            return gzip.open(self.path, "rb")
+        raw = open(self.path, "rb")  # pylint: disable=R1732
+        if self.compression == "zstd":
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+            return io.BufferedReader(reader, buffer_size=self.read_bytes)
+        return raw
+
+    def raw_lines(self) -> t.Generator[bytes, None, None]:
+        """
+        Yield every non-empty line of the (decompressed) file, or for Parquet and
+        Arrow, every row as a line of NDJSON
+        """
+        if self.format in ("parquet", "arrow"):
+            if self.compression is None:
+                yield from arrow_lines(self.path, self.format, self.batch_rows)
+                return
+            with self._open() as stream:
+                yield from arrow_lines(
+                    self.path, self.format, self.batch_rows, stream=stream
+                )
+            return
+        if self.compression is None:
+            yield from mmap_lines(self.path)
+            return
+        with self._open() as stream:
+            yield from chunked_lines(stream, self.read_bytes)
+
+    def rows(self) -> t.Generator[t.Dict[str, str], None, None]:
+        """Yield every row of a CSV file, as a dictionary keyed by column name"""
+        with self._open() as stream:
+            text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+            reader = csv.DictReader(text)
+            fields = self.fields or {name: name for name in reader.fieldnames or []}
+            for row in reader:
+                yield nest(row, fields)
+
+    def docs(self) -> t.Iterable[t.Dict[str, t.Any]]:
+        """Yield the docs of the file as dictionaries, transformed"""
+        if self.format == "csv":
+            docs = self.rows()
+        else:
+            docs = map(json.loads, self.raw_lines())
+        docs = self._window(docs)
+        if self.transform is None:
+            return docs
+        return (doc for doc in map(self.transform, docs) if doc is not None)
+
+    def _window(self, items: t.Iterable) -> t.Iterable:
+        end = None if self.count is None else self.start_at + self.count
+        return islice(items, self.start_at, end)
+
+    @begin_end()
+    def lines(
+        self, encoder: t.Callable[[t.Any], bytes] = encode_doc
+    ) -> t.Iterable[bytes]:
+        """
+        Return the docs of the file, each as one line of UTF-8 JSON for _bulk
+
+        NDJSON without a transform is passed through, and Parquet and Arrow files
+        are converted a record batch at a time. CSV rows, and docs that need a
+        transform, are encoded with encoder.
+        """
+        if self.format != "csv" and self.transform is None:
+            debug.lv3(f"Passing the lines of {self.path} through")
+            return self._window(self.raw_lines())
+        return map(encoder, self.docs())
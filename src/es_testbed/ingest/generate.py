@@ -0,0 +1,303 @@
+"""Document generation sources for the _bulk ingestion engine"""
+
+import typing as t
+import logging
+import inspect
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from importlib import import_module
+from itertools import chain
+from ..debug import debug, begin_end
+from ..defaults import GEN_PARTITION_DOCS
+from .bulk import encode_doc
+from .cache import CorpusCache, cacheable, cached_lines
+from .columnar import HAS_NUMPY, BatchGenerator, batch_lines
+from .pools import pool_settings
+from .template import DocTemplate
+from .timestamps import TimestampSeries
+
+logger = logging.getLogger(__name__)
+
+DocGenerator = t.Callable[..., t.Iterable[t.Any]]
+"""Type alias for a preset's doc_generator function"""
+
+
+def partitions(
+    count: int, start_at: int = 0, size: int = GEN_PARTITION_DOCS
+) -> t.List[t.Tuple[int, int]]:
+    """
+    Split the range of ``count`` documents beginning at ``start_at`` into
+    consecutive ``(start_at, count)`` sub-ranges of at most ``size`` documents
+    """
+    size = max(1, int(size))
+    return [
+        (begin, min(size, start_at + count - begin))
+        for begin in range(start_at, start_at + count, size)
+    ]
+
+
+def preset_generators(
+    modpath: str,
+) -> t.Tuple[t.Optional[DocGenerator], t.Optional[BatchGenerator]]:
+    """
+    Return the ``doc_generator`` of the preset at modpath, and its
+    ``batch_generator`` if it has one and NumPy is installed
+
+    A preset without a ``doc_generator`` can declare a ``doc_template`` (and its
+    ``keyword_pools``) instead, which is compiled into one. See
+    :py:class:`~.es_testbed.ingest.template.DocTemplate`.
+    """
+    mod = import_module(f"{modpath}.functions")
+    doc_generator = getattr(mod, "doc_generator", None)
+    if doc_generator is None and hasattr(mod, "doc_template"):
+        debug.lv3("Compiling the preset's doc_template")
+        pools = getattr(mod, "keyword_pools", None)
+        doc_generator = DocTemplate(mod.doc_template, pools).doc_generator
+    batch = getattr(mod, "batch_generator", None)
+    if batch is not None and not HAS_NUMPY:
+        logger.warning("NumPy is not installed. Not using the batch_generator.")
+        batch = None
+    return doc_generator, batch
+
+
+def range_options(
+    doc_generator: DocGenerator, options: t.Dict
+) -> t.Union[t.Tuple[int, int], None]:
+    """
+    Return the ``(start_at, count)`` range doc_generator would produce with options,
+    or None if doc_generator does not take both ``count`` and ``start_at``
+    """
+    try:
+        params = inspect.signature(doc_generator).parameters
+    except (TypeError, ValueError):
+        return None
+    values = {}
+    for key in ("start_at", "count"):
+        if key in options:
+            values[key] = options[key]
+        elif key in params and params[key].default is not inspect.Parameter.empty:
+            values[key] = params[key].default
+        else:
+            return None
+    return int(values["start_at"]), int(values["count"])
+
+
+def encode_range(
+    doc_generator: DocGenerator,
+    options: t.Dict,
+    start_at: int,
+    count: int,
+    encoder: t.Callable[[t.Any], bytes] = encode_doc,
+) -> bytes:
+    """
+    Generate ``count`` docs beginning at ``start_at`` and return them as one
+    NDJSON blob. This runs in a worker process.
+    """
+    kwargs = dict(options)
+    kwargs.update({"start_at": start_at, "count": count})
+    docs = doc_generator(**kwargs)
+    return b"\n".join([x if isinstance(x, bytes) else encoder(x) for x in docs])
+
+
+def process_lines(
+    doc_generator: DocGenerator,
+    options: t.Dict,
+    processes: int,
+    partition_docs: int = GEN_PARTITION_DOCS,
+    encoder: t.Callable[[t.Any], bytes] = encode_doc,
+) -> t.Generator[bytes, None, None]:
+    """
+    Spread the sub-ranges of the generator's ``start_at``/``count`` range across a
+    process pool, yielding the encoded docs in their original order.
+
+    At most two sub-ranges per process are in flight at once, so memory use is
+    bounded by ``partition_docs`` rather than by ``count``. The encoder must be
+    picklable, i.e. a module level function.
+    """
+    start_at, count = range_options(doc_generator, options)
+    parts = partitions(count, start_at=start_at, size=partition_docs)
+    debug.lv3(f"Generating {count} docs in {len(parts)} parts on {processes} procs")
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for begin, size in parts:
+            if len(pending) >= processes * 2:
+                yield from _split(pending.popleft().result())
+            pending.append(
+                pool.submit(encode_range, doc_generator, options, begin, size, encoder)
+            )
+        while pending:
+            yield from _split(pending.popleft().result())
+
+
+def _split(blob: bytes) -> t.List[bytes]:
+    return blob.split(b"\n") if blob else []
+
+
+@begin_end()
+def doc_lines(
+    doc_generator: DocGenerator,
+    options: t.Optional[t.Dict] = None,
+    settings: t.Optional[t.Mapping[str, t.Any]] = None,
+    encoder: t.Callable[[t.Any], bytes] = encode_doc,
+    batch_generator: t.Optional[BatchGenerator] = None,
+) -> t.Iterable[bytes]:
+    """
+    Return an iterable of docs from doc_generator(**options), each encoded with
+    encoder (see :py:func:`~.es_testbed.ingest.serializer.get_encoder`)
+
+    If a batch_generator is provided, docs come from its columnar batches instead
+    (see :py:func:`~.es_testbed.ingest.columnar.batch_lines`), and neither
+    doc_generator, encoder nor ``processes`` are used.
+
+    If the ``ingest`` settings enable the ``cache``, a cached corpus for the same
+    generator and options is replayed instead of calling the generator, and a
+    missing one is recorded. Docs generated with ``match: False``, or by a
+    generator that is not :py:func:`~.es_testbed.ingest.cache.cacheable`, are
+    random, so they are never cached.
+
+    If the ``ingest`` settings ask for more than one of ``processes``, and
+    doc_generator takes ``count`` and ``start_at``, generation and encoding are
+    done in a process pool. Otherwise it happens in this process.
+
+    A ``timestamps`` option is resolved into a fixed window once, here (see
+    :py:meth:`~.es_testbed.ingest.timestamps.TimestampSeries.resolve`), so every
+    part of the range spreads its docs over the same window. So is the ``origin``
+    of every value pool in a ``pools`` option (see :py:func:`resolve_pools`), and
+    any random choice the preset makes for the whole range (see
+    :py:func:`resolve_preset`).
+    """
+    if not options:
+        options = {}
+    source = doc_generator if batch_generator is None else batch_generator
+    kwargs = resolve_range(source, options)
+    generate = partial(generated_lines, doc_generator, kwargs, settings, encoder)
+    if batch_generator is not None:
+        generate = partial(batch_lines, batch_generator, kwargs, settings)
+    cache = CorpusCache.from_settings(settings)
+    if cache is not None:
+        if "match" in options and not options["match"]:
+            debug.lv3("Docs with match: False are random. Not using the cache.")
+        elif not cacheable(source, options):
+            debug.lv3("The generator's docs are random. Not using the cache.")
+        else:
+            return cached_lines(cache, source, options, generate)
+    return generate()
+
+
+def resolve_range(source: t.Callable, options: t.Dict) -> t.Dict:
+    """
+    Return options with everything that must be the same for every part of the
+    range of docs source will generate resolved once: the preset's own random
+    choices, the ``timestamps`` window and the ``origin`` of the value ``pools``
+    """
+    return resolve_pools(
+        source, resolve_timestamps(source, resolve_preset(source, options))
+    )
+
+
+def resolve_preset(source: t.Callable, options: t.Dict) -> t.Dict:
+    """
+    Return options as resolved by the ``resolve_options`` function of the preset
+    module source is from, if it has one
+
+    A preset that makes random choices once per range of docs, like random field
+    names, makes them there and passes them on in the options. Otherwise every
+    part of a range generated in parts, or in separate processes, would choose
+    differently.
+    """
+    resolve = getattr(inspect.getmodule(source), "resolve_options", None)
+    if resolve is None:
+        return options
+    retval = resolve(dict(options))
+    debug.lv5(f"Options resolved by the preset: {retval}")
+    return retval
+
+
+def resolve_timestamps(source: t.Callable, options: t.Dict) -> t.Dict:
+    """
+    Return options with its ``timestamps`` settings resolved for the range of docs
+    source will generate, if source takes them
+
+    Without a ``timestamps`` option, the default window (every doc is stamped
+    now) is resolved, so every part of the range has the same now.
+    """
+    if "timestamps" in options and options["timestamps"]:
+        settings = options["timestamps"]
+    elif _takes(source, "timestamps"):
+        settings = {}
+    else:
+        return options
+    rng = range_options(source, options)
+    if rng is None:
+        return options
+    retval = dict(options)
+    retval["timestamps"] = TimestampSeries.resolve(settings, rng[1], rng[0])
+    debug.lv5(f"Resolved timestamps: {retval['timestamps']}")
+    return retval
+
+
+def _takes(source: t.Callable, name: str) -> bool:
+    try:
+        return name in inspect.signature(source).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def resolve_pools(source: t.Callable, options: t.Dict) -> t.Dict:
+    """
+    Return options with the ``origin`` of every value pool in its ``pools``
+    setting set to the first doc of the range source will generate, unless set, so
+    every part of the range covers the values of an exact pool together (see
+    :py:class:`~.es_testbed.ingest.pools.ValuePool`)
+    """
+    if "pools" not in options or not options["pools"]:
+        return options
+    rng = range_options(source, options)
+    if rng is None:
+        return options
+    retval = dict(options)
+    retval["pools"] = {
+        field: {"origin": rng[0], **pool}
+        for field, pool in pool_settings(options["pools"]).items()
+    }
+    debug.lv5(f"Resolved pools: {retval['pools']}")
+    return retval
+
+
+def generated_lines(
+    doc_generator: DocGenerator,
+    options: t.Dict,
+    settings: t.Optional[t.Mapping[str, t.Any]] = None,
+    encoder: t.Callable[[t.Any], bytes] = encode_doc,
+) -> t.Iterable[bytes]:
+    """
+    Return encoded docs from doc_generator, in a process pool if so configured
+
+    A doc_generator that yields bytes, like
+    :py:meth:`~.es_testbed.ingest.template.DocTemplate.doc_generator`, yields
+    already encoded docs. They are passed through as they are.
+    """
+    processes = 1
+    if settings and "processes" in settings:
+        processes = int(settings["processes"])
+    if processes > 1:
+        if range_options(doc_generator, options) is not None:
+            partition_docs = GEN_PARTITION_DOCS
+            if "partition_docs" in settings:
+                partition_docs = settings["partition_docs"]
+            return process_lines(
+                doc_generator, options, processes, partition_docs, encoder
+            )
+        logger.warning(
+            f"{getattr(doc_generator, '__name__', doc_generator)} does not accept "
+            f"count and start_at. Generating docs in a single process."
+        )
+    docs = iter(doc_generator(**options))
+    first = next(docs, None)
+    if first is None:
+        return iter(())
+    if isinstance(first, bytes):
+        debug.lv3("doc_generator yields encoded docs. Passing them through.")
+        return chain([first], docs)
+    return (encoder(doc) for doc in chain([first], docs))
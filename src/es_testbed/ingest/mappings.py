@@ -0,0 +1,210 @@
+"""Explicit index mappings inferred from sample generated docs"""
+
+import typing as t
+import logging
+import inspect
+import json
+import re
+from copy import deepcopy
+from importlib import import_module
+from itertools import islice
+from ..debug import debug, begin_end
+from ..exceptions import TestbedMisconfig
+from .generate import DocGenerator, doc_lines, preset_generators, range_options
+from .columnar import BatchGenerator
+from .corpus import Corpus
+from .pools import pool_mappings
+
+if t.TYPE_CHECKING:
+    from dotmap import DotMap
+
+logger = logging.getLogger(__name__)
+
+DATE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}"
+    r"(?:[T ]\d{2}:\d{2}(?::\d{2}(?:[.,]\d{1,9})?)?(?:Z|[+-]\d{2}:?\d{2})?)?$"
+)
+"""Matches the ISO8601 date strings Elasticsearch maps as ``date`` by default"""
+
+WIDER: t.Dict[t.FrozenSet[str], str] = {
+    frozenset(("long", "double")): "double",
+    frozenset(("date", "keyword")): "keyword",
+}
+"""The type that fits the values of a field seen with both types"""
+
+
+def value_type(value: t.Any) -> t.Optional[str]:
+    """
+    Return the field type for a single (non-object) JSON value, or None for a
+    null value, which cannot be mapped
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str) and DATE.match(value):
+        return "date"
+    return "keyword"
+
+
+def _merge_field(path: str, old: t.Dict, new: t.Dict) -> t.Dict:
+    if "properties" in old and "properties" in new:
+        _merge_props(path, old["properties"], new["properties"])
+        return old
+    if "properties" in old or "properties" in new:
+        msg = f"Field {path} is both an object and a value in the sample docs"
+        logger.critical(msg)
+        raise TestbedMisconfig(msg)
+    if old["type"] == new["type"]:
+        return old
+    wider = WIDER.get(frozenset((old["type"], new["type"])))
+    if wider is None:
+        msg = f"Field {path} is both {old['type']} and {new['type']} in the sample docs"
+        logger.critical(msg)
+        raise TestbedMisconfig(msg)
+    return {"type": wider}
+
+
+def _merge_props(path: str, props: t.Dict, other: t.Dict) -> None:
+    for key, field in other.items():
+        name = f"{path}.{key}" if path else key
+        props[key] = _merge_field(name, props[key], field) if key in props else field
+
+
+def _field(path: str, value: t.Any) -> t.Optional[t.Dict]:
+    if isinstance(value, t.Mapping):
+        props = _properties(value, path)
+        return {"properties": props} if props else None
+    if isinstance(value, (list, tuple)):
+        retval = None
+        for item in value:
+            field = _field(path, item)
+            if field is not None:
+                retval = field if retval is None else _merge_field(path, retval, field)
+        return retval
+    kind = value_type(value)
+    return {"type": kind} if kind else None
+
+
+def _properties(doc: t.Mapping[str, t.Any], path: str = "") -> t.Dict:
+    props = {}
+    for key, value in doc.items():
+        name = f"{path}.{key}" if path else key
+        field = _field(name, value)
+        if field is not None:
+            props[key] = field
+    return props
+
+
+def infer_mappings(docs: t.Iterable[t.Mapping[str, t.Any]]) -> t.Dict:
+    """
+    Return the ``properties`` of an explicit mapping that fits every field of docs
+
+    Strings that look like ISO8601 dates are ``date``, other strings ``keyword``,
+    integers ``long``, other numbers ``double``, and objects have ``properties``.
+    The values of an array are mapped like separate values of its field. A field
+    seen as both ``long`` and ``double`` is ``double``, and as both ``date`` and
+    ``keyword`` is ``keyword``. Fields that are only ever null, an empty array or
+    an empty object are left out, as no type can be inferred for them.
+
+    :raises TestbedMisconfig: If a field's values have any other mix of types
+    """
+    props = {}
+    for doc in docs:
+        _merge_props("", props, _properties(doc))
+    return {"properties": props}
+
+
+def merge_mappings(mappings: t.Mapping, extra: t.Mapping) -> t.Dict:
+    """
+    Return a copy of mappings with every field of extra that it does not have
+
+    Fields both have keep their definition from mappings, except that fields
+    of their ``properties`` that only extra has are added.
+    """
+    retval = deepcopy(dict(mappings))
+    props = retval.setdefault("properties", {})
+    for key, field in extra.get("properties", {}).items():
+        if key not in props:
+            props[key] = deepcopy(field)
+        elif "properties" in props[key] and "properties" in field:
+            props[key] = merge_mappings(props[key], field)
+    return retval
+
+
+def sample_docs(
+    doc_generator: t.Optional[DocGenerator],
+    options: t.Optional[t.Dict],
+    count: int,
+    batch_generator: t.Optional[BatchGenerator] = None,
+) -> t.List[t.Dict]:
+    """
+    Return up to count docs generated with options, decoded from the NDJSON that
+    would be sent, so encoded and columnar docs are sampled the same way
+
+    The ``count`` option is replaced with count, if the generator takes one.
+    """
+    options = dict(options or {})
+    source = doc_generator if batch_generator is None else batch_generator
+    if range_options(source, options) is not None:
+        options["count"] = count
+    lines = doc_lines(doc_generator, options, batch_generator=batch_generator)
+    return [json.loads(line) for line in islice(lines, count)]
+
+
+@begin_end()
+def preset_mappings(plan: "DotMap") -> t.Dict:
+    """
+    Return what the plan's preset ``definitions.mappings()`` returns, completed
+    with a mapping inferred from sample docs, and made strict, if the plan says so
+
+    A preset's ``mappings()`` that takes a ``plan`` argument is passed the plan,
+    so it can fit the mappings to it, like the ``dims`` of a ``dense_vector``.
+
+    Every field of a ``pools`` option of an ``index_buildlist`` entry the preset
+    does not map is mapped as a ``keyword`` (see
+    :py:class:`~.es_testbed.ingest.pools.ValuePool`), so it can be aggregated on.
+
+    * ``infer_mappings``: How many docs to sample from the preset's generator for
+      each ``index_buildlist`` entry, with the entry's ``options``, or from its
+      ``corpus`` file (see :py:class:`~.es_testbed.ingest.corpus.Corpus`). The
+      inferred fields are merged into the preset's mappings (see
+      :py:func:`merge_mappings`), so every field is mapped before the first doc is
+      indexed, and ingest never waits on a dynamic mapping update.
+    * ``strict_mappings``: If True, set ``dynamic: strict``, so a doc with a field
+      that is not mapped is rejected instead of changing the mapping.
+    """
+    func = import_module(f"{plan.modpath}.definitions").mappings
+    if "plan" in inspect.signature(func).parameters:
+        retval = func(plan=plan)
+    else:
+        retval = func()
+    count = int(plan.infer_mappings) if "infer_mappings" in plan else 0
+    strict = bool(plan.strict_mappings) if "strict_mappings" in plan else False
+    pooled = {}
+    if "index_buildlist" in plan:
+        pooled = pool_mappings(plan.index_buildlist)
+    if count <= 0 and not strict and not pooled:
+        return retval
+    mappings = dict(retval.get("mappings") or {})
+    if pooled:
+        mappings = merge_mappings(mappings, pooled)
+    if count > 0:
+        doc_generator, batch = preset_generators(plan.modpath)
+        docs = []
+        for scheme in plan.index_buildlist:
+            corpus = Corpus.from_settings(scheme.get("corpus"))
+            if corpus is not None:
+                docs.extend(islice(corpus.docs(), count))
+                continue
+            docs.extend(sample_docs(doc_generator, scheme["options"], count, batch))
+        inferred = infer_mappings(docs)
+        debug.lv5(f"Inferred mappings from {len(docs)} docs: {inferred}")
+        mappings = merge_mappings(mappings, inferred)
+    if strict:
+        mappings["dynamic"] = "strict"
+    return {**retval, "mappings": mappings}
@@ -0,0 +1,206 @@
+"""Value pools: keyword values with an exact cardinality and a chosen skew"""
+
+import typing as t
+import logging
+import zlib
+from functools import lru_cache
+from ..debug import debug
+from ..exceptions import TestbedMisconfig
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+GOLDEN: int = 0x9E3779B97F4A7C15
+"""The 64-bit golden ratio, which spreads the seeds of uniform()"""
+
+
+@lru_cache(maxsize=16)
+def zipf_cdf(size: int, skew: float) -> "np.ndarray":
+    """
+    Return the cumulative distribution of ranks 0 to size - 1, each with a
+    probability proportional to ``1 / (rank + 1) ** skew``
+    """
+    weights = 1.0 / np.arange(1, size + 1, dtype=np.float64) ** skew
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    cdf.setflags(write=False)
+    return cdf
+
+
+def zipf_ranks(
+    rng: "np.random.Generator", size: int, skew: float, count: int
+) -> "np.ndarray":
+    """Return count ranks from 0 to size - 1, drawn from a Zipf distribution"""
+    cdf = zipf_cdf(size, skew)
+    return np.minimum(np.searchsorted(cdf, rng.random(count), side="right"), size - 1)
+
+
+def uniform(nums: "np.ndarray", key: int) -> "np.ndarray":
+    """
+    Return a number in [0, 1) for every doc number in nums, the SplitMix64 hash of
+    the number and key, so it does not depend on how docs are batched
+    """
+    mixed = nums.astype(np.uint64) + np.uint64((key * GOLDEN) % (1 << 64))
+    mixed ^= mixed >> np.uint64(30)
+    mixed *= np.uint64(0xBF58476D1CE4E5B9)
+    mixed ^= mixed >> np.uint64(27)
+    mixed *= np.uint64(0x94D049BB133111EB)
+    mixed ^= mixed >> np.uint64(31)
+    return (mixed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def pool_settings(
+    pools: t.Optional[t.Mapping[str, t.Any]],
+) -> t.Dict[str, t.Dict[str, t.Any]]:
+    """
+    Return the ``pools`` option of an ``index_buildlist`` entry with every pool as
+    a dictionary of ValuePool keyword arguments. A pool may be just a cardinality.
+
+    >>> pool_settings({'host': 50, 'user': {'cardinality': 1000, 'skew': 1.2}})
+    {'host': {'cardinality': 50}, 'user': {'cardinality': 1000, 'skew': 1.2}}
+    """
+    retval = {}
+    for field, value in (pools or {}).items():
+        if hasattr(value, "toDict"):
+            value = value.toDict()
+        retval[field] = (
+            dict(value) if isinstance(value, t.Mapping) else {"cardinality": value}
+        )
+    return retval
+
+
+class ValuePool:
+    """
+    N unique keyword values (``{prefix}-{rank}``, zero padded), sampled uniformly
+    or with a power-law skew
+
+    With ``exact``, the N docs from doc number ``origin`` on get every value once,
+    in a seeded random order, so a range of at least N docs has exactly N distinct
+    values. The rest of the docs are sampled.
+
+    :param cardinality: The number of unique values, N
+    :param prefix: What every value starts with, usually the field name
+    :param skew: 0 samples uniformly. Above 0, value rank r is sampled with a
+        probability proportional to ``1 / r ** skew``, like the hot keys of real
+        data. 1 is a classic Zipf distribution.
+    :param exact: Whether the docs from origin on cover every value (see above)
+    :param origin: The number of the first doc of the range. Resolved once for
+        the whole range by :py:func:`~.es_testbed.ingest.generate.doc_lines`, so
+        the parts generated in a process pool do not each cover every value.
+    :param seed: Seeds the sampling, with the doc number and the prefix, so docs
+        get the same values however they are batched, and fields with different
+        prefixes are not correlated
+
+    :raises TestbedMisconfig: If NumPy is not installed, cardinality is below 1 or
+        skew is negative
+    """
+
+    def __init__(
+        self,
+        cardinality: int,
+        prefix: str = "value",
+        skew: float = 0.0,
+        exact: bool = True,
+        seed: int = 0,
+        origin: int = 0,
+    ):
+        debug.lv2("Initializing ValuePool object...")
+        if np is None:
+            msg = "NumPy is not installed. Value pools require it."
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        self.cardinality = int(cardinality)
+        if self.cardinality < 1:
+            raise TestbedMisconfig(f"cardinality must be at least 1: {cardinality}")
+        self.skew = float(skew)
+        if self.skew < 0:
+            raise TestbedMisconfig(f"skew cannot be negative: {skew}")
+        self.prefix = prefix
+        self.exact = bool(exact)
+        self.seed = int(seed)
+        self.origin = int(origin)
+        width = len(str(self.cardinality - 1))
+        ranks = np.arange(self.cardinality).astype(str)
+        #: Every value of the pool, by rank
+        self.values = np.char.add(f"{prefix}-", np.char.zfill(ranks, width))
+        self._key = zlib.crc32(prefix.encode("utf-8"))
+        self._order = None
+        debug.lv3("ValuePool object initialized")
+
+    @property
+    def order(self) -> "np.ndarray":
+        """The seeded random order in which a range covers every rank"""
+        if self._order is None:
+            rng = np.random.default_rng([self.seed, self._key, self.cardinality])
+            self._order = rng.permutation(self.cardinality)
+        return self._order
+
+    def ranks(self, nums: "np.ndarray") -> "np.ndarray":
+        """Return the value rank of each doc number in nums"""
+        draws = uniform(nums, self.seed ^ self._key)
+        if self.skew > 0:
+            cdf = zipf_cdf(self.cardinality, self.skew)
+            retval = np.searchsorted(cdf, draws, side="right")
+        else:
+            retval = (draws * self.cardinality).astype(np.int64)
+        retval = np.minimum(retval, self.cardinality - 1)
+        if self.exact:
+            offsets = nums - self.origin
+            cover = (offsets >= 0) & (offsets < self.cardinality)
+            retval[cover] = self.order[offsets[cover]]
+        return retval
+
+    def take(self, nums: "np.ndarray") -> "np.ndarray":
+        """Return the value of each doc number in nums"""
+        return self.values[self.ranks(nums)]
+
+
+def expected_cardinality(
+    pool: t.Mapping[str, t.Any], count: t.Optional[int]
+) -> t.Optional[int]:
+    """
+    Return how many distinct values count docs get from a pool with the settings
+    in pool (see :py:func:`pool_settings`), or None if that cannot be known,
+    because the pool is not ``exact``
+    """
+    if ("exact" in pool and not pool["exact"]) or count is None:
+        return None
+    return min(int(pool["cardinality"]), int(count))
+
+
+def value_pools(
+    pools: t.Optional[t.Mapping[str, t.Any]], seed: int = 0, origin: int = 0
+) -> t.Dict[str, ValuePool]:
+    """
+    Return a ValuePool for every field in the ``pools`` option of an
+    ``index_buildlist`` entry (see :py:func:`pool_settings`). Its prefix is the
+    field name, and its seed and origin those passed here, unless set.
+    """
+    retval = {}
+    for field, kwargs in pool_settings(pools).items():
+        kwargs.setdefault("prefix", field)
+        kwargs.setdefault("seed", seed)
+        kwargs.setdefault("origin", origin)
+        retval[field] = ValuePool(**kwargs)
+    return retval
+
+
+def pool_mappings(buildlist: t.Optional[t.Iterable[t.Mapping]]) -> t.Dict:
+    """
+    Return a ``keyword`` mapping for every ``pools`` field of the entries in an
+    ``index_buildlist``, dotted field names as object properties
+    """
+    retval = {}
+    for scheme in buildlist or []:
+        options = scheme.get("options") or {}
+        for field in pool_settings(options.get("pools")):
+            props = retval
+            parts = field.split(".")
+            for part in parts[:-1]:
+                props = props.setdefault(part, {"properties": {}})["properties"]
+            props[parts[-1]] = {"type": "keyword"}
+    return {"properties": retval} if retval else {}
@@ -0,0 +1,117 @@
+"""Pluggable JSON encoders for documents and client request bodies"""
+
+import typing as t
+import logging
+from importlib import import_module
+from ..debug import debug, begin_end
+from ..exceptions import TestbedMisconfig
+from .bulk import encode_doc
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if t.TYPE_CHECKING:
+    from elasticsearch8 import Elasticsearch
+
+logger = logging.getLogger(__name__)
+
+Encoder = t.Callable[[t.Any], bytes]
+"""Type alias for a function returning a document as one line of UTF-8 JSON"""
+
+SERIALIZERS: t.Tuple[str, ...] = ("json", "orjson", "preset")
+"""Names accepted as a ``serializer``, in addition to a callable"""
+
+JSON_MIMETYPES: t.Tuple[str, ...] = (
+    "application/json",
+    "application/vnd.elasticsearch+json",
+)
+"""Mimetypes of the client's serializers replaced by the orjson serializer"""
+
+
+def orjson_doc(doc: t.Any) -> bytes:
+    """Return ``doc`` as a compact, single line of UTF-8 encoded JSON using orjson"""
+    return orjson.dumps(doc, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+@begin_end()
+def get_encoder(
+    serializer: t.Union[str, Encoder, None] = None,
+    modpath: t.Optional[str] = None,
+) -> Encoder:
+    """
+    Return the document encoder for serializer
+
+    :param serializer: ``json`` (the default), ``orjson``, ``preset`` or a
+        callable. ``orjson`` falls back to ``json`` if orjson is not installed.
+        ``preset`` uses the ``serializer`` function in the preset's
+        ``functions.py``, falling back to ``json`` if there is none.
+    :param modpath: The preset module path, needed for ``preset``
+
+    :raises TestbedMisconfig: If serializer is not a known name or a callable
+    """
+    if callable(serializer):
+        return serializer
+    if serializer is None or serializer == "json":
+        return encode_doc
+    if serializer == "orjson":
+        if orjson is None:
+            logger.warning("orjson is not installed. Using json to encode docs.")
+            return encode_doc
+        return orjson_doc
+    if serializer == "preset":
+        func = None
+        if modpath:
+            func = getattr(import_module(f"{modpath}.functions"), "serializer", None)
+        if func is None:
+            logger.warning("Preset has no serializer function. Using json.")
+            return encode_doc
+        return func
+    msg = f'serializer must be a callable or one of {SERIALIZERS}, not "{serializer}"'
+    logger.critical(msg)
+    raise TestbedMisconfig(msg)
+
+
+@begin_end()
+def install_serializer(
+    client: "Elasticsearch", serializer: t.Union[str, Encoder, None] = None
+) -> t.Dict[str, t.Any]:
+    """
+    Replace the JSON serializers of client with orjson-backed ones, if serializer
+    is ``orjson`` and orjson is installed. Every view of the client made with
+    ``client.options()`` shares them.
+
+    Other serializers only encode documents, as a callable may not handle every
+    request body the client sends.
+
+    :returns: The replaced serializers, for :py:func:`restore_serializer`
+    """
+    if serializer != "orjson" or orjson is None:
+        return {}
+    # pylint: disable=C0415
+    from elasticsearch8.serializer import OrjsonSerializer
+
+    collection = client.transport.serializers
+    saved = {"default": collection.default_serializer}
+    for mimetype in JSON_MIMETYPES:
+        if mimetype in collection.serializers:
+            saved[mimetype] = collection.serializers[mimetype]
+            collection.serializers[mimetype] = OrjsonSerializer()
+    collection.default_serializer = collection.serializers[JSON_MIMETYPES[0]]
+    debug.lv3("Client JSON serializers replaced with OrjsonSerializer")
+    return saved
+
+
+@begin_end()
+def restore_serializer(client: "Elasticsearch", saved: t.Dict[str, t.Any]) -> None:
+    """Put back the client serializers replaced by :py:func:`install_serializer`"""
+    if not saved:
+        return
+    collection = client.transport.serializers
+    for mimetype, serializer in saved.items():
+        if mimetype == "default":
+            collection.default_serializer = serializer
+        else:
+            collection.serializers[mimetype] = serializer
+    debug.lv3("Client JSON serializers restored")
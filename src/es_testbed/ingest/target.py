@@ -0,0 +1,159 @@
+"""Fill an index until it reaches a target size, instead of a doc count"""
+
+import typing as t
+import logging
+import re
+from ..debug import debug
+from ..defaults import TARGET_CHECK_DOCS
+from ..exceptions import TestbedMisconfig
+
+logger = logging.getLogger(__name__)
+
+UNITS: t.Dict[str, int] = {
+    "b": 1,
+    "kb": 1 << 10,
+    "mb": 1 << 20,
+    "gb": 1 << 30,
+    "tb": 1 << 40,
+    "pb": 1 << 50,
+}
+"""Byte size units, as Elasticsearch uses them (powers of 1024)"""
+
+SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgtp]?b)?\s*$", re.IGNORECASE)
+
+IndexStats = t.Dict[str, int]
+"""
+The ``docs`` indexed into, and ``store_bytes`` of, the primary shards of an index,
+and its number of primary ``shards``
+"""
+
+
+def parse_size(value: t.Union[str, int, float]) -> int:
+    """
+    Return a byte size, like ``512mb`` or ``1.5gb``, in bytes
+
+    >>> parse_size('1.5kb')
+    1536
+
+    :raises TestbedMisconfig: If value is not a byte size
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    match = SIZE.match(str(value))
+    if not match:
+        raise TestbedMisconfig(f'"{value}" is not a byte size, like 512mb or 5gb')
+    return int(float(match.group(1)) * UNITS[(match.group(2) or "b").lower()])
+
+
+class FillTarget:
+    """
+    When to stop filling an index, by its size rather than a doc count
+
+    Docs are generated a round of :py:attr:`check_docs` at a time. Before every
+    round, the size of the index is checked, and generation stops once it is at
+    least ``store_size`` (primaries only) or ``docs_per_shard``, whichever comes
+    first. As docs still in flight are not counted yet, the index overshoots its
+    target by about a round.
+
+    :param store_size: The target store size of the index's primary shards, as
+        bytes or a byte size, like ``5gb``
+    :param docs_per_shard: The target number of docs in each primary shard
+    :param check_docs: How many docs to generate between checks
+    :param max_docs: The most docs to generate, whether the target is reached or
+        not. No limit by default.
+
+    :raises TestbedMisconfig: If neither target is set, or a setting is not positive
+    """
+
+    settings_keys = (
+        "target_store_size",
+        "target_docs_per_shard",
+        "target_check_docs",
+        "target_max_docs",
+    )
+    """The keys of the ``ingest`` settings that set a FillTarget"""
+
+    def __init__(
+        self,
+        store_size: t.Union[str, int, None] = None,
+        docs_per_shard: t.Optional[int] = None,
+        check_docs: int = TARGET_CHECK_DOCS,
+        max_docs: t.Optional[int] = None,
+    ):
+        debug.lv2("Initializing FillTarget object...")
+        self.store_size = None if store_size is None else parse_size(store_size)
+        self.docs_per_shard = None if docs_per_shard is None else int(docs_per_shard)
+        self.check_docs = int(check_docs)
+        self.max_docs = None if max_docs is None else int(max_docs)
+        if self.store_size is None and self.docs_per_shard is None:
+            raise TestbedMisconfig("Set a target store_size or docs_per_shard")
+        for name in ("store_size", "docs_per_shard", "check_docs", "max_docs"):
+            value = getattr(self, name)
+            if value is not None and value < 1:
+                raise TestbedMisconfig(f"{name} must be at least 1, not {value}")
+        debug.lv3("FillTarget object initialized")
+
+    @classmethod
+    def from_settings(
+        cls, settings: t.Optional[t.Mapping[str, t.Any]] = None
+    ) -> t.Union["FillTarget", None]:
+        """
+        Return a FillTarget from the ``target_*`` keys (see :py:attr:`settings_keys`)
+        of an entry's ``ingest`` settings, or None if neither
+        ``target_store_size`` nor ``target_docs_per_shard`` is set
+        """
+        if not settings:
+            return None
+        kwargs = {
+            key[len("target_") :]: settings[key]
+            for key in cls.settings_keys
+            if key in settings and settings[key] is not None
+        }
+        if "store_size" not in kwargs and "docs_per_shard" not in kwargs:
+            return None
+        return cls(**kwargs)
+
+    def reached(self, stats: IndexStats) -> bool:
+        """Return whether an index with stats has reached the target"""
+        if self.store_size is not None and stats["store_bytes"] >= self.store_size:
+            return True
+        if self.docs_per_shard is not None:
+            shards = max(1, stats["shards"])
+            return stats["docs"] / shards >= self.docs_per_shard
+        return False
+
+    def lines(
+        self,
+        generate: t.Callable[[int, int], t.Iterable[bytes]],
+        check: t.Callable[[], IndexStats],
+        start_at: int = 0,
+    ) -> t.Generator[bytes, None, None]:
+        """
+        Yield the encoded docs of ``generate(start_at, count)``, a round at a time,
+        until ``check()`` says the index has reached the target, or
+        :py:attr:`max_docs` docs were generated
+        """
+        total = 0
+        while True:
+            stats = check()
+            debug.lv3(f"Index stats after {total} docs: {stats}")
+            if self.reached(stats):
+                logger.info(f"Reached the fill target after {total} docs: {stats}")
+                return
+            count = self.check_docs
+            if self.max_docs is not None:
+                count = min(count, self.max_docs - total)
+                if count <= 0:
+                    logger.warning(
+                        f"Stopped at max_docs ({self.max_docs}) before reaching the "
+                        f"fill target: {stats}"
+                    )
+                    return
+            generated = 0
+            for line in generate(start_at + total, count):
+                generated += 1
+                yield line
+            if not generated:
+                logger.warning(f"No more docs were generated after {total} docs")
+                return
+            total += generated
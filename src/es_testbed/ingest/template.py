@@ -0,0 +1,185 @@
+"""Compiled document templates that render NDJSON bytes directly"""
+
+import typing as t
+import logging
+import hashlib
+import json
+import random
+import re
+from json.encoder import encode_basestring
+from ..debug import debug
+from ..exceptions import TestbedMisconfig
+from .timestamps import timestamp_series
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(
+    r"\{(seq|ts|rand_int:(-?\d+):(-?\d+)|keyword_pool:([^{}:]+))\}"
+)
+"""Matches ``{seq}``, ``{ts}``, ``{rand_int:MIN:MAX}`` and ``{keyword_pool:NAME}``"""
+
+RENDER_BATCH: int = 1000
+"""Number of docs whose placeholder values are drawn at a time"""
+
+
+def _escaped(value: str) -> str:
+    """Return value JSON escaped, without the quotes"""
+    return encode_basestring(value)[1:-1]
+
+
+def _literal(value: str) -> str:
+    """Return value JSON escaped, without the quotes, and safe for % formatting"""
+    return _escaped(value).replace("%", "%%")
+
+
+class DocTemplate:
+    """
+    A fixed JSON document shape with placeholders, compiled once into a format
+    string that renders each doc straight to a line of NDJSON bytes
+
+    Placeholders may be used as whole string values, or inside them:
+
+    * ``{seq}``: The number of the doc, from ``start_at``
+    * ``{rand_int:MIN:MAX}``: A random integer from MIN to MAX, inclusive
+    * ``{keyword_pool:NAME}``: A random value from the list ``pools[NAME]``
+    * ``{ts}``: The doc's timestamp (see
+      :py:class:`~.es_testbed.ingest.timestamps.TimestampSeries`)
+
+    ``{seq}`` and ``{rand_int}`` as a whole value render as JSON numbers, e.g.
+    ``{"number": "{seq}"}`` renders ``{"number":42}``.
+
+    :param template: The document, as a dictionary or a JSON string
+    :param pools: Lists of values, by name, for ``{keyword_pool:NAME}``
+
+    :raises TestbedMisconfig: If the template is not valid JSON, or refers to a
+        pool that was not provided
+    """
+
+    def __init__(
+        self,
+        template: t.Union[str, t.Mapping[str, t.Any]],
+        pools: t.Optional[t.Mapping[str, t.Sequence[t.Any]]] = None,
+    ):
+        debug.lv2("Initializing DocTemplate object...")
+        if isinstance(template, str):
+            try:
+                template = json.loads(template)
+            except ValueError as err:
+                msg = f"Document template is not valid JSON: {err}"
+                logger.critical(msg)
+                raise TestbedMisconfig(msg) from err
+        if hasattr(template, "toDict"):
+            template = template.toDict()
+        self.pools = {
+            name: [_escaped(str(value)) for value in values]
+            for name, values in (pools or {}).items()
+        }
+        #: The kind and arguments of each placeholder, in format string order
+        self.slots: t.List[t.Tuple[str, t.Tuple]] = []
+        #: The compiled ``%`` format string of a single doc
+        self.fmt = self._compile(template)
+        raw = json.dumps([self.fmt, self.pools], sort_keys=True).encode("utf-8")
+        #: Identifies the template and pools in corpus cache keys
+        self.version = hashlib.sha256(raw).hexdigest()
+        debug.lv5(f"Compiled template: {self.fmt}")
+        debug.lv3("DocTemplate object initialized")
+
+    @property
+    def cacheable(self) -> bool:
+        """
+        Whether the docs can be cached. Not if ``{rand_int}`` or
+        ``{keyword_pool}`` draw random values.
+        """
+        return not any(kind in ("rand_int", "keyword_pool") for kind, _ in self.slots)
+
+    def _slot(self, match: t.Match) -> str:
+        kind = match.group(1).split(":", 1)[0]
+        args = ()
+        msg = None
+        if kind == "rand_int":
+            args = (int(match.group(2)), int(match.group(3)))
+            if args[0] > args[1]:
+                msg = f'Document template "{match.group(0)}" has MIN above MAX'
+        elif kind == "keyword_pool":
+            args = (match.group(4),)
+            if args[0] not in self.pools:
+                msg = f'Document template uses undefined keyword_pool "{args[0]}"'
+            elif not self.pools[args[0]]:
+                msg = f'Document template "{match.group(0)}" uses an empty pool'
+        if msg:
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        self.slots.append((kind, args))
+        return kind
+
+    def _compile(self, node: t.Any) -> str:
+        if isinstance(node, t.Mapping):
+            items = [
+                f'"{_literal(str(k))}":{self._compile(v)}' for k, v in node.items()
+            ]
+            return "{" + ",".join(items) + "}"
+        if isinstance(node, (list, tuple)):
+            return "[" + ",".join(self._compile(value) for value in node) + "]"
+        if not isinstance(node, str):
+            return json.dumps(node).replace("%", "%%")
+        whole = PLACEHOLDER.fullmatch(node)
+        if whole and self._slot(whole) in ("seq", "rand_int"):
+            return "%s"
+        if whole:
+            return '"%s"'
+        parts = []
+        pos = 0
+        for match in PLACEHOLDER.finditer(node):
+            parts.append(_literal(node[pos : match.start()]))
+            self._slot(match)
+            parts.append("%s")
+            pos = match.end()
+        parts.append(_literal(node[pos:]))
+        return '"' + "".join(parts) + '"'
+
+    def _column(self, kind: str, args: t.Tuple, begin: int, end: int, series) -> t.List:
+        size = end - begin
+        if kind == "seq":
+            return list(range(begin, end))
+        if kind == "rand_int":
+            return random.choices(range(args[0], args[1] + 1), k=size)
+        if kind == "keyword_pool":
+            return random.choices(self.pools[args[0]], k=size)
+        return series.strings(begin, end)
+
+    def doc_generator(
+        self,
+        count: int = 10,
+        start_at: int = 0,
+        timestamps: t.Optional[t.Dict] = None,
+        **ignored: t.Any,
+    ) -> t.Generator[bytes, None, None]:
+        """
+        Yield ``count`` rendered docs, numbered from ``start_at``, as NDJSON lines
+
+        This is a drop-in ``doc_generator`` for a preset: the docs are already
+        encoded, so they are sent as they are.
+
+        :param timestamps: How to spread ``{ts}`` over time. See
+            :py:func:`~.es_testbed.ingest.timestamps.timestamp_series`
+        :param ignored: Other ``options`` of the ``index_buildlist`` entry, which
+            a template has no use for
+        """
+        if ignored:
+            debug.lv5(f"Template ignores options: {list(ignored)}")
+        series = None
+        if any(kind == "ts" for kind, _ in self.slots):
+            series = timestamp_series(timestamps, count, start_at)
+        fmt = self.fmt
+        for begin in range(start_at, start_at + count, RENDER_BATCH):
+            end = min(begin + RENDER_BATCH, start_at + count)
+            if not self.slots:
+                line = fmt.replace("%%", "%").encode("utf-8")
+                yield from [line] * (end - begin)
+                continue
+            columns = [
+                self._column(kind, args, begin, end, series)
+                for kind, args in self.slots
+            ]
+            for row in zip(*columns):
+                yield (fmt % row).encode("utf-8")
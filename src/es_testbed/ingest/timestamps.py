@@ -0,0 +1,288 @@
+"""Timestamp series for generated documents"""
+
+# pylint: disable=R0902,R0913,R0917
+import typing as t
+import logging
+import math
+import random
+import re
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+from functools import lru_cache
+from ..debug import debug
+from ..exceptions import TestbedMisconfig
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS: t.Tuple[str, ...] = ("uniform", "bursty", "diurnal")
+"""The names of the distributions a TimestampSeries can spread docs with"""
+
+GRID: int = 4096
+"""Number of cells the density of a non-uniform distribution is tabulated on"""
+
+UNITS: t.Dict[str, int] = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+"""Seconds per unit of a relative time, e.g. ``now-2d``"""
+
+RELATIVE = re.compile(r"^(?:now)?\s*(?:([+-])\s*(\d+(?:\.\d+)?)\s*([smhdw]))?$")
+"""Matches ``now``, ``now-2d``, ``-6h``, ``now+30m``..."""
+
+HASH_MUL: int = 2654435761
+"""Knuth's multiplicative hash constant, used to jitter docs deterministically"""
+
+
+@lru_cache(maxsize=65536)
+def _second(epoch: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch))
+
+
+def format_epoch(epoch: float) -> str:
+    """
+    Return epoch (seconds, UTC) as an ISO8601 string with microseconds and a
+    trailing ``Z``, e.g. ``2024-04-16T16:00:00.000000Z``
+
+    The part up to the seconds is cached, so consecutive timestamps within the
+    same second only format their microseconds.
+    """
+    sec = math.floor(epoch)
+    micro = min(999999, int(round((epoch - sec) * 1e6)))
+    return f"{_second(sec)}.{micro:06d}Z"
+
+
+def parse_time(value: t.Union[str, float, int, None], now: float) -> float:
+    """
+    Return value as an epoch in seconds
+
+    :param value: An epoch in seconds, an ISO8601 string, or a time relative to
+        now: ``now``, ``now-2d``, ``-6h``, ``now+30m``. None means now.
+    :param now: The epoch that relative times are relative to
+
+    :raises TestbedMisconfig: If value cannot be parsed
+    """
+    if value is None:
+        return now
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = RELATIVE.match(value.strip())
+    if match and value.strip():
+        sign, amount, unit = match.groups()
+        if not sign:
+            return now
+        delta = float(amount) * UNITS[unit]
+        return now - delta if sign == "-" else now + delta
+    try:
+        stamp = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError as err:
+        msg = f'Unable to parse "{value}" as a time'
+        logger.critical(msg)
+        raise TestbedMisconfig(msg) from err
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def _density(
+    distribution: str,
+    start: float,
+    end: float,
+    rng: random.Random,
+    bursts: int,
+    burst_ratio: float,
+    burst_width: float,
+    amplitude: float,
+    peak_hour: float,
+) -> t.List[float]:
+    """Return the relative doc density of each GRID cell of the window"""
+    if distribution == "bursty":
+        width = max(1, int(GRID * burst_width))
+        boost = [0.0] * GRID
+        for _ in range(max(1, bursts)):
+            first = rng.randrange(0, GRID - width + 1)
+            for cell in range(first, first + width):
+                boost[cell] += burst_ratio * GRID / (width * max(1, bursts))
+        return [(1 - burst_ratio) + extra for extra in boost]
+    span = end - start
+    density = []
+    for cell in range(GRID):
+        hour = ((start + span * (cell + 0.5) / GRID) / 3600) % 24
+        density.append(1 + amplitude * math.cos(2 * math.pi * (hour - peak_hour) / 24))
+    return density
+
+
+class TimestampSeries:
+    """
+    Spread the timestamps of ``count`` docs over a window of time
+
+    Doc ``num`` of the series (``first <= num < first + count``) always gets the
+    same timestamp, so the docs of a range can be generated in any order or in
+    separate processes, as long as they share the same resolved settings (see
+    :py:meth:`resolve`). Timestamps never decrease with ``num``.
+
+    The window is ``start`` to ``end``. With a ``rate`` (docs per second), a
+    missing ``start`` or ``end`` is calculated from the other. A missing ``end`` is
+    now, and a missing ``start`` makes every doc have the ``end`` timestamp.
+
+    The ``distribution`` of docs over the window is one of:
+
+    * ``uniform``: evenly spread
+    * ``bursty``: ``burst_ratio`` of the docs fall in ``bursts`` short bursts, each
+      ``burst_width`` of the window wide, at random (``seed``) places
+    * ``diurnal``: a daily cycle, busiest at ``peak_hour`` (UTC) and ``amplitude``
+      (0 to 1) less busy twelve hours later
+    """
+
+    def __init__(
+        self,
+        count: int,
+        start: t.Union[str, float, None] = None,
+        end: t.Union[str, float, None] = None,
+        rate: t.Optional[float] = None,
+        distribution: str = "uniform",
+        first: int = 0,
+        seed: t.Optional[int] = None,
+        bursts: int = 5,
+        burst_ratio: float = 0.8,
+        burst_width: float = 0.02,
+        amplitude: float = 0.8,
+        peak_hour: float = 14.0,
+    ):
+        if distribution not in DISTRIBUTIONS:
+            msg = f'distribution must be one of {DISTRIBUTIONS}, not "{distribution}"'
+            logger.critical(msg)
+            raise TestbedMisconfig(msg)
+        now = time.time()
+        self.count = max(0, int(count))
+        self.first = int(first)
+        self.seed = int(seed) if seed is not None else random.getrandbits(32)
+        self.distribution = distribution
+        self.shape = {
+            "bursts": bursts,
+            "burst_ratio": burst_ratio,
+            "burst_width": burst_width,
+            "amplitude": amplitude,
+            "peak_hour": peak_hour,
+        }
+        end = parse_time(end, now) if end is not None or start is None else None
+        start = parse_time(start, now) if start is not None else None
+        if rate:
+            length = self.count / float(rate)
+            if start is None:
+                start = (end if end is not None else now) - length
+            if end is None:
+                end = start + length
+        if end is None:
+            end = now
+        if start is None:
+            start = end
+        if end < start:
+            raise TestbedMisconfig(f"Timestamp window ends before it starts: {start}")
+        self.start = start
+        self.end = end
+        self._cdf = None
+        if distribution != "uniform" and end > start:
+            rng = random.Random(self.seed)
+            density = _density(distribution, start, end, rng, **self.shape)
+            total = sum(density)
+            cdf = [0.0]
+            for value in density:
+                cdf.append(cdf[-1] + value / total)
+            cdf[-1] = 1.0
+            self._cdf = cdf
+        debug.lv5(
+            f"TimestampSeries: {self.count} docs from {format_epoch(self.start)} "
+            f"to {format_epoch(self.end)}, {distribution}"
+        )
+
+    @classmethod
+    def resolve(
+        cls,
+        settings: t.Optional[t.Mapping[str, t.Any]],
+        count: int,
+        start_at: int = 0,
+    ) -> t.Dict[str, t.Any]:
+        """
+        Return the settings of a series for ``count`` docs numbered from
+        ``start_at``, with the window as absolute epochs and a fixed seed
+
+        Settings that were already resolved are returned unchanged. Resolve them
+        once before generating a range of docs in parts.
+        """
+        settings = dict(settings or {})
+        if "first" in settings and "count" in settings:
+            return settings
+        series = cls(count=count, first=start_at, **settings)
+        return series.settings()
+
+    def settings(self) -> t.Dict[str, t.Any]:
+        """Return the resolved settings of this series"""
+        return {
+            "count": self.count,
+            "first": self.first,
+            "start": self.start,
+            "end": self.end,
+            "distribution": self.distribution,
+            "seed": self.seed,
+            **self.shape,
+        }
+
+    def _quantile(self, fraction: float) -> float:
+        cdf = self._cdf
+        if cdf is None:
+            return fraction
+        cell = min(GRID - 1, bisect_right(cdf, fraction) - 1)
+        low, high = cdf[cell], cdf[cell + 1]
+        inside = (fraction - low) / (high - low) if high > low else 0.0
+        return (cell + inside) / GRID
+
+    def _fraction(self, num: int) -> float:
+        jitter = ((num * HASH_MUL + self.seed) % 4294967296) / 4294967296
+        return (num - self.first + jitter) / self.count
+
+    def epoch(self, num: int) -> float:
+        """Return the timestamp of doc num as an epoch in seconds"""
+        if self.count == 0 or self.end == self.start:
+            return self.end
+        return self.start + (self.end - self.start) * self._quantile(
+            min(1.0, max(0.0, self._fraction(num)))
+        )
+
+    def strings(self, begin: int, end: int) -> t.List[str]:
+        """Return the ISO8601 timestamps of docs begin to end (exclusive)"""
+        if self.end == self.start:
+            return [format_epoch(self.end)] * max(0, end - begin)
+        return [format_epoch(self.epoch(num)) for num in range(begin, end)]
+
+    def datetime64(self, begin: int, end: int) -> "np.ndarray":
+        """
+        Return the timestamps of docs begin to end (exclusive) as a NumPy
+        ``datetime64[us]`` array, for a batch generator
+        """
+        nums = np.arange(begin, end, dtype=np.uint64)
+        if self.count == 0 or self.end == self.start:
+            epochs = np.full(len(nums), self.end)
+        else:
+            hashed = nums * np.uint64(HASH_MUL) + np.uint64(self.seed)
+            jitter = (hashed % np.uint64(4294967296)) / 4294967296
+            offset = nums.astype(np.float64) - self.first
+            fraction = np.clip((offset + jitter) / self.count, 0.0, 1.0)
+            if self._cdf is not None:
+                grid = np.linspace(0.0, 1.0, GRID + 1)
+                fraction = np.interp(fraction, np.asarray(self._cdf), grid)
+            epochs = self.start + (self.end - self.start) * fraction
+        micros = np.round(epochs * 1e6).astype(np.int64)
+        return micros.astype("datetime64[us]")
+
+
+def timestamp_series(
+    settings: t.Optional[t.Mapping[str, t.Any]], count: int, start_at: int = 0
+) -> TimestampSeries:
+    """
+    Return the TimestampSeries a doc generator should use for its ``timestamps``
+    option, given its ``count`` and ``start_at``
+    """
+    return TimestampSeries(**TimestampSeries.resolve(settings, count, start_at))
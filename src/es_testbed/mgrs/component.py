@@ -6,6 +6,7 @@ from importlib import import_module
 from ..debug import debug, begin_end
 from ..es_api import exists, put_comp_tmpl
 from ..exceptions import ResultNotExpected
+from ..ingest import preset_mappings
 from ..utils import prettystr
 from .entity import EntityMgr
 
@@ -45,7 +46,7 @@ class ComponentMgr(EntityMgr):
                     "index.lifecycle.rollover_alias"
                 ] = self.plan.rollover_alias
         retval.append(val)
-        retval.append(preset.mappings())
+        retval.append(preset_mappings(self.plan))
         return retval
 
     @begin_end()
@@ -3,10 +3,10 @@
 # pylint: disable=W0221
 import typing as t
 import logging
-from importlib import import_module
 from ..debug import debug, begin_end
 from ..entities import DataStream, Index
 from ..es_api import create_data_stream, fill_index
+from ..ilm import PolicyCache
 from ..utils import prettystr
 from .index import IndexMgr
 from .snapshot import SnapshotMgr
@@ -29,11 +29,14 @@ class DataStreamMgr(IndexMgr):
         client: t.Union["Elasticsearch", None] = None,
         plan: t.Union["DotMap", None] = None,
         snapmgr: t.Union[SnapshotMgr, None] = None,
+        policy_cache: t.Union[PolicyCache, None] = None,
     ):
         self.ds = None
         self.index_trackers = []
         debug.lv3("Initializing DataStreamMgr object...")
-        super().__init__(client=client, plan=plan, snapmgr=snapmgr)
+        super().__init__(
+            client=client, plan=plan, snapmgr=snapmgr, policy_cache=policy_cache
+        )
         debug.lv3("DataStreamMgr object initialized")
 
     @property
@@ -60,8 +63,7 @@ class DataStreamMgr(IndexMgr):
     @begin_end()
     def searchable(self):
         """If the indices were marked as searchable snapshots, we do that now"""
-        for idx, scheme in enumerate(self.plan.index_buildlist):
-            self.index_trackers[idx].mount_ss(scheme)
+        self.mount_all(list(zip(self.index_trackers, self.plan.index_buildlist)))
         logger.info("Completed backing index promotion to searchable snapshots.")
         debug.lv5(f"data_stream backing indices: {prettystr(self.ds.backing_indices)}")
 
@@ -69,26 +71,31 @@ class DataStreamMgr(IndexMgr):
     def setup(self) -> None:
         """Setup the entity manager"""
         self.index_trackers = []  # Inheritance oddity requires redeclaration here
-        mod = import_module(f"{self.plan.modpath}.functions")
-        func = getattr(mod, "doc_generator")
+        fillers = self.fillers()
         for scheme in self.plan.index_buildlist:
             if not self.entity_list:
                 self.add(self.name)
             else:
                 self.ds.rollover()
-            fill_index(
+            stats = fill_index(
                 self.client,
                 name=self.name,
-                doc_generator=func,
                 options=scheme["options"],
+                ingest=self.ingest_settings(scheme),
+                corpus=scheme.get("corpus"),
+                **fillers,
             )
+            self.plan.ingest_stats.append(stats)
         debug.lv2(f"Created data_stream: {self.ds.name}")
+        self.log_ingest_stats()
         debug.lv3(
             f"Created data_stream backing indices: {prettystr(self.ds.backing_indices)}"
         )
         for index in self.ds.backing_indices:
             self.track_index(index)
         self.ds.verify(self.indexlist)
+        self.deferred_refresh()
+        self.verify_cardinality()
         self.searchable()
         self.ds.verify(self.indexlist)
         logger.info("Successfully completed data_stream buildout.")
@@ -109,6 +116,8 @@ class DataStreamMgr(IndexMgr):
             name=name,
             snapmgr=self.snapmgr,
             policy_name=self.policy_name,
+            explain_cache=self.explain_cache,
+            policy_cache=self.policy_cache,
         )
         entity.track_ilm(name)
         self.index_trackers.append(entity)
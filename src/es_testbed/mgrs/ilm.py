@@ -5,6 +5,7 @@ import logging
 from ..debug import debug, begin_end
 from ..es_api import exists, put_ilm
 from ..exceptions import ResultNotExpected
+from ..ilm import PolicyCache
 from ..utils import build_ilm_policy
 from .entity import EntityMgr
 
@@ -25,9 +26,12 @@ class IlmMgr(EntityMgr):
         self,
         client: t.Union["Elasticsearch", None] = None,
         plan: t.Union["DotMap", None] = None,
+        policy_cache: t.Optional[PolicyCache] = None,
     ):
         """Initialize the ILM policy manager"""
         debug.lv2("Initializing IlmMgr object...")
+        #: The phases of every policy written, shared by every IlmTracker
+        self.policy_cache = policy_cache or PolicyCache(client)
         super().__init__(client=client, plan=plan)
         debug.lv3("IlmMgr object initialized")
 
@@ -60,8 +64,23 @@ class IlmMgr(EntityMgr):
                 )
             # This goes first because the length of entity_list determines the suffix
             self.appender(self.name)
+            # Trackers get the phases from what we just wrote, not a read-back
+            self.policy_cache.put(self.last, self.plan.ilm.policy)
             logger.info(f"Successfully created ILM policy: {self.last}")
-            debug.lv5(self.client.ilm.get_lifecycle(name=self.last))
         else:
             self.appender(None)  # This covers self.plan.ilm_policies[-1]
             logger.info("No ILM policy created.")
+
+    @begin_end()
+    def update_policy(self, policy: t.Dict) -> None:
+        """
+        Replace the ILM policy created by :py:meth:`setup` with policy, and the
+        phases IlmTrackers get from the policy cache with its phases
+        """
+        if not self.entity_list or not self.last:
+            raise ResultNotExpected("No ILM policy was created to update")
+        self.policy_cache.invalidate(self.last)
+        put_ilm(self.client, self.last, policy=policy)
+        self.plan.ilm.policy = policy
+        self.policy_cache.put(self.last, policy)
+        logger.info(f"Updated ILM policy: {self.last}")
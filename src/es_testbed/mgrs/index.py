@@ -2,10 +2,26 @@
 
 import typing as t
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from importlib import import_module
 from ..debug import debug, begin_end
+from ..defaults import (
+    CARDINALITY_PRECISION,
+    CARDINALITY_TOLERANCE,
+    FILL_CONCURRENCY,
+    MOUNT_CONCURRENCY,
+)
 from ..entities import Alias, Index
-from ..es_api import create_index, fill_index
+from ..exceptions import ResultNotExpected
+from ..ilm import ExplainCache, PolicyCache
+from ..ingest import (
+    expected_cardinality,
+    get_encoder,
+    pool_settings,
+    preset_generators,
+    preset_mappings,
+)
+from ..es_api import create_index, field_cardinality, fill_index, flush_refresh
 from ..utils import prettystr
 from .entity import EntityMgr
 from .snapshot import SnapshotMgr
@@ -28,9 +44,12 @@ class IndexMgr(EntityMgr):
         client: t.Optional["Elasticsearch"] = None,
         plan: t.Optional["DotMap"] = None,
         snapmgr: t.Optional[SnapshotMgr] = None,
+        policy_cache: t.Optional[PolicyCache] = None,
     ):
         self.snapmgr = snapmgr
+        self.policy_cache = policy_cache
         self.alias = None  # Only used for tracking the rollover alias
+        self._explain_cache = None
         debug.lv2("Initializing IndexMgr object...")
         super().__init__(client=client, plan=plan)
         debug.lv3("IndexMgr object initialized")
@@ -40,6 +59,42 @@ class IndexMgr(EntityMgr):
         """Return a list of index names currently being managed"""
         return [x.name for x in self.entity_list]
 
+    @property
+    def concurrency(self) -> int:
+        """
+        Return how many non-rollover indices may be created and filled at once,
+        from the plan-wide ``ingest`` settings
+        """
+        if "ingest" in self.plan and "concurrency" in self.plan.ingest:
+            return max(1, int(self.plan.ingest.concurrency))
+        return FILL_CONCURRENCY
+
+    @property
+    def mount_concurrency(self) -> int:
+        """
+        Return how many indices ILM may move to a searchable snapshot tier at once,
+        from ``ilm.mount_concurrency`` in the plan
+        """
+        if "ilm" in self.plan and "mount_concurrency" in self.plan.ilm:
+            return max(1, int(self.plan.ilm.mount_concurrency))
+        return MOUNT_CONCURRENCY
+
+    @property
+    def explain_cache(self) -> ExplainCache:
+        """
+        Return the ILM explain data shared by the IlmTracker of every index
+        managed, fetched for all of them at once
+        """
+        if self._explain_cache is None:
+            self._explain_cache = ExplainCache(self.client, self.pattern)
+        return self._explain_cache
+
+    @property
+    def encoder(self) -> t.Callable[[t.Any], bytes]:
+        """Return the document encoder for the plan's ``serializer``"""
+        serializer = self.plan.serializer if "serializer" in self.plan else None
+        return get_encoder(serializer, modpath=self.plan.modpath)
+
     @property
     def policy_name(self) -> t.Union[str, None]:
         """Return the name of the ILM policy, if it exists"""
@@ -78,26 +133,89 @@ class IndexMgr(EntityMgr):
         debug.lv5(f"-- with mappings: {mappings}")
         create_index(self.client, name, mappings=mapvals, settings=setvals)
 
+    @begin_end()
+    def _concurrent_path(
+        self, args, mappings: t.Dict, fillers: t.Dict[str, t.Any]
+    ) -> None:
+        """
+        This is the execution path for independent (non-rollover) indices
+
+        Every index is created and tracked up front, in ``index_buildlist`` order
+        and named as the sequential path names it, then up to
+        :py:attr:`concurrency` of them are filled at the same time. Names,
+        ``entity_list`` order and ``ingest_stats`` order do not depend on which
+        index finished filling first.
+
+        As every index is tracked as soon as it is created, teardown deletes it
+        whatever fails later. If a fill fails, the fills not started yet are
+        cancelled, and the first exception is raised once the others are done.
+        """
+        schemes = self.plan.index_buildlist
+        names = []
+        for _ in schemes:
+            name = self.name
+            self.add(name, mappings=mappings, settings=args.settings())
+            self.track_index(name)
+            names.append(name)
+        workers = min(self.concurrency, len(names))
+        debug.lv3(f"Filling {len(names)} indices with {workers} threads")
+        error = None
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fill") as pool:
+            futures = [
+                pool.submit(
+                    fill_index,
+                    self.client,
+                    name=name,
+                    options=scheme["options"],
+                    ingest=self.ingest_settings(scheme),
+                    corpus=scheme.get("corpus"),
+                    **fillers,
+                )
+                for name, scheme in zip(names, schemes)
+            ]
+            for name, future in zip(names, futures):
+                if future.cancelled():
+                    continue
+                if future.exception() is None:
+                    self.plan.ingest_stats.append(future.result())
+                elif error is None:
+                    error = future.exception()
+                    logger.error(f'Filling "{name}" failed: {error}')
+                    for pending in futures:
+                        pending.cancel()
+        if error is not None:
+            raise error
+
     @begin_end()
     def add_indices(self) -> None:
         """Add indices according to plan"""
         args = import_module(f"{self.plan.modpath}.definitions")
-        mod = import_module(f"{self.plan.modpath}.functions")
-        func = getattr(mod, "doc_generator")
+        fillers = self.fillers()
+        mappings = None if self.plan.rollover_alias else preset_mappings(self.plan)
+        concurrent = not self.plan.rollover_alias and self.concurrency > 1
+        if concurrent and len(self.plan.index_buildlist) > 1:
+            self._concurrent_path(args, mappings, fillers)
+            debug.lv2(f"Created indices: {prettystr(self.indexlist)}")
+            self.log_ingest_stats()
+            return
         for scheme in self.plan.index_buildlist:
             if self.plan.rollover_alias:
                 self._rollover_path()
             else:
-                self.add(self.name, mappings=args.mappings(), settings=args.settings())
+                self.add(self.name, mappings=mappings, settings=args.settings())
             # self.filler(scheme)
-            fill_index(
+            stats = fill_index(
                 self.client,
                 name=self.name,
-                doc_generator=func,
                 options=scheme["options"],
+                ingest=self.ingest_settings(scheme),
+                corpus=scheme.get("corpus"),
+                **fillers,
             )
+            self.plan.ingest_stats.append(stats)
             self.track_index(self.name)
         debug.lv2(f"Created indices: {prettystr(self.indexlist)}")
+        self.log_ingest_stats()
         if self.plan.rollover_alias:
             if not self.alias.verify(self.indexlist):
                 logger.error(
@@ -105,12 +223,107 @@ class IndexMgr(EntityMgr):
                     f'"{self.plan.rollover_alias}" was successful'
                 )
 
+    @begin_end()
+    def deferred_refresh(self) -> None:
+        """
+        Flush and refresh every testbed index at once, if any ``index_buildlist``
+        entry was filled with ``defer_refresh``
+        """
+        deferred = [
+            scheme
+            for scheme in self.plan.index_buildlist
+            if self.ingest_settings(scheme).get("defer_refresh")
+        ]
+        if not deferred:
+            return
+        pattern = f"*{self.plan.prefix}-*-{self.plan.uniq}*"
+        debug.lv3(f"Flushing and refreshing {pattern}")
+        shards = flush_refresh(self.client, pattern)
+        debug.lv3(f"Refreshed {shards.get('successful', 0)} shards of {pattern}")
+
+    @begin_end()
+    def fillers(self) -> t.Dict[str, t.Any]:
+        """
+        Return the preset's ``doc_generator``, its ``batch_generator`` if it has one
+        and NumPy is installed, and the plan's document encoder, as keyword
+        arguments for :py:func:`~.es_testbed.es_api.fill_index`
+
+        See :py:func:`~.es_testbed.ingest.generate.preset_generators`.
+        """
+        doc_generator, batch = preset_generators(self.plan.modpath)
+        return {
+            "doc_generator": doc_generator,
+            "batch_generator": batch,
+            "encoder": self.encoder,
+        }
+
+    @begin_end()
+    def ingest_settings(self, scheme: t.Dict) -> t.Dict:
+        """Return the plan-wide ``ingest`` settings, overridden by those of scheme"""
+        retval = {}
+        for source in (self.plan, scheme):
+            if "ingest" in source and source["ingest"]:
+                retval.update(source["ingest"])
+        debug.lv5(f"Return value = {retval}")
+        return retval
+
+    @begin_end()
+    def log_ingest_stats(self) -> None:
+        """Log the ingest metrics of every index filled, and their totals"""
+        stats = self.plan.ingest_stats
+        for item in stats:
+            logger.info(
+                f'Ingested {item["docs"]} docs ({item["bytes"]} bytes) into '
+                f'"{item["name"]}" in {item["seconds"]}s: {item["docs_per_sec"]} '
+                f'docs/s, {item["requests"]} _bulk requests, {item["retries"]} retries'
+            )
+        if len(stats) > 1:
+            docs = sum(x["docs"] for x in stats)
+            seconds = sum(x["seconds"] for x in stats)
+            rate = round(docs / seconds, 1) if seconds > 0 else 0.0
+            logger.info(
+                f"Ingested {docs} docs in total in {round(seconds, 3)}s: {rate} docs/s"
+            )
+
+    @begin_end()
+    def mount_all(self, pairs: t.Sequence[t.Tuple[Index, t.Dict]]) -> None:
+        """
+        Mount every (Index, scheme) pair as a searchable snapshot, if planned
+
+        Indices with an ILM policy wait on their own ILM steps, phases and renamed
+        indices, so up to :py:attr:`mount_concurrency` of them are moved at once.
+        Their snapshots are added to snapmgr afterwards, in the order of pairs, so
+        the snapshot list does not depend on which index finished first. Without a
+        policy, snapshots are taken and named one at a time, in order.
+        """
+        if not self.policy_name or self.mount_concurrency < 2 or len(pairs) < 2:
+            for entity, scheme in pairs:
+                entity.mount_ss(scheme)
+            return
+        workers = min(self.mount_concurrency, len(pairs))
+        debug.lv3(f"Mounting up to {len(pairs)} indices with {workers} threads")
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="mount"
+        ) as pool:
+            futures = [
+                pool.submit(entity.mount_ss, scheme, add_snapshot=False)
+                for entity, scheme in pairs
+            ]
+            mounted = [future.result() for future in futures]
+        for (entity, _), done in zip(pairs, mounted):
+            if done:
+                entity.record_snapshot()
+
     @begin_end()
     def searchable(self) -> None:
         """If the indices were marked as searchable snapshots, we do that now"""
-        for idx, scheme in enumerate(self.plan.index_buildlist):
-            if scheme["target_tier"] in ["cold", "frozen"]:
-                self.entity_list[idx].mount_ss(scheme)
+        self.mount_all(
+            [
+                (self.entity_list[idx], scheme)
+                for idx, scheme in enumerate(self.plan.index_buildlist)
+                if scheme["target_tier"] in ["cold", "frozen"]
+            ]
+        )
 
     @begin_end()
     def setup(self) -> None:
@@ -119,9 +332,61 @@ class IndexMgr(EntityMgr):
         if self.plan.rollover_alias:
             debug.lv3("rollover_alias is True...")
         self.add_indices()
+        self.deferred_refresh()
+        self.verify_cardinality()
         self.searchable()
         logger.info(f"Successfully created indices: {prettystr(self.indexlist)}")
 
+    @begin_end()
+    def verify_cardinality(self) -> None:
+        """
+        Count the distinct values of every ``pools`` field of every
+        ``index_buildlist`` entry in the index it filled, now that ingest is done,
+        and add them to the entry's ingest stats as ``cardinality``. The count
+        expected of a pool is based on the docs the entry ingested.
+
+        An ``exact`` pool (see :py:class:`~.es_testbed.ingest.pools.ValuePool`)
+        must have as many values as it promised. Counts above
+        :py:data:`~.es_testbed.defaults.CARDINALITY_PRECISION` are approximate, so
+        they may be off by up to
+        :py:data:`~.es_testbed.defaults.CARDINALITY_TOLERANCE`.
+
+        :raises ResultNotExpected: If an exact pool's count is off
+        """
+        for idx, scheme in enumerate(self.plan.index_buildlist):
+            options = scheme.get("options") or {}
+            pools = pool_settings(options.get("pools"))
+            if not pools or scheme.get("corpus"):
+                continue
+            name = self.indexlist[idx]
+            stats = None
+            docs = options.get("count")
+            if idx < len(self.plan.ingest_stats):
+                stats = self.plan.ingest_stats[idx]
+                docs = stats["docs"] if "docs" in stats else docs
+            counts = {}
+            for field, pool in pools.items():
+                counts[field] = field_cardinality(self.client, name, field)
+                expected = expected_cardinality(pool, docs)
+                logger.info(
+                    f'"{field}" has {counts[field]} distinct values in "{name}"'
+                    + ("" if expected is None else f" ({expected} expected)")
+                )
+                if expected is None:
+                    continue
+                allowed = 0
+                if expected > CARDINALITY_PRECISION:
+                    allowed = int(expected * CARDINALITY_TOLERANCE)
+                if abs(counts[field] - expected) > allowed:
+                    msg = (
+                        f'"{field}" has {counts[field]} distinct values in "{name}", '
+                        f"not {expected}"
+                    )
+                    logger.error(msg)
+                    raise ResultNotExpected(msg)
+            if stats is not None:
+                stats["cardinality"] = counts
+
     @begin_end()
     def track_alias(self) -> None:
         """Track a rollover alias"""
@@ -137,6 +402,8 @@ class IndexMgr(EntityMgr):
             name=name,
             snapmgr=self.snapmgr,
             policy_name=self.policy_name,
+            explain_cache=self.explain_cache,
+            policy_cache=self.policy_cache,
         )
         entity.track_ilm(self.name)
         self.entity_list.append(entity)
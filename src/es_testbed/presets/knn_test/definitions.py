@@ -0,0 +1,73 @@
+"""kNN (dense vector) Test Built-in Plan"""
+
+import typing as t
+import logging
+from pathlib import Path
+from json import loads
+from es_client.utils import get_yaml
+from es_testbed.exceptions import TestbedMisconfig
+from .functions import vector_options
+from .scenarios import Scenarios
+
+logger = logging.getLogger(__name__)
+
+
+def baseplan() -> dict:
+    """Return the base plan object from plan.yml"""
+    return get_yaml((modpath() / "plan.yml"))
+
+
+def buildlist() -> list:
+    """Return the list of index build schemas from buildlist.yml"""
+    return get_yaml((modpath() / "buildlist.yml"))
+
+
+def get_plan(scenario: t.Optional[str] = None) -> dict:
+    """Return the plan dict based on scenario"""
+    retval = baseplan()
+    retval.update(buildlist())
+    if scenario:
+        retval["uniq"] = f"scenario-{scenario}"
+        scenarios = Scenarios()
+        newvals = getattr(scenarios, scenario)
+        ilm = newvals.pop("ilm", {})
+        if ilm:
+            retval["ilm"].update(ilm)
+        retval.update(newvals)
+    return retval
+
+
+def mappings(plan: t.Optional[t.Mapping] = None) -> dict:
+    """
+    Return the index mappings from mappings.json, with the ``dims``, ``similarity``
+    and ``element_type`` of the ``vector`` field set to those the plan's
+    ``index_buildlist`` entries generate vectors with
+
+    :raises TestbedMisconfig: If the entries generate different kinds of vectors,
+        which cannot share a mapping
+    """
+    retval = loads((modpath() / "mappings.json").read_text(encoding="UTF-8"))
+    if not plan or "index_buildlist" not in plan:
+        return retval
+    keys = ("dims", "similarity", "element_type")
+    found = set()
+    for scheme in plan["index_buildlist"]:
+        opts = vector_options(scheme.get("options"))
+        found.add(tuple(opts[key] for key in keys))
+    if len(found) > 1:
+        msg = f"index_buildlist entries generate different vectors: {sorted(found)}"
+        logger.critical(msg)
+        raise TestbedMisconfig(msg)
+    if found:
+        retval["mappings"]["properties"]["vector"].update(zip(keys, found.pop()))
+    return retval
+
+
+def modpath() -> Path:
+    """Return the local file path"""
+    return Path(__file__).parent.resolve()
+
+
+def settings() -> dict:
+    """Return the index settings from settings.json"""
+    return loads((modpath() / "settings.json").read_text(encoding="UTF-8"))
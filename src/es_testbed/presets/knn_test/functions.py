@@ -0,0 +1,276 @@
+"""Module that will generate docs with dense vectors for kNN Test"""
+
+# pylint: disable=R0913,R0917
+import typing as t
+import logging
+from functools import lru_cache
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest.timestamps import HASH_MUL, timestamp_series
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS: t.Dict[str, t.Any] = {
+    "dims": 64,
+    "similarity": "cosine",
+    "element_type": "float",
+}
+"""Default ``dense_vector`` settings, which match mappings.json"""
+
+SIMILARITIES: t.Tuple[str, ...] = (
+    "cosine",
+    "dot_product",
+    "l2_norm",
+    "max_inner_product",
+)
+"""The similarity functions a dense_vector field can use"""
+
+ELEMENT_TYPES: t.Tuple[str, ...] = ("float", "byte")
+"""The element types generated vectors can have"""
+
+BATCH: int = 1000
+"""Number of vectors computed at a time by doc_generator"""
+
+
+def vector_options(options: t.Optional[t.Mapping[str, t.Any]] = None) -> t.Dict:
+    """
+    Return the ``dims``, ``similarity``, ``element_type`` and ``normalize`` that
+    the generator options of an ``index_buildlist`` entry produce vectors for
+
+    ``normalize`` defaults to True for ``cosine`` and ``dot_product``, and must be
+    True for ``dot_product``, which only accepts unit length vectors.
+
+    :raises TestbedMisconfig: If an option has an invalid value
+    """
+    options = options or {}
+    retval = {key: options.get(key, value) for key, value in DEFAULTS.items()}
+    retval["dims"] = int(retval["dims"])
+    if retval["dims"] < 1:
+        raise TestbedMisconfig(f"dims must be at least 1, not {retval['dims']}")
+    if retval["similarity"] not in SIMILARITIES:
+        msg = f'similarity must be one of {SIMILARITIES}, not "{retval["similarity"]}"'
+        raise TestbedMisconfig(msg)
+    if retval["element_type"] not in ELEMENT_TYPES:
+        msg = (
+            f"element_type must be one of {ELEMENT_TYPES}, "
+            f'not "{retval["element_type"]}"'
+        )
+        raise TestbedMisconfig(msg)
+    normalize = options.get("normalize")
+    if normalize is None:
+        normalize = retval["similarity"] in ("cosine", "dot_product")
+    if retval["similarity"] == "dot_product" and not normalize:
+        raise TestbedMisconfig("dot_product similarity requires normalize: True")
+    retval["normalize"] = bool(normalize)
+    return retval
+
+
+@lru_cache(maxsize=16)
+def centroids(seed: int, clusters: int, dims: int) -> "np.ndarray":
+    """
+    Return the unit length centers of ``clusters`` clusters, which are the same
+    for the same seed, so every index of a testbed shares them
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, clusters), dims))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    centers.setflags(write=False)
+    return centers
+
+
+def cluster_of(nums: "np.ndarray", clusters: int) -> "np.ndarray":
+    """Return the cluster of each doc number, spread evenly and deterministically"""
+    hashed = nums.astype(np.uint64) * np.uint64(HASH_MUL)
+    return ((hashed >> np.uint64(16)) % np.uint64(max(1, clusters))).astype(np.int64)
+
+
+def vectors(
+    nums: "np.ndarray",
+    dims: int = DEFAULTS["dims"],
+    clusters: int = 16,
+    spread: float = 0.1,
+    seed: int = 42,
+    normalize: bool = True,
+    element_type: str = DEFAULTS["element_type"],
+) -> t.Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Return the cluster and vector of each doc number in nums
+
+    Each vector is its cluster's centroid plus Gaussian noise, ``spread`` being the
+    expected distance between them (centroids are unit length). Small spreads make
+    tight, well separated clusters. The noise is seeded with seed and the first doc
+    number, so the same range, in the same batches, gives the same vectors.
+
+    ``float`` vectors are ``float32``. ``byte`` vectors are the normalized vectors
+    scaled to -127..127, as ``int8``.
+    """
+    assign = cluster_of(nums, clusters)
+    rng = np.random.default_rng([seed, int(nums[0]) if len(nums) else 0])
+    noise = rng.standard_normal((len(nums), dims)) * (spread / np.sqrt(dims))
+    vecs = centroids(seed, clusters, dims)[assign] + noise
+    if normalize or element_type == "byte":
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs /= np.where(norms > 0, norms, 1.0)
+    if element_type == "byte":
+        return assign, np.clip(np.rint(vecs * 127), -127, 127).astype(np.int8)
+    return assign, vecs.astype(np.float32)
+
+
+def query_vectors(
+    count: int = 10,
+    dims: int = DEFAULTS["dims"],
+    clusters: int = 16,
+    spread: float = 0.1,
+    seed: int = 42,
+    normalize: bool = True,
+    element_type: str = DEFAULTS["element_type"],
+) -> t.List[t.List]:
+    """
+    Return count query vectors, drawn from the same clusters as the docs generated
+    with the same options, as lists for a ``knn`` search. The queries never repeat
+    a doc's vector.
+    """
+    nums = np.arange(count, dtype=np.int64) + (1 << 40)
+    _, vecs = vectors(nums, dims, clusters, spread, seed, normalize, element_type)
+    return vecs.tolist()
+
+
+def _batches(
+    count: int,
+    start_at: int,
+    batch_size: int,
+    dims: int,
+    similarity: str,
+    element_type: str,
+    normalize: t.Optional[bool],
+    clusters: int,
+    spread: float,
+    seed: int,
+    timestamps: t.Optional[t.Dict],
+) -> t.Generator[t.Dict[str, "np.ndarray"], None, None]:
+    if np is None:
+        raise TestbedMisconfig("The knn_test preset requires NumPy")
+    opts = vector_options(
+        {
+            "dims": dims,
+            "similarity": similarity,
+            "element_type": element_type,
+            "normalize": normalize,
+        }
+    )
+    series = timestamp_series(timestamps, count, start_at)
+    for begin in range(start_at, start_at + count, batch_size):
+        nums = np.arange(begin, min(begin + batch_size, start_at + count))
+        assign, vecs = vectors(
+            nums,
+            opts["dims"],
+            clusters,
+            spread,
+            seed,
+            opts["normalize"],
+            opts["element_type"],
+        )
+        yield {
+            "@timestamp": series.datetime64(begin, begin + len(nums)),
+            "id": nums,
+            "cluster": assign,
+            "vector": vecs,
+        }
+
+
+def doc_generator(
+    count: int = 10,
+    start_at: int = 0,
+    dims: int = DEFAULTS["dims"],
+    similarity: str = DEFAULTS["similarity"],
+    element_type: str = DEFAULTS["element_type"],
+    normalize: t.Optional[bool] = None,
+    clusters: int = 16,
+    spread: float = 0.1,
+    seed: int = 42,
+    timestamps: t.Optional[t.Dict] = None,
+) -> t.Generator[t.Dict, None, None]:
+    """
+    :param count: Create this many docs
+    :param start_at: The ``id`` of the first doc
+    :param dims: The number of dimensions of each vector
+    :param similarity: The similarity of the dense_vector field. Decides the
+        default of normalize. See :py:func:`vector_options`
+    :param element_type: ``float`` or ``byte``
+    :param normalize: Whether vectors are unit length
+    :param clusters: How many clusters the vectors are spread over
+    :param spread: How far vectors are from their cluster's centroid
+    :param seed: Seeds the centroids and the noise. See :py:func:`vectors`
+    :param timestamps: How to spread the docs' @timestamp values over time. See
+        :py:class:`~.es_testbed.ingest.timestamps.TimestampSeries`
+    :returns: A generator shipping docs with ``@timestamp``, ``id``, ``cluster``
+        and ``vector`` fields
+    """
+    for batch in _batches(
+        count,
+        start_at,
+        BATCH,
+        dims,
+        similarity,
+        element_type,
+        normalize,
+        clusters,
+        spread,
+        seed,
+        timestamps,
+    ):
+        stamps = np.datetime_as_string(batch["@timestamp"]).tolist()
+        ids = batch["id"].tolist()
+        assign = batch["cluster"].tolist()
+        vecs = batch["vector"]
+        if vecs.dtype.kind == "f":
+            # float32 as Python floats would print 17 digits. 7 decimals are as many
+            # as a float32 component of a unit length vector holds.
+            vecs = vecs.astype(np.float64).round(7)
+        rows = vecs.tolist()
+        for num, stamp in enumerate(stamps):
+            yield {
+                "@timestamp": f"{stamp}Z",
+                "id": ids[num],
+                "cluster": assign[num],
+                "vector": rows[num],
+            }
+
+
+def batch_generator(
+    batch_size: int = 1000,
+    count: int = 10,
+    start_at: int = 0,
+    dims: int = DEFAULTS["dims"],
+    similarity: str = DEFAULTS["similarity"],
+    element_type: str = DEFAULTS["element_type"],
+    normalize: t.Optional[bool] = None,
+    clusters: int = 16,
+    spread: float = 0.1,
+    seed: int = 42,
+    timestamps: t.Optional[t.Dict] = None,
+) -> t.Generator[t.Dict[str, "np.ndarray"], None, None]:
+    """
+    The columnar version of :py:func:`doc_generator`. Vectors are encoded a batch
+    at a time, as 2-D arrays (see
+    :py:func:`~.es_testbed.ingest.columnar.encode_column`).
+
+    :param batch_size: The most docs in each batch
+    """
+    yield from _batches(
+        count,
+        start_at,
+        batch_size,
+        dims,
+        similarity,
+        element_type,
+        normalize,
+        clusters,
+        spread,
+        seed,
+        timestamps,
+    )
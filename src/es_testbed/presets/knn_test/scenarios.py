@@ -0,0 +1,31 @@
+"""
+kNN Test Scenarios
+
+The same hot, cold and frozen scenarios as the searchable_test preset, with docs
+that carry dense vectors, so kNN search can be compared across tiers.
+"""
+
+import typing as t
+from es_testbed.presets.searchable_test.scenarios import REPOSITORY, Scenarios as Base
+
+__all__ = ["REPOSITORY", "Scenarios"]
+
+
+class Scenarios(Base):
+    """Scenarios Class"""
+
+    def build_list(self) -> t.Sequence[t.Dict]:
+        """The plan build list for these scenarios"""
+        return [
+            {
+                "options": {
+                    "count": 100,
+                    "start_at": i * 100,
+                    "dims": 64,
+                    "similarity": "cosine",
+                    "clusters": 16,
+                },
+                "target_tier": "frozen" if i < 2 else "hot",
+            }
+            for i in range(3)
+        ]
@@ -5,9 +5,19 @@ import random
 import string
 import logging
 from datetime import datetime, timezone
+from es_testbed.ingest.pools import ValuePool, value_pools
+from es_testbed.ingest.timestamps import timestamp_series
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 logger = logging.getLogger(__name__)
 
+STAMP_BATCH: int = 1000
+"""Number of timestamps formatted at a time by doc_generator"""
+
 
 def iso8601_now() -> str:
     """
@@ -57,16 +67,11 @@ def randomstr(length: int = 16, lowercase: bool = False) -> str:
     return str("".join(random.choices(letters + string.digits, k=length)))
 
 
-def doc_generator(
-    count: int = 10, start_at: int = 0, match: bool = True
-) -> t.Generator[t.Dict, None, None]:
+def match_map(match: bool = True) -> t.Dict[str, str]:
     """
-    :param count: Create this many docs
-    :param start_at: Append value starts with this value
     :param match: Do we want fieldnames to match between docgen runs, or be random?
-        Also affects document document field "number" (value will be incremental if
-        match is True, a random value between 1001 and 32767 if False)
-    :returns: A generator shipping docs
+    :returns: The prefix of the value of each of the "message", "nested" and "deep"
+        fields
     """
     keys = ["message", "nested", "deep"]
     # Start with an empty map
@@ -80,11 +85,81 @@ def doc_generator(
         else:
             # Otherwise matchmap[key] will have a random string value
             matchmap[key] = randomstr()
+    return matchmap
 
+
+def resolve_options(options: t.Dict) -> t.Dict:
+    """
+    Return options with the random field prefixes of :py:func:`match_map` chosen
+    once, as ``matchmap``, so every part of a range of docs generated in parts, or
+    in separate processes, uses the same ones
+
+    :py:func:`~.es_testbed.ingest.generate.doc_lines` calls this before generating.
+    """
+    if "matchmap" not in options or not options["matchmap"]:
+        match = options["match"] if "match" in options else True
+        options["matchmap"] = match_map(match)
+    return options
+
+
+def doc_generator(
+    count: int = 10,
+    start_at: int = 0,
+    match: bool = True,
+    timestamps: t.Optional[t.Dict] = None,
+    pools: t.Optional[t.Dict] = None,
+    matchmap: t.Optional[t.Dict[str, str]] = None,
+) -> t.Generator[t.Dict, None, None]:
+    """
+    :param count: Create this many docs
+    :param start_at: Append value starts with this value
+    :param match: Do we want fieldnames to match between docgen runs, or be random?
+        Also affects document document field "number" (value will be incremental if
+        match is True, a random value between 1001 and 32767 if False)
+    :param timestamps: How to spread the docs' @timestamp values over time. See
+        :py:class:`~.es_testbed.ingest.timestamps.TimestampSeries`. By default,
+        every doc gets the same timestamp: now.
+    :param pools: Keyword fields with a controlled cardinality, e.g. for
+        aggregation tests, as ``{field: cardinality}`` or ``{field: {cardinality,
+        skew, exact}}``. Requires NumPy. See
+        :py:class:`~.es_testbed.ingest.pools.ValuePool`
+    :param matchmap: The field prefixes to use, as :py:func:`resolve_options` chose
+        them. By default, they are chosen here, from match.
+    :returns: A generator shipping docs
+    """
+    if not matchmap:
+        matchmap = match_map(match)
+
+    pooled = value_pools(pools, origin=start_at)
+    series = timestamp_series(timestamps, count, start_at)
     # This is where count and start_at matter
-    for num in range(start_at, start_at + count):
-        yield {
-            "@timestamp": iso8601_now(),
+    for begin in range(start_at, start_at + count, STAMP_BATCH):
+        end = min(begin + STAMP_BATCH, start_at + count)
+        values = _pool_values(pooled, begin, end)
+        yield from _docs(
+            matchmap, match, range(begin, end), series.strings(begin, end), values
+        )
+
+
+def _pool_values(
+    pooled: t.Dict[str, ValuePool], begin: int, end: int
+) -> t.Dict[str, t.List[str]]:
+    if not pooled:
+        return {}
+    nums = np.arange(begin, end)
+    return {field: pool.take(nums).tolist() for field, pool in pooled.items()}
+
+
+def _docs(
+    matchmap: t.Dict[str, str],
+    match: bool,
+    nums: t.Iterable[int],
+    stamps: t.Sequence[str],
+    values: t.Optional[t.Dict[str, t.List[str]]] = None,
+) -> t.Generator[t.Dict, None, None]:
+    for idx, (num, stamp) in enumerate(zip(nums, stamps)):
+        doc = {
+            "@timestamp": stamp,
             "message": f'{matchmap["message"]}{num}',  # message# or randomstr#
             "number": (
                 num if match else random.randint(1001, 32767)
@@ -92,3 +167,54 @@ def doc_generator(
             "nested": {"key": f'{matchmap["nested"]}{num}'},  # nested#
             "deep": {"l1": {"l2": {"l3": f'{matchmap["deep"]}{num}'}}},  # deep#
         }
+        for field, column in (values or {}).items():
+            node = doc
+            parts = field.split(".")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = column[idx]
+        yield doc
+
+
+def batch_generator(
+    batch_size: int = 1000,
+    count: int = 10,
+    start_at: int = 0,
+    match: bool = True,
+    timestamps: t.Optional[t.Dict] = None,
+    pools: t.Optional[t.Dict] = None,
+    matchmap: t.Optional[t.Dict[str, str]] = None,
+) -> t.Generator[t.Dict, None, None]:
+    """
+    The columnar version of :py:func:`doc_generator`, which requires NumPy
+
+    :param batch_size: The most docs in each batch
+    :param count: Create this many docs
+    :param start_at: Append value starts with this value
+    :param match: Do we want fieldnames to match between docgen runs, or be random?
+    :param timestamps: How to spread the docs' @timestamp values over time
+    :param pools: Keyword fields with a controlled cardinality. Pool values do not
+        depend on batching, so both generators give docs the same values
+    :param matchmap: The field prefixes to use, as :py:func:`resolve_options` chose
+        them. By default, they are chosen here, from match.
+    :returns: A generator shipping batches of docs, as a column of values per
+        dotted field name
+    """
+    if not matchmap:
+        matchmap = match_map(match)
+    rng = np.random.default_rng()
+    pooled = value_pools(pools, origin=start_at)
+    series = timestamp_series(timestamps, count, start_at)
+    for begin in range(start_at, start_at + count, batch_size):
+        nums = np.arange(begin, min(begin + batch_size, start_at + count))
+        suffixes = nums.astype(str)
+        batch = {
+            "@timestamp": series.datetime64(begin, begin + len(nums)),
+            "message": np.char.add(matchmap["message"], suffixes),
+            "number": nums if match else rng.integers(1001, 32768, len(nums)),
+            "nested.key": np.char.add(matchmap["nested"], suffixes),
+            "deep.l1.l2.l3": np.char.add(matchmap["deep"], suffixes),
+        }
+        for field, pool in pooled.items():
+            batch[field] = pool.take(nums)
+        yield batch
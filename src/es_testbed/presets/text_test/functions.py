@@ -0,0 +1,275 @@
+"""Module that will generate docs with Zipf-distributed text for Text Test"""
+
+# pylint: disable=R0913,R0914,R0917
+import typing as t
+import logging
+from functools import lru_cache
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest.pools import zipf_ranks
+from es_testbed.ingest.timestamps import timestamp_series
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+SYLLABLES: t.Tuple[str, ...] = tuple(c + v for c in "bdfgklmnprstvz" for v in "aeiou")
+"""The syllables words are spelled with"""
+
+PHRASES: t.Tuple[str, ...] = (
+    "connection reset by peer",
+    "request timed out",
+    "out of memory",
+    "permission denied",
+    "disk quota exceeded",
+)
+"""Default phrases injected into messages, e.g. to test match_phrase queries"""
+
+LEVELS: t.Dict[str, float] = {"INFO": 0.8, "WARN": 0.15, "ERROR": 0.05}
+"""The share of docs with each log level"""
+
+LENGTHS: t.Tuple[str, ...] = ("lognormal", "poisson", "fixed")
+"""The distributions of the number of words per message"""
+
+BATCH: int = 1000
+"""Number of messages generated at a time by doc_generator"""
+
+
+def word(rank: int) -> str:
+    """
+    Return the word of a vocabulary rank (0 is the most frequent), spelled in
+    SYLLABLES as a bijective base-70 number, so more frequent words are shorter,
+    as they are in natural language
+
+    >>> [word(0), word(69), word(70)]
+    ['ba', 'zu', 'baba']
+    """
+    size = len(SYLLABLES)
+    parts = []
+    rank += 1
+    while rank > 0:
+        rank, digit = divmod(rank - 1, size)
+        parts.append(SYLLABLES[digit])
+    return "".join(reversed(parts))
+
+
+@lru_cache(maxsize=8)
+def vocabulary(size: int = 10000) -> t.Tuple[str, ...]:
+    """Return the ``size`` words of the vocabulary, most frequent first"""
+    return tuple(word(rank) for rank in range(size))
+
+
+def lengths(
+    rng: "np.random.Generator",
+    count: int,
+    distribution: str = "lognormal",
+    mean: float = 20.0,
+    sigma: float = 0.5,
+    minimum: int = 1,
+    maximum: int = 200,
+) -> "np.ndarray":
+    """
+    Return the number of words of count messages, averaging about ``mean`` and
+    clipped to ``minimum``..``maximum``
+
+    :raises TestbedMisconfig: If distribution is not one of LENGTHS
+    """
+    if distribution == "lognormal":
+        mu = np.log(mean) - sigma**2 / 2
+        values = rng.lognormal(mu, sigma, count)
+    elif distribution == "poisson":
+        values = rng.poisson(mean, count)
+    elif distribution == "fixed":
+        values = np.full(count, mean)
+    else:
+        msg = f'length_distribution must be one of {LENGTHS}, not "{distribution}"'
+        raise TestbedMisconfig(msg)
+    return np.clip(np.rint(values), minimum, maximum).astype(np.int64)
+
+
+def messages(
+    rng: "np.random.Generator",
+    count: int,
+    vocab_size: int = 10000,
+    skew: float = 1.1,
+    length_distribution: str = "lognormal",
+    length_mean: float = 20.0,
+    length_sigma: float = 0.5,
+    min_length: int = 1,
+    max_length: int = 200,
+    phrases: t.Optional[t.Sequence[str]] = None,
+    phrase_rate: float = 0.05,
+) -> t.Tuple[t.List[str], "np.ndarray"]:
+    """
+    Return count messages of words drawn from a Zipf-distributed vocabulary, and
+    the number of words of each
+
+    The words of every message are drawn at once, for the whole batch. A share of
+    ``phrase_rate`` of the messages also get one of ``phrases`` (default
+    :py:data:`PHRASES`) at a random place.
+    """
+    if vocab_size < 1:
+        raise TestbedMisconfig(f"vocab_size must be at least 1, not {vocab_size}")
+    sizes = lengths(
+        rng,
+        count,
+        length_distribution,
+        length_mean,
+        length_sigma,
+        min_length,
+        max_length,
+    )
+    vocab = vocabulary(vocab_size)
+    ranks = zipf_ranks(rng, vocab_size, skew, int(sizes.sum())).tolist()
+    words = [vocab[rank] for rank in ranks]
+    phrases = PHRASES if phrases is None else tuple(phrases)
+    inject = np.zeros(count, dtype=bool)
+    if phrases and phrase_rate > 0:
+        inject = rng.random(count) < phrase_rate
+    which = rng.integers(0, max(1, len(phrases)), count).tolist()
+    where = (rng.random(count) * (sizes + 1)).astype(np.int64).tolist()
+    ends = np.cumsum(sizes).tolist()
+    retval = []
+    begin = 0
+    for num, end in enumerate(ends):
+        doc = words[begin:end]
+        if inject[num]:
+            doc.insert(where[num], phrases[which[num]])
+        retval.append(" ".join(doc))
+        begin = end
+    if inject.any():
+        extra = np.array([len(phrase.split()) for phrase in phrases])
+        sizes = sizes + inject * extra[np.asarray(which)]
+    return retval, sizes
+
+
+def _batches(
+    count: int,
+    start_at: int,
+    batch_size: int,
+    seed: int,
+    timestamps: t.Optional[t.Dict],
+    **kwargs: t.Any,
+) -> t.Generator[t.Dict[str, t.Any], None, None]:
+    if np is None:
+        raise TestbedMisconfig("The text_test preset requires NumPy")
+    series = timestamp_series(timestamps, count, start_at)
+    names = np.array(list(LEVELS))
+    shares = np.array(list(LEVELS.values()))
+    for begin in range(start_at, start_at + count, batch_size):
+        rng = np.random.default_rng([seed, begin])
+        nums = np.arange(begin, min(begin + batch_size, start_at + count))
+        text, sizes = messages(rng, len(nums), **kwargs)
+        yield {
+            "@timestamp": series.datetime64(begin, begin + len(nums)),
+            "id": nums,
+            "level": names[rng.choice(len(names), len(nums), p=shares)],
+            "length": sizes,
+            "message": text,
+        }
+
+
+def doc_generator(
+    count: int = 10,
+    start_at: int = 0,
+    vocab_size: int = 10000,
+    skew: float = 1.1,
+    length_distribution: str = "lognormal",
+    length_mean: float = 20.0,
+    length_sigma: float = 0.5,
+    min_length: int = 1,
+    max_length: int = 200,
+    phrases: t.Optional[t.Sequence[str]] = None,
+    phrase_rate: float = 0.05,
+    seed: int = 42,
+    timestamps: t.Optional[t.Dict] = None,
+) -> t.Generator[t.Dict, None, None]:
+    """
+    :param count: Create this many docs
+    :param start_at: The ``id`` of the first doc
+    :param vocab_size: The number of distinct words
+    :param skew: The Zipf exponent. Word rank r is drawn with a probability
+        proportional to ``1 / r ** skew``. Natural language is close to 1.
+    :param length_distribution: How the number of words per message is spread:
+        ``lognormal`` (with ``length_sigma``), ``poisson`` or ``fixed``
+    :param length_mean: The average number of words per message
+    :param length_sigma: The spread of a lognormal length distribution
+    :param min_length: The fewest words in a message
+    :param max_length: The most words in a message
+    :param phrases: The phrases that are injected into messages. Defaults to
+        :py:data:`PHRASES`
+    :param phrase_rate: The share of messages with a phrase injected
+    :param seed: Seeds every random choice, with the number of the first doc of
+        each batch, so the same range, in the same batches, gives the same docs
+    :param timestamps: How to spread the docs' @timestamp values over time. See
+        :py:class:`~.es_testbed.ingest.timestamps.TimestampSeries`
+    :returns: A generator shipping docs with ``@timestamp``, ``id``, ``level``,
+        ``length`` (words in the message) and ``message`` fields
+    """
+    for batch in _batches(
+        count,
+        start_at,
+        BATCH,
+        seed,
+        timestamps,
+        vocab_size=vocab_size,
+        skew=skew,
+        length_distribution=length_distribution,
+        length_mean=length_mean,
+        length_sigma=length_sigma,
+        min_length=min_length,
+        max_length=max_length,
+        phrases=phrases,
+        phrase_rate=phrase_rate,
+    ):
+        stamps = np.datetime_as_string(batch["@timestamp"]).tolist()
+        columns = [batch[key].tolist() for key in ("id", "level", "length")]
+        for num, stamp in enumerate(stamps):
+            yield {
+                "@timestamp": f"{stamp}Z",
+                "id": columns[0][num],
+                "level": columns[1][num],
+                "length": columns[2][num],
+                "message": batch["message"][num],
+            }
+
+
+def batch_generator(
+    batch_size: int = 1000,
+    count: int = 10,
+    start_at: int = 0,
+    vocab_size: int = 10000,
+    skew: float = 1.1,
+    length_distribution: str = "lognormal",
+    length_mean: float = 20.0,
+    length_sigma: float = 0.5,
+    min_length: int = 1,
+    max_length: int = 200,
+    phrases: t.Optional[t.Sequence[str]] = None,
+    phrase_rate: float = 0.05,
+    seed: int = 42,
+    timestamps: t.Optional[t.Dict] = None,
+) -> t.Generator[t.Dict[str, t.Any], None, None]:
+    """
+    The columnar version of :py:func:`doc_generator`
+
+    :param batch_size: The most docs in each batch
+    """
+    yield from _batches(
+        count,
+        start_at,
+        batch_size,
+        seed,
+        timestamps,
+        vocab_size=vocab_size,
+        skew=skew,
+        length_distribution=length_distribution,
+        length_mean=length_mean,
+        length_sigma=length_sigma,
+        min_length=min_length,
+        max_length=max_length,
+        phrases=phrases,
+        phrase_rate=phrase_rate,
+    )
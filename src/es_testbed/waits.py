@@ -0,0 +1,211 @@
+"""Condition-driven waits, polled with an adaptive backoff"""
+
+import typing as t
+import logging
+from os import getenv
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from .debug import debug
+from .defaults import (
+    PAUSE_DEFAULT,
+    PAUSE_ENVVAR,
+    TIMEOUT_DEFAULT,
+    TIMEOUT_ENVVAR,
+    WAIT_BACKOFF,
+    WAIT_HISTORY_SIZE,
+    WAIT_INITIAL_PAUSE,
+    WAIT_LEARNED_SHARE,
+    WAIT_SETTLE_SECONDS,
+)
+from .exceptions import TestbedFailure
+
+if t.TYPE_CHECKING:
+    from es_wait._base import Waiter
+
+PAUSE_VALUE = float(getenv(PAUSE_ENVVAR, default=PAUSE_DEFAULT))
+TIMEOUT_VALUE = float(getenv(TIMEOUT_ENVVAR, default=TIMEOUT_DEFAULT))
+
+logger = logging.getLogger(__name__)
+
+
+class WaitHistory:
+    """
+    How long the recent waits of every kind took, so the next wait of that kind
+    can skip the checks that would come too early, and how much the testbed waited
+    overall
+
+    :param size: How many of the most recent waits of every kind to remember
+    """
+
+    def __init__(self, size: int = WAIT_HISTORY_SIZE):
+        self.size = size
+        self.waits = 0
+        self.waited = 0.0
+        self.settles = 0  # Fixed settle delays replaced by a condition
+        self.saved = 0.0  # Seconds of those settle delays not spent waiting
+        self._times = defaultdict(lambda: deque(maxlen=self.size))
+        self._lock = threading.Lock()
+
+    def record(self, key: t.Optional[str], seconds: float) -> None:
+        """Record that a wait of kind key took seconds"""
+        with self._lock:
+            self.waits += 1
+            self.waited += seconds
+            if key:
+                self._times[key].append(seconds)
+
+    def record_settle(self, seconds: float) -> None:
+        """Record a condition that replaced a fixed settle delay, and took seconds"""
+        with self._lock:
+            self.settles += 1
+            self.saved += max(0.0, WAIT_SETTLE_SECONDS - seconds)
+
+    def expected(self, key: t.Optional[str]) -> t.Optional[float]:
+        """Return the median time of the recent waits of kind key, if any"""
+        with self._lock:
+            times = list(self._times.get(key, ())) if key else []
+        return statistics.median(times) if times else None
+
+    def summary(self) -> str:
+        """Return how long, and how often, the testbed waited"""
+        return (
+            f"Waited {self.waited:.2f} seconds for {self.waits} conditions. "
+            f"{self.settles} fixed {WAIT_SETTLE_SECONDS:g} second settle delays "
+            f"were replaced by conditions, saving {self.saved:.2f} seconds."
+        )
+
+    def reset(self) -> None:
+        """Forget every wait"""
+        with self._lock:
+            self.waits = self.settles = 0
+            self.waited = self.saved = 0.0
+            self._times.clear()
+
+
+HISTORY = WaitHistory()
+"""The wait history of this process, shared by every wait"""
+
+
+class Backoff:
+    """
+    The pauses between the checks of a wait, which start short, so a condition
+    that is met quickly is seen quickly, and grow by ``factor`` up to ``maximum``,
+    so a long wait does not poll the cluster any more often than a fixed pause
+
+    :param initial: The first pause, in seconds
+    :param factor: How much every pause grows over the previous one
+    :param maximum: The longest pause. Defaults to ``ES_TESTBED_PAUSE``.
+    :param expected: How long waits like this took before (see
+        :py:meth:`WaitHistory.expected`). If set, the first pause covers
+        ``WAIT_LEARNED_SHARE`` of it, as earlier checks would come too early.
+    """
+
+    def __init__(
+        self,
+        initial: float = WAIT_INITIAL_PAUSE,
+        factor: float = WAIT_BACKOFF,
+        maximum: float = PAUSE_VALUE,
+        expected: t.Optional[float] = None,
+    ):
+        self.initial = min(initial, maximum)
+        self.factor = factor
+        self.maximum = maximum
+        self.expected = expected
+
+    def pauses(self) -> t.Iterator[float]:
+        """Yield the pause before every next check, endlessly"""
+        if self.expected:
+            yield min(max(self.expected * WAIT_LEARNED_SHARE, 0.0), self.maximum)
+        pause = self.initial
+        while True:
+            yield pause
+            pause = min(pause * self.factor, self.maximum)
+
+
+def wait_for(
+    condition: t.Callable[[], t.Any],
+    what: str,
+    key: t.Optional[str] = None,
+    timeout: float = TIMEOUT_VALUE,
+    backoff: t.Optional[Backoff] = None,
+) -> float:
+    """
+    Check condition until it returns something truthy, pausing as backoff says
+    (by default, as learned from the earlier waits of kind key), and return how
+    many seconds that took
+
+    :param what: What is waited for, like ``for index my-idx to be ready``
+    :param key: The kind of wait, like ``shards_started``, to learn from
+
+    :raises TestbedFailure: If condition is not met within timeout seconds
+    """
+    if backoff is None:
+        backoff = Backoff(expected=HISTORY.expected(key))
+    pauses = backoff.pauses()
+    start = time.monotonic()
+    checks = 0
+    while True:
+        checks += 1
+        if condition():
+            elapsed = time.monotonic() - start
+            HISTORY.record(key, elapsed)
+            debug.lv3(f"Waited {elapsed:.2f} seconds ({checks} checks) {what}")
+            return elapsed
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            msg = f"Condition not met within {timeout} seconds, waiting {what}"
+            logger.error(msg)
+            raise TestbedFailure(msg)
+        time.sleep(min(next(pauses), timeout - elapsed))
+
+
+def settle(
+    condition: t.Callable[[], t.Any],
+    what: str,
+    key: t.Optional[str] = None,
+    timeout: float = TIMEOUT_VALUE,
+) -> float:
+    """
+    :py:func:`wait_for` condition, where a fixed settle delay was once slept, and
+    record how much of that delay was saved
+    """
+    elapsed = wait_for(condition, what, key=key, timeout=timeout)
+    HISTORY.record_settle(elapsed)
+    return elapsed
+
+
+def adaptive(waiter: "Waiter", key: t.Optional[str] = None) -> "Waiter":
+    """
+    Make an es_wait waiter pause as a :py:class:`Backoff` says between checks,
+    instead of its fixed ``pause``, which becomes the longest pause, and record
+    how long the wait took as a wait of kind key. Return the waiter, to
+    ``wait()`` on as usual.
+
+    es_wait waiters that count their own checks, like the stuck count of
+    ``IlmPhase``, go back to the fixed pause once they start counting, so they
+    do not give up, or force anything, any sooner than before.
+    """
+    check = waiter.check
+    state = {}
+
+    def backoff_check(*args, **kwargs):
+        if not state:
+            state["start"] = time.monotonic()
+            state["fixed"] = waiter.pause
+            state["pauses"] = Backoff(
+                maximum=waiter.pause, expected=HISTORY.expected(key)
+            ).pauses()
+        retval = check(*args, **kwargs)
+        if retval:
+            HISTORY.record(key, time.monotonic() - state["start"])
+        elif getattr(waiter, "stuck_count", 0):
+            waiter.pause = state["fixed"]
+        else:
+            waiter.pause = next(state["pauses"])
+            debug.lv5(f"Next check in {waiter.pause:.2f} seconds")
+        return retval
+
+    waiter.check = backoff_check
+    return waiter
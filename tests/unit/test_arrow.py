@@ -0,0 +1,144 @@
+"""Unit tests for the es_testbed.ingest.arrow module"""
+
+# pylint: disable=C0115,C0116,W0212,W0621
+import datetime
+import decimal
+import gzip
+import json
+from unittest.mock import patch
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import Corpus, arrow
+from es_testbed.ingest.arrow import arrow_column, record_batch_lines, record_batches
+
+pa = pytest.importorskip("pyarrow")
+parquet = pytest.importorskip("pyarrow.parquet")
+ipc = pytest.importorskip("pyarrow.ipc")
+
+ROWS: list = [
+    {
+        "@timestamp": datetime.datetime(2024, 4, 16, 16, 0, 0, 123456),
+        "number": num,
+        "ratio": num / 4,
+        "ok": bool(num % 2),
+        "message": f'line "{num}"',
+        "host": {"name": "a", "ip": None if num == 1 else "10.0.0.1"},
+        "tags": ["x", "y"],
+    }
+    for num in range(3)
+]
+"""Rows of the Parquet and Arrow test files"""
+
+
+def expected(row: dict) -> dict:
+    retval = dict(row, **{"@timestamp": "2024-04-16T16:00:00.123456Z"})
+    retval["host"] = dict(row["host"])
+    return retval
+
+
+@pytest.fixture
+def table():
+    schema = pa.schema(
+        [
+            ("@timestamp", pa.timestamp("us")),
+            ("number", pa.int64()),
+            ("ratio", pa.float64()),
+            ("ok", pa.bool_()),
+            ("message", pa.string()),
+            ("host", pa.struct([("name", pa.string()), ("ip", pa.string())])),
+            ("tags", pa.list_(pa.string())),
+        ]
+    )
+    return pa.Table.from_pylist(ROWS, schema=schema)
+
+
+@pytest.mark.parametrize(
+    "array,encoded",
+    [
+        (pa.array([1, None, 3]), ["1", "null", "3"]),
+        (pa.array([1.5, float("nan")]), ["1.5", "null"]),
+        (pa.array([True, None]), ["true", "null"]),
+        (pa.array([datetime.date(2024, 1, 2)]), ['"2024-01-02T00:00:00.000Z"']),
+        (pa.array([decimal.Decimal("1.25")]), ["1.25"]),
+        (pa.array(["a", "b", "a"]).dictionary_encode(), ['"a"', '"b"', '"a"']),
+        (pa.array(["é", None], type=pa.large_string()), ['"é"', "null"]),
+        (pa.array([[1, 2], None]), ["[1,2]", "null"]),
+    ],
+)
+def test_arrow_column(array, encoded):
+    assert arrow_column(array) == encoded
+
+
+def test_record_batch_lines(table):
+    lines = record_batch_lines(table.to_batches()[0])
+    assert [json.loads(line) for line in lines] == [expected(row) for row in ROWS]
+
+
+def test_parquet_batches(tmp_path, table):
+    path = tmp_path / "ref.parquet"
+    parquet.write_table(table, path)
+    assert [len(x) for x in record_batches(path, "parquet", batch_rows=2)] == [2, 1]
+    source = Corpus(path, batch_rows=2, start_at=1)
+    assert source.format == "parquet"
+    assert [json.loads(line) for line in source.lines()] == [
+        expected(row) for row in ROWS[1:]
+    ]
+
+
+@pytest.mark.parametrize("writer", ["file", "stream"])
+def test_arrow_ipc(tmp_path, table, writer):
+    path = tmp_path / "ref.arrow"
+    with pa.OSFile(str(path), "wb") as sink:
+        new = ipc.new_file if writer == "file" else ipc.new_stream
+        with new(sink, table.schema) as out:
+            out.write_table(table)
+    source = Corpus(path)
+    assert [json.loads(line) for line in source.lines()] == [
+        expected(row) for row in ROWS
+    ]
+
+
+def test_arrow_ipc_stream_gzip(tmp_path, table):
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as out:
+        out.write_table(table)
+    path = tmp_path / "ref.arrows.gz"
+    path.write_bytes(gzip.compress(sink.getvalue().to_pybytes()))
+    source = Corpus(path)
+    assert (source.format, source.compression) == ("arrow", "gzip")
+    assert len(list(source.lines())) == 3
+
+
+def test_arrow_compressed_batch_rows(tmp_path, table):
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as out:
+        out.write_table(table)
+    path = tmp_path / "ref.arrows.gz"
+    path.write_bytes(gzip.compress(sink.getvalue().to_pybytes()))
+    source = Corpus(path, batch_rows=2)
+    with patch(
+        "es_testbed.ingest.arrow.record_batch_lines", wraps=record_batch_lines
+    ) as mock_lines:
+        lines = list(source.lines())
+    assert [len(x.args[0]) for x in mock_lines.call_args_list] == [2, 1]
+    assert [json.loads(line) for line in lines] == [expected(row) for row in ROWS]
+
+
+def test_transform_decodes(tmp_path, table):
+    path = tmp_path / "ref.parquet"
+    parquet.write_table(table, path)
+    source = Corpus(path, transform=lambda doc: {"n": doc["number"]})
+    assert list(source.lines()) == [b'{"n":0}', b'{"n":1}', b'{"n":2}']
+
+
+def test_parquet_compressed_misconfig(tmp_path):
+    path = tmp_path / "ref.parquet.gz"
+    path.write_bytes(b"")
+    with pytest.raises(TestbedMisconfig):
+        Corpus(path)
+
+
+def test_pyarrow_not_installed(tmp_path):
+    with patch.object(arrow, "HAS_PYARROW", False):
+        with pytest.raises(TestbedMisconfig):
+            list(record_batches(tmp_path / "x.parquet", "parquet"))
@@ -0,0 +1,271 @@
+"""Unit tests for the es_testbed.ingest.bulk module"""
+
+# pylint: disable=C0115,C0116,R0903,R0913,R0917,W0212
+from unittest.mock import MagicMock, patch
+import json
+import pytest
+from es_testbed.exceptions import TestbedFailure, TestbedMisconfig
+from es_testbed.ingest.bulk import BulkLoader, backoff, encode_doc
+
+NAME: str = "test-index"
+"""Default index name for bulk tests"""
+
+
+def docs(count: int) -> list:
+    """Return count simple docs"""
+    return [{"num": num} for num in range(count)]
+
+
+def ok_response(body: bytes, op: str = "index") -> dict:
+    """Return a successful _bulk response for every document in body"""
+    count = len(body.splitlines()) // 2
+    return {"errors": False, "items": [{op: {"status": 201}}] * count}
+
+
+def test_encode_doc():
+    assert encode_doc({"a": 1, "b": "ü"}) == '{"a":1,"b":"ü"}'.encode("utf-8")
+
+
+def test_bad_op_type(client):
+    with pytest.raises(TestbedMisconfig):
+        BulkLoader(client, NAME, op_type="update")
+
+
+def test_chunks_by_doc_count(client):
+    loader = BulkLoader(client, NAME, chunk_docs=3)
+    chunks = list(loader.chunks([b"{}"] * 7))
+    assert [len(x) for x in chunks] == [3, 3, 1]
+
+
+def test_chunks_by_bytes(client):
+    # Each line costs len(line) + len(b'{"index":{}}\n') + 1 = 10 + 14 = 24 bytes
+    loader = BulkLoader(client, NAME, chunk_docs=100, chunk_bytes=50)
+    chunks = list(loader.chunks([b"x" * 10] * 5))
+    assert [len(x) for x in chunks] == [2, 2, 1]
+
+
+def test_chunks_oversized_doc(client):
+    loader = BulkLoader(client, NAME, chunk_bytes=5)
+    assert list(loader.chunks([b"x" * 10, b"y" * 10])) == [[b"x" * 10], [b"y" * 10]]
+
+
+def test_payload(client):
+    loader = BulkLoader(client, NAME, op_type="create")
+    assert loader.payload([b'{"a":1}']) == b'{"create":{}}\n{"a":1}\n'
+
+
+def test_load_success(client):
+    client.bulk.side_effect = lambda index, operations: ok_response(operations)
+    loader = BulkLoader(client, NAME, chunk_docs=4)
+    loader.load(docs(10))
+    assert loader.docs == 10
+    assert loader.requests == 3
+    assert loader.retries == 0
+    body = client.bulk.call_args_list[0].kwargs["operations"]
+    assert json.loads(body.splitlines()[1]) == {"num": 0}
+
+
+def test_send_retries_only_failed_items(client):
+    rejected = {"index": {"status": 429, "error": {"type": "es_rejected_execution"}}}
+    client.bulk.side_effect = [
+        {"errors": True, "items": [{"index": {"status": 201}}, rejected]},
+        {"errors": False, "items": [{"index": {"status": 201}}]},
+    ]
+    loader = BulkLoader(client, NAME)
+    with patch("es_testbed.ingest.bulk.time.sleep") as mock_sleep:
+        loader.send([b'{"num":0}', b'{"num":1}'])
+        mock_sleep.assert_called_once()
+    assert loader.docs == 2
+    assert loader.retries == 1
+    assert client.bulk.call_args_list[1].kwargs["operations"] == (
+        b'{"index":{}}\n{"num":1}\n'
+    )
+
+
+def test_load_reports_item_errors(client):
+    failed = {"index": {"status": 400, "error": {"type": "mapper_parsing_exception"}}}
+    client.bulk.return_value = {
+        "errors": True,
+        "items": [{"index": {"status": 201}}, failed],
+    }
+    loader = BulkLoader(client, NAME)
+    with pytest.raises(TestbedFailure, match="1 document"):
+        loader.load(docs(2))
+    assert loader.errors == [failed["index"]]
+    assert loader.docs == 1
+
+
+def test_send_retries_exhausted(client):
+    rejected = {"index": {"status": 429}}
+    client.bulk.return_value = {"errors": True, "items": [rejected]}
+    loader = BulkLoader(client, NAME, max_retries=2)
+    with patch("es_testbed.ingest.bulk.time.sleep"):
+        loader.send([b"{}"])
+    assert client.bulk.call_count == 3
+    assert loader.errors == [rejected["index"]]
+
+
+def test_send_request_exception(client):
+    client.bulk.side_effect = Exception("boom")
+    loader = BulkLoader(client, NAME)
+    with pytest.raises(TestbedFailure, match="_bulk request to test-index failed"):
+        loader.send([b"{}"])
+
+
+def test_from_settings(client):
+    settings = {"workers": 3, "queue_depth": 2, "chunk_docs": 5, "unrelated": True}
+    loader = BulkLoader.from_settings(client, NAME, op_type="create", settings=settings)
+    assert (loader.workers, loader.queue_depth, loader.chunk_docs) == (3, 2, 5)
+    assert loader.op_type == "create"
+
+
+def test_load_parallel(client):
+    client.options.return_value = client
+    client.bulk.side_effect = lambda index, operations: ok_response(operations)
+    loader = BulkLoader(client, NAME, chunk_docs=3, workers=4, queue_depth=2)
+    loader.load(docs(100))
+    assert loader.docs == 100
+    assert loader.requests == 34
+    assert client.options.call_count == 4
+    sent = []
+    for args in client.bulk.call_args_list:
+        lines = args.kwargs["operations"].splitlines()[1::2]
+        sent.extend(json.loads(line)["num"] for line in lines)
+    assert sorted(sent) == list(range(100))
+
+
+def test_load_parallel_failure(client):
+    client.options.return_value = client
+    client.bulk.side_effect = Exception("boom")
+    loader = BulkLoader(client, NAME, chunk_docs=1, workers=2, queue_depth=1)
+    with pytest.raises(TestbedFailure):
+        loader.load(docs(50))
+    assert client.bulk.call_count < 50
+
+
+def test_check_pool_caps_workers(client, caplog):
+    node = MagicMock()
+    node.config.connections_per_node = 2
+    client.transport.node_pool.all.return_value = [node]
+    loader = BulkLoader(client, NAME, workers=4)
+    assert loader._check_pool() == 2
+    assert "connections_per_node (2)" in caplog.text
+    node.config.connections_per_node = 8
+    assert loader._check_pool() == 4
+
+
+def test_load_parallel_pool_size(client):
+    node = MagicMock()
+    node.config.connections_per_node = 2
+    client.transport.node_pool.all.return_value = [node]
+    client.options.return_value = client
+    client.bulk.side_effect = lambda index, operations: ok_response(operations)
+    loader = BulkLoader(client, NAME, chunk_docs=1, workers=4)
+    loader.load(docs(5))
+    assert loader.docs == 5
+    assert client.options.call_count == 2  # One client view per worker
+
+
+class ApiError429(Exception):
+    status_code = 429
+
+
+def test_backoff_jitter():
+    with patch("es_testbed.ingest.bulk.random.uniform", side_effect=lambda a, b: b):
+        assert backoff(1) == 0.5
+        assert backoff(3) == 2.0
+        assert backoff(100) == 30.0
+    for attempt in range(1, 5):
+        delay = backoff(attempt)
+        assert 0.25 * 2 ** (attempt - 1) <= delay <= 0.5 * 2 ** (attempt - 1)
+
+
+def test_send_retries_rejected_request(client):
+    client.bulk.side_effect = [
+        ApiError429("rejected"),
+        {"errors": False, "items": [{"index": {"status": 201}}]},
+    ]
+    loader = BulkLoader(client, NAME, chunk_docs=100)
+    with patch("es_testbed.ingest.bulk.time.sleep") as mock_sleep:
+        loader.send([b"{}"])
+        mock_sleep.assert_called_once()
+    assert (loader.docs, loader.requests, loader.retries) == (1, 2, 1)
+    assert loader.chunk_docs == 60  # Halved, then grown after a fast request
+
+
+def test_send_rejected_request_split(client):
+    sizes = []
+
+    def bulk(index, operations):
+        sizes.append(len(operations.splitlines()) // 2)
+        if len(sizes) == 1:
+            raise ApiError429("rejected")
+        return ok_response(operations)
+
+    client.bulk.side_effect = bulk
+    loader = BulkLoader(client, NAME, chunk_docs=4)
+    loader.min_chunk_docs = 1
+    with patch("es_testbed.ingest.bulk.time.sleep"):
+        loader.send([b"{}"] * 4)
+    assert sizes == [4, 2, 2]
+    assert (loader.docs, loader.requests, loader.retries) == (4, 3, 4)
+
+
+def test_send_rejected_request_exhausted(client):
+    client.bulk.side_effect = ApiError429("rejected")
+    loader = BulkLoader(client, NAME, max_retries=1)
+    with patch("es_testbed.ingest.bulk.time.sleep"):
+        with pytest.raises(TestbedFailure):
+            loader.send([b"{}"])
+    assert client.bulk.call_count == 2
+
+
+def test_adapt_shrinks_when_slow(client):
+    loader = BulkLoader(client, NAME, chunk_docs=1000, target_latency=1.0)
+    loader.adapt(1.5)
+    assert loader.chunk_docs == 500
+    loader.adapt(0.1, rejected=True)
+    assert loader.chunk_docs == 250
+    assert loader.max_latency == 1.5
+
+
+def test_adapt_floor_and_ceiling(client):
+    loader = BulkLoader(client, NAME, chunk_docs=100, target_latency=1.0)
+    for _ in range(10):
+        loader.adapt(5.0)
+    assert loader.chunk_docs == 10
+    for _ in range(20):
+        loader.adapt(0.1)
+    assert loader.chunk_docs == 100
+    loader.adapt(0.7)  # Between half the target and the target: no change
+    assert loader.chunk_docs == 100
+
+
+def test_adapt_latency_disabled(client):
+    loader = BulkLoader(client, NAME, chunk_docs=100, target_latency=None)
+    loader.adapt(60.0)
+    assert loader.chunk_docs == 100
+    loader.adapt(0.1, rejected=True)
+    assert loader.chunk_docs == 50
+
+
+def test_chunks_follow_adapted_size(client):
+    loader = BulkLoader(client, NAME, chunk_docs=20)
+    chunks = loader.chunks([b"{}"] * 50)
+    assert len(next(chunks)) == 20
+    loader.adapt(None, rejected=True)
+    assert [len(x) for x in chunks] == [10, 10, 10]
+
+
+def test_stats(client):
+    client.bulk.side_effect = lambda index, operations: ok_response(operations)
+    loader = BulkLoader(client, NAME, chunk_docs=5)
+    loader.load(docs(10))
+    stats = loader.stats(2.0)
+    assert stats["name"] == NAME
+    assert (stats["docs"], stats["requests"], stats["retries"]) == (10, 2, 0)
+    assert stats["docs_per_sec"] == 5.0
+    assert stats["bytes"] == sum(
+        len(x.kwargs["operations"]) for x in client.bulk.call_args_list
+    )
+    assert loader.stats(0)["docs_per_sec"] == 0.0
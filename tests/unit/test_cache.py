@@ -0,0 +1,156 @@
+"""Unit tests for the es_testbed.ingest.cache module"""
+
+# pylint: disable=C0115,C0116,R0903,R0913,R0917,W0212
+import json
+import typing as t
+from unittest.mock import patch
+import pytest
+from es_testbed.ingest.cache import (
+    CorpusCache,
+    TimestampRewriter,
+    cacheable,
+    generator_version,
+)
+from es_testbed.ingest.template import DocTemplate
+from es_testbed.ingest.generate import doc_lines
+
+EPOCH: float = 1735689600.0
+"""A fixed time for replay tests: 2025-01-01T00:00:00Z"""
+
+
+def gen(count: int = 3, start_at: int = 0, match: bool = True) -> t.Generator:
+    for num in range(start_at, start_at + count):
+        yield {"@timestamp": "2000-01-01T00:00:00Z", "num": num, "match": match}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CorpusCache(path=str(tmp_path))
+
+
+def test_from_settings():
+    assert CorpusCache.from_settings(None) is None
+    assert CorpusCache.from_settings({"cache": False}) is None
+    assert isinstance(CorpusCache.from_settings({"cache": True}), CorpusCache)
+    cache = CorpusCache.from_settings({"cache": {"path": "/x", "compress": True}})
+    assert str(cache.path) == "/x"
+    assert cache.compress
+
+
+def test_key_depends_on_options(cache):
+    assert cache.key(gen, {"count": 3}) == cache.key(gen, {"count": 3})
+    assert cache.key(gen, {"count": 3}) != cache.key(gen, {"count": 4})
+
+
+def test_generator_version():
+    assert generator_version(gen) == generator_version(gen)
+    assert len(generator_version(gen)) == 64
+
+
+def test_timestamp_rewriter():
+    rewrite = TimestampRewriter(["@timestamp", "other"], offset=90.5)
+    line = rewrite(
+        b'{"@timestamp":"2025-01-01T00:00:00Z","other":"2025-01-01T00:00:01.5Z",'
+        b'"keep":"2025-01-01T00:00:00Z","bad":"old"}'
+    )
+    assert json.loads(line) == {
+        "@timestamp": "2025-01-01T00:01:30.500000Z",
+        "other": "2025-01-01T00:01:32.000000Z",
+        "keep": "2025-01-01T00:00:00Z",
+        "bad": "old",
+    }
+    assert rewrite(b'{"@timestamp":"old"}') == b'{"@timestamp":"old"}'
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_record_and_replay(tmp_path, compress):
+    cache = CorpusCache(path=str(tmp_path), compress=compress)
+    lines = [
+        b'{"@timestamp":"2025-01-01T00:00:00Z","n":1}',
+        b'{"@timestamp":"2025-01-01T01:00:00Z","n":2}',
+    ]
+    with patch("es_testbed.ingest.cache.time.time", return_value=EPOCH - 60):
+        assert list(cache.record("abc", iter(lines))) == lines
+    path = cache.lookup("abc")
+    assert path == cache.filename("abc")
+    with patch("es_testbed.ingest.cache.time.time", return_value=EPOCH):
+        replayed = [json.loads(x) for x in cache.replay(path)]
+    assert replayed == [  # Shifted a minute, an hour apart as generated
+        {"@timestamp": "2025-01-01T00:01:00.000000Z", "n": 1},
+        {"@timestamp": "2025-01-01T01:01:00.000000Z", "n": 2},
+    ]
+
+
+def test_record_interrupted(cache):
+    def broken():
+        yield b"{}"
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        list(cache.record("abc", broken()))
+    assert cache.lookup("abc") is None
+    assert not list(cache.path.iterdir())
+
+
+def test_record_concurrent_writers(cache):
+    lines = [b'{"n":1}', b'{"n":2}']
+    first = cache.record("abc", iter(lines))
+    second = cache.record("abc", iter(lines))
+    assert next(first) == next(second) == lines[0]  # Both writing at once
+    assert list(first) == list(second) == lines[1:]
+    assert [x.name for x in cache.path.iterdir()] == ["abc.ndjson"]
+    assert cache.filename("abc").read_bytes() == b'{"n":1}\n{"n":2}\n'
+
+
+def test_record_stored_by_another_writer(cache):
+    def replace(_, final):
+        final.write_bytes(b"{}\n")  # The other writer got there first
+        raise PermissionError("in use")
+
+    with patch("es_testbed.ingest.cache.os.replace", side_effect=replace):
+        assert list(cache.record("abc", iter([b'{"n":1}']))) == [b'{"n":1}']
+    assert [x.name for x in cache.path.iterdir()] == ["abc.ndjson"]
+
+
+def test_replay_empty(cache, tmp_path):
+    path = tmp_path / "empty.ndjson"
+    path.write_bytes(b"")
+    assert not list(cache.replay(path))
+
+
+def test_doc_lines_uses_cache(tmp_path):
+    settings = {"cache": {"path": str(tmp_path)}}
+    first = list(doc_lines(gen, {"count": 2}, settings=settings))
+    with patch("es_testbed.ingest.generate.generated_lines") as mock_gen:
+        second = list(doc_lines(gen, {"count": 2}, settings=settings))
+        mock_gen.assert_not_called()
+    assert [json.loads(x)["num"] for x in first] == [0, 1]
+    assert [json.loads(x)["num"] for x in second] == [0, 1]
+
+
+def test_doc_lines_no_cache_for_random(tmp_path):
+    settings = {"cache": {"path": str(tmp_path)}}
+    list(doc_lines(gen, {"count": 2, "match": False}, settings=settings))
+    assert not list(tmp_path.iterdir())
+
+
+def seeded(count: int = 3, seed: t.Optional[int] = None) -> t.Generator:
+    yield from gen(count)
+
+
+def test_cacheable():
+    assert cacheable(gen, {})
+    assert not cacheable(seeded, {})
+    assert cacheable(seeded, {"seed": 7})
+    assert not cacheable(DocTemplate({"n": "{rand_int:1:9}"}).doc_generator, {})
+    with patch("es_testbed.ingest.cache.inspect.getmodule") as mock_module:
+        mock_module.return_value.CACHEABLE = False
+        assert not cacheable(gen, {})
+
+
+def test_doc_lines_no_cache_for_uncacheable(tmp_path):
+    settings = {"cache": {"path": str(tmp_path)}}
+    tmpl = DocTemplate({"n": "{seq}", "r": "{rand_int:1:9}"})
+    list(doc_lines(tmpl.doc_generator, {"count": 2}, settings=settings))
+    list(doc_lines(seeded, {"count": 2}, settings=settings))
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,97 @@
+"""Unit tests for the es_testbed.ingest.columnar module"""
+
+# pylint: disable=C0115,C0116,W0212
+import json
+import numpy as np
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest.columnar import (
+    batch_lines,
+    batch_to_lines,
+    encode_column,
+    template,
+)
+from es_testbed.presets.searchable_test.functions import (
+    batch_generator,
+    doc_generator,
+)
+
+
+def test_template():
+    assert template(["b", "a.x", "a.y"]) == ('{"b":%s,"a":{"x":%s,"y":%s}}', [0, 1, 2])
+    assert template(["a.x", "b", "a.y"]) == ('{"a":{"x":%s,"y":%s},"b":%s}', [0, 2, 1])
+    assert template(["100%"])[0] == '{"100%%":%s}'
+
+
+@pytest.mark.parametrize("fields", [["a", "a.b"], ["a.b", "a"]])
+def test_template_conflict(fields):
+    with pytest.raises(TestbedMisconfig):
+        template(fields)
+
+
+@pytest.mark.parametrize(
+    "values,expected",
+    [
+        (np.array([1, -2]), ["1", "-2"]),
+        (np.array([True, False]), ["true", "false"]),
+        (np.array([0.5, 2.0]), ["0.5", "2.0"]),
+        (np.array(["a", 'b"c']), ['"a"', '"b\\"c"']),
+        (
+            np.array(["2024-01-01T00:00:00"], dtype="datetime64[s]"),
+            ['"2024-01-01T00:00:00Z"'],
+        ),
+        (["x", None, {"k": [1]}], ['"x"', "null", '{"k":[1]}']),
+        (np.array([0.1, np.nan, np.inf]), ["0.1", "null", "null"]),
+        (np.array([0.1], dtype=np.float32), ["0.1"]),
+        (np.array([[1, 2], [3, 4]], dtype=np.int8), ["[1,2]", "[3,4]"]),
+        (np.array([[[0.5]], [[1.5]]]), ["[[0.5]]", "[[1.5]]"]),
+        (np.zeros((2, 0)), ["[]", "[]"]),
+    ],
+)
+def test_encode_column(values, expected):
+    assert encode_column(values) == expected
+
+
+def test_batch_to_lines():
+    batch = {"n": np.arange(2), "a.b": ["x", "y"]}
+    lines = batch_to_lines(batch)
+    assert [json.loads(x) for x in lines] == [
+        {"n": 0, "a": {"b": "x"}},
+        {"n": 1, "a": {"b": "y"}},
+    ]
+    assert not batch_to_lines({})
+
+
+def test_batch_to_lines_uneven():
+    with pytest.raises(TestbedMisconfig, match="differ in length"):
+        batch_to_lines({"a": [1, 2], "b": [1]})
+
+
+def test_batch_lines_size():
+    sizes = []
+
+    def gen(batch_size=1, count=5):
+        for begin in range(0, count, batch_size):
+            sizes.append(min(batch_size, count - begin))
+            yield {"n": np.arange(begin, begin + sizes[-1])}
+
+    lines = list(batch_lines(gen, {"count": 5}, settings={"batch_size": 2}))
+    assert [json.loads(x)["n"] for x in lines] == list(range(5))
+    assert sizes == [2, 2, 1]
+
+
+@pytest.mark.parametrize("match", [True, False])
+def test_searchable_test_batch_matches_doc_generator(match):
+    options = {"count": 7, "start_at": 3, "match": match}
+    lines = list(batch_lines(batch_generator, options, settings={"batch_size": 3}))
+    docs = list(doc_generator(**options))
+    assert len(lines) == len(docs)
+    for line, doc in zip(lines, docs):
+        value = json.loads(line)
+        assert sorted(value) == sorted(doc)
+        if match:
+            value.pop("@timestamp")
+            doc.pop("@timestamp")
+            assert value == doc
+        else:
+            assert 1001 <= value["number"] <= 32767
@@ -0,0 +1,137 @@
+"""Unit tests for the es_testbed.ingest.corpus module"""
+
+# pylint: disable=C0115,C0116,W0212,W0621
+import gzip
+import io
+import json
+from unittest.mock import patch
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import Corpus, corpus
+from es_testbed.ingest.corpus import chunked_lines, mmap_lines, nest
+
+DOCS: list = [
+    {"n": num, "msg": f"line {num}", "host": {"name": "a"}} for num in range(5)
+]
+"""Docs written to the NDJSON corpus files"""
+
+NDJSON: bytes = b"".join(json.dumps(doc).encode("utf-8") + b"\n" for doc in DOCS)
+"""DOCS as NDJSON, as json.dumps writes it, which encode_doc would not"""
+
+
+def drop_odd(doc):
+    """A transform that drops odd docs and tags the others"""
+    if doc["n"] % 2:
+        return None
+    return {**doc, "tag": "even"}
+
+
+@pytest.fixture
+def ndjson(tmp_path):
+    path = tmp_path / "docs.ndjson"
+    path.write_bytes(NDJSON)
+    return path
+
+
+def test_mmap_lines(tmp_path):
+    path = tmp_path / "x.ndjson"
+    path.write_bytes(b'{"a":1}\r\n\n{"a":2}')
+    assert list(mmap_lines(path)) == [b'{"a":1}', b'{"a":2}']
+    path.write_bytes(b"")
+    assert not list(mmap_lines(path))
+
+
+@pytest.mark.parametrize("size", [1, 3, 1024])
+def test_chunked_lines(size):
+    stream = io.BytesIO(b"ab\ncd\r\n\nef")
+    assert list(chunked_lines(stream, size)) == [b"ab", b"cd", b"ef"]
+
+
+def test_nest():
+    row = {"ts": "2024", "host": "a", "empty": "", "other": "x"}
+    fields = {"ts": "@timestamp", "host": "host.name", "empty": "e"}
+    assert nest(row, fields) == {"@timestamp": "2024", "host": {"name": "a"}}
+
+
+def test_ndjson_passes_lines_through(ndjson):
+    with patch("es_testbed.ingest.corpus.json.loads") as mock_loads:
+        lines = list(Corpus(ndjson).lines())
+    mock_loads.assert_not_called()
+    assert lines == NDJSON.splitlines()
+
+
+def test_ndjson_window(ndjson):
+    lines = list(Corpus(ndjson, start_at=1, count=2).lines())
+    assert [json.loads(line)["n"] for line in lines] == [1, 2]
+
+
+@pytest.mark.parametrize("transform", [drop_odd, "tests.unit.test_corpus:drop_odd"])
+def test_ndjson_transform(ndjson, transform):
+    lines = list(Corpus(ndjson, transform=transform).lines())
+    docs = [json.loads(line) for line in lines]
+    assert [doc["n"] for doc in docs] == [0, 2, 4]
+    assert lines[0] == b'{"n":0,"msg":"line 0","host":{"name":"a"},"tag":"even"}'
+
+
+@pytest.mark.parametrize("suffix", [".ndjson.gz", ".ndjson.zst"])
+def test_compressed(tmp_path, suffix):
+    path = tmp_path / f"docs{suffix}"
+    if suffix.endswith(".gz"):
+        path.write_bytes(gzip.compress(NDJSON))
+    else:
+        zstd = pytest.importorskip("zstandard")
+        path.write_bytes(zstd.ZstdCompressor().compress(NDJSON))
+    source = Corpus(path, read_bytes=7)
+    assert source.compression == ("gzip" if suffix.endswith(".gz") else "zstd")
+    assert list(source.lines()) == NDJSON.splitlines()
+
+
+def test_csv(tmp_path):
+    path = tmp_path / "logs.csv.gz"
+    path.write_bytes(
+        gzip.compress(b'ts,host,msg\n2024-01-01,a,"x, y"\n2024-01-02,,z\n')
+    )
+    fields = {"ts": "@timestamp", "host": "host.name", "msg": "message"}
+    source = Corpus.from_settings({"path": str(path), "fields": fields})
+    assert source.format == "csv"
+    assert [json.loads(line) for line in source.lines()] == [
+        {"@timestamp": "2024-01-01", "host": {"name": "a"}, "message": "x, y"},
+        {"@timestamp": "2024-01-02", "message": "z"},
+    ]
+
+
+def test_csv_all_columns(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("a,b\n1,2\n", encoding="utf-8")
+    assert list(Corpus(path).docs()) == [{"a": "1", "b": "2"}]
+
+
+def test_from_settings(ndjson):
+    assert Corpus.from_settings(None) is None
+    assert Corpus.from_settings(str(ndjson)).path == ndjson
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"format": "xml"},
+        {"compression": "bz2"},
+        {"transform": "no.such.module:func"},
+    ],
+)
+def test_misconfig(ndjson, kwargs):
+    with pytest.raises(TestbedMisconfig):
+        Corpus(ndjson, **kwargs)
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(TestbedMisconfig):
+        Corpus(tmp_path / "nope.ndjson")
+
+
+def test_zstd_not_installed(tmp_path):
+    path = tmp_path / "docs.ndjson.zst"
+    path.write_bytes(b"")
+    with patch.object(corpus, "zstandard", None):
+        with pytest.raises(TestbedMisconfig):
+            Corpus(path)
@@ -1,7 +1,7 @@
 """Unit tests for es_testbed.entities module"""
 
 # pylint: disable=C0115,C0116,R0903,R0913,R0917,W0212
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, PropertyMock, patch
 import typing as t
 import logging
 import re
@@ -11,9 +11,9 @@ from elasticsearch8.exceptions import BadRequestError
 from es_wait.exceptions import EsWaitFatal, EsWaitTimeout
 from es_testbed.debug import debug
 from es_testbed.exceptions import TestbedFailure
+from es_testbed.ilm import PhaseGraph
 from . import ALIAS, INDEX1, INDICES, my_retval
 
-
 ALIAS_FIXT: str = "alias,idx_list,retval,expected"
 """CSV string of pytest.mark.parametrize fixtures for Alias tests."""
 
@@ -96,14 +96,8 @@ def test_verify_method(alias, alias_cls, expected, idx_list, retval, caplog):
 def test_get_target(index_cls, phase, phases, expected, logmsg, caplog):
     caplog.set_level(logging.DEBUG)
     with debug.change_level(3):
-        index_cls.ilm_tracker.policy_phases = phases
+        index_cls.ilm_tracker.graph = PhaseGraph({x: {} for x in phases})
         index_cls.ilm_tracker.explain.phase = phase
-        index_cls.ilm_tracker.pname.side_effect = lambda x: {
-            "hot": 1,
-            "warm": 2,
-            "cold": 3,
-            "frozen": 4,
-        }[x]
         target = index_cls._get_target
         assert target == expected
         if logmsg:
@@ -112,12 +106,7 @@ def test_get_target(index_cls, phase, phases, expected, logmsg, caplog):
 
 def test_phase_tuple(index_cls):
     index_cls.ilm_tracker.explain.phase = "hot"
-    index_cls.ilm_tracker.policy_phases = ["hot", "cold", "frozen"]
-    index_cls.ilm_tracker.pname.side_effect = lambda x: {
-        "hot": 1,
-        "cold": 2,
-        "frozen": 3,
-    }[x]
+    index_cls.ilm_tracker.graph = PhaseGraph({"hot": {}, "cold": {}, "frozen": {}})
     assert index_cls.phase_tuple == ("hot", "cold")
 
 
@@ -296,8 +285,9 @@ def test_mount_ss_phase_new(index_cls, caplog):
         curr, target = ("new", "cold")
         index_cls.policy_name = "test-policy"
         index_cls.ilm_tracker = MagicMock()
-        index_cls.ilm_tracker.next_phase = target
+        index_cls.ilm_tracker.next_phase.return_value = target
         index_cls.ilm_tracker.explain.phase = curr
+        index_cls.ilm_tracker.graph = PhaseGraph({"hot": {}, "delete": {}})
         scheme = {"target_tier": target}
         with patch("es_testbed.entities.index.IlmPhase") as mock_ilm_phase:
             mock_ilm_phase_instance = mock_ilm_phase.return_value
@@ -310,15 +300,48 @@ def test_mount_ss_phase_new(index_cls, caplog):
                 mock_wait_try.assert_any_call(mock_ilm_phase_instance.wait)
 
 
+def test_mount_ss_phase_new_wait_key(index_cls):
+    index_cls.policy_name = "test-policy"
+    index_cls.ilm_tracker.next_phase.return_value = "hot"
+    index_cls.ilm_tracker.explain.phase = "new"
+    index_cls.ilm_tracker.graph = PhaseGraph({"hot": {}, "delete": {}})
+    with patch("es_testbed.entities.index.IlmPhase") as mock_ilm_phase, patch(
+        "es_testbed.entities.index.adaptive"
+    ) as mock_adaptive, patch.object(index_cls, "_wait_try"):
+        index_cls.mount_ss({"target_tier": "cold"})
+        assert mock_ilm_phase.call_args.kwargs["phase"] == "hot"
+        mock_adaptive.assert_any_call(mock_ilm_phase.return_value, key="ilm_phase:hot")
+
+
 def test_mount_ss_phase_new_raises(index_cls, caplog):
     caplog.set_level(logging.DEBUG)
     err = "SPECIFIC ERROR"
     curr, target = ("new", "cold")
     index_cls.policy_name = "test-policy"
     index_cls.ilm_tracker = MagicMock()
-    index_cls.ilm_tracker.next_phase = target
+    index_cls.ilm_tracker.next_phase.return_value = target
     index_cls.ilm_tracker.explain.phase = curr
     with patch.object(index_cls, "_wait_try", side_effect=TestbedFailure(err)):
         with pytest.raises(TestbedFailure):
             index_cls.mount_ss({"target_tier": target})
             assert err in caplog.text
+
+
+@pytest.mark.parametrize("add_snapshot", [True, False])
+def test_mount_ss_ilm(index_cls, add_snapshot):
+    index_cls.policy_name = "test-policy"
+    index_cls.ilm_tracker.explain.phase = "hot"
+    with patch(
+        "es_testbed.entities.Index.am_i_write_idx", new_callable=PropertyMock
+    ) as mock_write, patch(
+        "es_testbed.entities.Index._get_target", new_callable=PropertyMock
+    ) as mock_target:
+        mock_write.return_value = False
+        mock_target.return_value = "cold"
+        with patch.object(index_cls, "_mounted_step") as mock_mounted_step:
+            with patch.object(index_cls, "_add_snap_step") as mock_add_snap_step:
+                assert index_cls.mount_ss({"target_tier": "cold"}, add_snapshot)
+                mock_mounted_step.assert_called_once_with("cold")
+                assert mock_add_snap_step.called is add_snapshot
+                index_cls.record_snapshot()
+                assert mock_add_snap_step.call_count == int(add_snapshot) + 1
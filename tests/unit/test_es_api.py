@@ -10,22 +10,32 @@ from es_testbed.es_api import (
     change_ds,
     delete,
     exists,
+    fill_index,
+    field_cardinality,
+    flush_refresh,
     get,
     get_aliases,
     get_backing_indices,
     get_ilm,
     get_ilm_phases,
+    get_settings,
     get_write_index,
     ilm_explain,
+    ilm_explain_all,
     ilm_move,
+    index_stats,
+    is_data_stream,
     put_comp_tmpl,
     put_idx_tmpl,
     put_ilm,
+    put_settings,
     resolver,
     rollover,
+    shards_started,
     snapshot_name,
     wait_wrapper,
 )
+from es_testbed.ingest.timestamps import timestamp_series
 from es_testbed.exceptions import (
     NameChanged,
     ResultNotExpected,
@@ -86,6 +96,282 @@ def test_rollover(client):
     )
 
 
+def test_is_data_stream(client):
+    client.indices.resolve_index.return_value = {
+        "indices": [],
+        "aliases": [],
+        "data_streams": [{"name": "test-ds"}],
+    }
+    assert is_data_stream(client, "test-ds")
+
+
+@pytest.mark.parametrize("streams,op_type", [([], "index"), (["ds"], "create")])
+def test_fill_index(client, streams, op_type):
+    client.indices.resolve_index.return_value = {"data_streams": streams}
+    client.bulk.return_value = {"errors": False, "items": []}
+
+    def gen(count=1):
+        for num in range(count):
+            yield {"num": num}
+
+    stats = fill_index(
+        client, name="test-name", doc_generator=gen, options={"count": 2}
+    )
+    assert (stats["name"], stats["requests"]) == ("test-name", 1)
+    body = client.bulk.call_args.kwargs["operations"]
+    assert body.splitlines()[0] == f'{{"{op_type}":{{}}}}'.encode()
+    client.indices.flush.assert_called_once_with(index="test-name")
+    client.indices.refresh.assert_called_once_with(index="test-name")
+
+
+def test_fill_index_corpus(client, tmp_path):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.return_value = {"errors": False, "items": []}
+    path = tmp_path / "docs.ndjson"
+    path.write_bytes(b'{"a": 1}\n{"a": 2}\n')
+    stats = fill_index(client, name="test-name", corpus={"path": str(path)})
+    assert stats["docs"] == 2
+    body = client.bulk.call_args.kwargs["operations"]
+    assert body.splitlines()[1::2] == [b'{"a": 1}', b'{"a": 2}']
+
+
+def stats_response(docs, store=0):
+    return {
+        "_all": {
+            "primaries": {
+                "indexing": {"index_total": docs},
+                "store": {"size_in_bytes": store},
+            }
+        }
+    }
+
+
+def test_index_stats(client):
+    client.indices.stats.return_value = stats_response(30, 4096)
+    client.indices.get_settings.return_value = {
+        "idx": {"settings": {"index.number_of_shards": "3"}}
+    }
+    assert index_stats(client, "idx", refresh=True) == {
+        "docs": 30,
+        "store_bytes": 4096,
+        "shards": 3,
+    }
+    client.indices.refresh.assert_called_once_with(index="idx")
+
+
+def test_index_stats_raises(client):
+    client.indices.stats.side_effect = Exception("error")
+    with pytest.raises(TestbedFailure, match="Unable to get the stats"):
+        index_stats(client, "idx")
+
+
+def test_fill_index_target(client):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.return_value = {"errors": False, "items": []}
+    client.indices.get_settings.return_value = {
+        "test-name": {"settings": {"index.number_of_shards": "2"}}
+    }
+    sent = []
+    client.indices.stats.side_effect = lambda **_: stats_response(len(sent))
+
+    def gen(count=1, start_at=0):
+        for num in range(start_at, start_at + count):
+            sent.append(num)
+            yield {"num": num}
+
+    stats = fill_index(
+        client,
+        name="test-name",
+        doc_generator=gen,
+        options={"count": 1, "start_at": 5},
+        ingest={"target_docs_per_shard": 10, "target_check_docs": 8},
+    )
+    assert stats["docs"] == 24
+    assert sent == list(range(5, 29))
+
+
+def test_fill_index_target_timestamps(client):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.return_value = {"errors": False, "items": []}
+    client.indices.get_settings.return_value = {
+        "test-name": {"settings": {"index.number_of_shards": "1"}}
+    }
+    epochs = []
+    client.indices.stats.side_effect = lambda **_: stats_response(len(epochs))
+
+    def gen(count=1, start_at=0, timestamps=None):
+        series = timestamp_series(timestamps, count, start_at)
+        for num in range(start_at, start_at + count):
+            epochs.append(series.epoch(num))
+            yield {"num": num}
+
+    fill_index(
+        client,
+        name="test-name",
+        doc_generator=gen,
+        options={"count": 16, "timestamps": {"start": "now-1d", "end": "now"}},
+        ingest={"target_docs_per_shard": 16, "target_check_docs": 8},
+    )
+    assert len(epochs) == 16  # Two rounds
+    assert epochs == sorted(epochs)
+    assert epochs[-1] - epochs[0] > 43200  # Spread over the whole window
+
+
+def test_fill_index_target_errors(client):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    failed = {"index": {"status": 400, "error": {"type": "mapper_parsing_exception"}}}
+    client.bulk.return_value = {"errors": True, "items": [failed] * 4}
+    client.indices.get_settings.return_value = {
+        "test-name": {"settings": {"index.number_of_shards": "1"}}
+    }
+    client.indices.stats.return_value = stats_response(0)
+
+    def gen(count=1, start_at=0):
+        for num in range(start_at, start_at + count):
+            yield {"num": num}
+
+    with pytest.raises(TestbedFailure, match="Stopped filling"):
+        fill_index(
+            client,
+            name="test-name",
+            doc_generator=gen,
+            ingest={
+                "target_docs_per_shard": 10,
+                "target_check_docs": 8,
+                "chunk_docs": 4,
+            },
+        )
+    assert client.bulk.call_count == client.indices.stats.call_count == 1
+
+
+def test_fill_index_target_corpus(client, tmp_path):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    path = tmp_path / "docs.ndjson"
+    path.write_bytes(b'{"a": 1}\n')
+    with pytest.raises(TestbedMisconfig):
+        fill_index(
+            client,
+            name="test-name",
+            corpus=str(path),
+            ingest={"target_store_size": "1gb"},
+        )
+
+
+def test_fill_index_bulk_profile(client):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.return_value = {"errors": False, "items": []}
+    client.indices.get_settings.return_value = {
+        "test-name": {"settings": {"index.number_of_replicas": "1"}}
+    }
+    fill_index(
+        client,
+        name="test-name",
+        doc_generator=lambda: iter([{"a": 1}]),
+        ingest={"bulk_profile": True},
+    )
+    applied, restored = client.indices.put_settings.call_args_list
+    assert applied.kwargs["settings"]["index.refresh_interval"] == "-1"
+    assert restored.kwargs["settings"] == {
+        "index.refresh_interval": None,
+        "index.number_of_replicas": "1",
+        "index.translog.durability": None,
+    }
+
+
+def test_fill_index_bulk_profile_data_stream(client):
+    client.indices.resolve_index.return_value = {
+        "data_streams": [{"name": "ds", "backing_indices": [".ds-1", ".ds-2"]}]
+    }
+    client.bulk.return_value = {"errors": False, "items": []}
+    client.indices.get_settings.return_value = {}
+    fill_index(
+        client,
+        name="ds",
+        doc_generator=lambda: iter([{"a": 1}]),
+        ingest={"bulk_profile": True},
+    )
+    for args in client.indices.put_settings.call_args_list:
+        assert args.kwargs["index"] == ".ds-2"
+
+
+def test_fill_index_bulk_profile_restores_on_failure(client):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.side_effect = Exception("boom")
+    client.indices.get_settings.return_value = {}
+    with pytest.raises(TestbedFailure):
+        fill_index(
+            client,
+            name="test-name",
+            doc_generator=lambda: iter([{"a": 1}]),
+            ingest={"bulk_profile": True},
+        )
+    assert client.indices.put_settings.call_count == 2
+
+
+@pytest.mark.parametrize("batch,expected", [(True, "batch"), (False, "doc")])
+def test_fill_index_batch_generator(client, batch, expected):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.return_value = {"errors": False, "items": []}
+    fill_index(
+        client,
+        name="test-name",
+        doc_generator=lambda: iter([{"from": "doc"}]),
+        batch_generator=lambda batch_size: iter([{"from": ["batch"]}]),
+        ingest={"batch": batch},
+    )
+    body = client.bulk.call_args.kwargs["operations"]
+    assert body.splitlines()[1] == f'{{"from":"{expected}"}}'.encode()
+
+
+def test_fill_index_defer_refresh(client):
+    client.indices.resolve_index.return_value = {"data_streams": []}
+    client.bulk.return_value = {"errors": False, "items": []}
+    fill_index(
+        client,
+        name="test-name",
+        doc_generator=lambda: iter([{"a": 1}]),
+        ingest={"defer_refresh": True},
+    )
+    client.indices.flush.assert_not_called()
+    client.indices.refresh.assert_not_called()
+
+
+def test_flush_refresh(client):
+    shards = {"total": 4, "successful": 4, "failed": 0}
+    client.indices.flush.return_value = {"_shards": shards}
+    client.indices.refresh.return_value = {"_shards": shards}
+    assert flush_refresh(client, "*tb-*-abc*") == shards
+    client.indices.refresh.assert_called_once_with(
+        index="*tb-*-abc*", expand_wildcards=["open", "hidden"]
+    )
+
+
+def test_flush_refresh_shard_failures(client):
+    client.indices.flush.return_value = {"_shards": {"total": 2, "failed": 0}}
+    client.indices.refresh.return_value = {"_shards": {"total": 2, "failed": 1}}
+    with pytest.raises(TestbedFailure, match="failed on 1 shards"):
+        flush_refresh(client, "*tb-*-abc*")
+
+
+def test_flush_refresh_raises(client):
+    client.indices.flush.side_effect = Exception("error")
+    with pytest.raises(TestbedFailure, match="Unable to flush"):
+        flush_refresh(client, "*tb-*-abc*")
+    client.indices.refresh.assert_not_called()
+
+
+def test_get_settings_raises(client):
+    client.indices.get_settings.side_effect = Exception("error")
+    with pytest.raises(ResultNotExpected):
+        get_settings(client, "test-name", ["index.refresh_interval"])
+
+
+def test_put_settings_raises(client):
+    client.indices.put_settings.side_effect = Exception("error")
+    with pytest.raises(TestbedFailure):
+        put_settings(client, "test-name", {"index.refresh_interval": "1s"})
+
+
 def test_ilm_move(client):
     ilm_move(client, "test-index", {"phase": "hot"}, {"phase": "cold"})
     client.ilm.move_to_step.assert_called_once_with(
@@ -93,6 +379,26 @@ def test_ilm_move(client):
     )
 
 
+@pytest.mark.parametrize(
+    "status,expected", [("green", True), ("yellow", True), ("red", False)]
+)
+def test_shards_started(client, status, expected):
+    client.cluster.health.return_value = {"status": status}
+    assert shards_started(client, "test-index") is expected
+    client.cluster.health.assert_called_once_with(index="test-index")
+
+
+def test_shards_started_not_found(client, notfound):
+    client.cluster.health.side_effect = notfound
+    assert not shards_started(client, "test-index")
+
+
+def test_shards_started_raises(client):
+    client.cluster.health.side_effect = Exception("error")
+    with pytest.raises(TestbedFailure):
+        shards_started(client, "test-index")
+
+
 def test_ilm_move_exception(client, caplog):
     caplog.set_level(50)
     client.ilm.move_to_step.side_effect = Exception("error")
@@ -262,15 +568,26 @@ class TestIlmExplain:
         result = ilm_explain(client, "test-index")
         assert result == {"phase": "hot"}
 
-    def test_ilm_explain_key_error(self, client, caplog):
-        caplog.set_level(10)
+    def test_ilm_explain_key_error(self, client):
         client.ilm.explain_lifecycle.return_value = {
             "indices": {"new-index": {"phase": "hot"}}
         }
-        client.ilm.explain_lifecycle.side_effect = KeyError
-        with pytest.raises(KeyError):
-            assert ilm_explain(client, "test-index") == {"phase": "hot"}
-            assert "Index name changed" in caplog.text
+        assert ilm_explain(client, "test-index") == {"phase": "hot"}
+        client.ilm.explain_lifecycle.assert_called_once_with(index="test-index")
+
+    def test_ilm_explain_nothing_found(self, client):
+        client.ilm.explain_lifecycle.return_value = {"indices": {}}
+        with pytest.raises(NameChanged):
+            ilm_explain(client, "test-index")
+
+    def test_ilm_explain_all(self, client):
+        indices = {"a": {"phase": "hot"}, "b": {"phase": "warm"}}
+        client.ilm.explain_lifecycle.return_value = {"indices": indices}
+        assert ilm_explain_all(client, "*tb-idx-abc*") == indices
+
+    def test_ilm_explain_all_not_found(self, client, notfound):
+        client.ilm.explain_lifecycle.side_effect = notfound
+        assert not ilm_explain_all(client, "*tb-idx-abc*")
 
     def test_ilm_explain_not_found_error(self, client, caplog, notfound):
         caplog.set_level(30)  # warning
@@ -456,3 +773,17 @@ class TestGet:
         with pytest.raises(TestbedMisconfig):
             get(client, kind, None)
             assert f'"{kind}" has a None value for pattern' in caplog.text
+
+
+def test_field_cardinality(client):
+    client.search.return_value = {"aggregations": {"values": {"value": 42}}}
+    assert field_cardinality(client, "idx", "host") == 42
+    kwargs = client.search.call_args.kwargs
+    assert kwargs["aggs"]["values"]["cardinality"]["field"] == "host"
+    assert kwargs["size"] == 0
+
+
+def test_field_cardinality_raises(client):
+    client.search.side_effect = Exception("error")
+    with pytest.raises(TestbedFailure, match="Unable to count"):
+        field_cardinality(client, "idx", "host")
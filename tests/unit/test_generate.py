@@ -0,0 +1,113 @@
+"""Unit tests for the es_testbed.ingest.generate module"""
+
+# pylint: disable=C0115,C0116,R0903,R0913,R0917,W0212
+import json
+import typing as t
+import pytest
+from es_testbed.ingest.generate import (
+    doc_lines,
+    encode_range,
+    partitions,
+    process_lines,
+    range_options,
+    resolve_range,
+)
+from es_testbed.presets.searchable_test import functions as searchable
+
+
+def ranged(count: int = 10, start_at: int = 0) -> t.Generator[t.Dict, None, None]:
+    """A module-level (picklable) generator taking count and start_at"""
+    for num in range(start_at, start_at + count):
+        yield {"num": num}
+
+
+def unranged(total: int = 3) -> t.Generator[t.Dict, None, None]:
+    """A generator that cannot be partitioned"""
+    for num in range(total):
+        yield {"num": num}
+
+
+def nums(lines: t.Iterable[bytes]) -> t.List[int]:
+    return [json.loads(line)["num"] for line in lines]
+
+
+@pytest.mark.parametrize(
+    "count,start_at,size,expected",
+    [
+        (10, 0, 4, [(0, 4), (4, 4), (8, 2)]),
+        (6, 20, 3, [(20, 3), (23, 3)]),
+        (0, 5, 3, []),
+    ],
+)
+def test_partitions(count, start_at, size, expected):
+    assert partitions(count, start_at=start_at, size=size) == expected
+
+
+def test_range_options():
+    assert range_options(ranged, {}) == (0, 10)
+    assert range_options(ranged, {"count": 5, "start_at": 7}) == (7, 5)
+    assert range_options(unranged, {}) is None
+
+
+def test_encode_range():
+    assert nums(encode_range(ranged, {"count": 99}, 3, 2).split(b"\n")) == [3, 4]
+
+
+def test_process_lines_in_order():
+    lines = process_lines(ranged, {"count": 25, "start_at": 5}, 2, partition_docs=4)
+    assert nums(lines) == list(range(5, 30))
+
+
+def test_doc_lines_single_process():
+    assert nums(doc_lines(ranged, {"count": 3})) == [0, 1, 2]
+
+
+def test_doc_lines_processes():
+    settings = {"processes": 2, "partition_docs": 3}
+    assert nums(doc_lines(ranged, {"count": 7}, settings=settings)) == list(range(7))
+
+
+def test_doc_lines_processes_unsupported(caplog):
+    assert nums(doc_lines(unranged, {}, settings={"processes": 2})) == [0, 1, 2]
+    assert "does not accept count and start_at" in caplog.text
+
+
+def tagged(doc: t.Dict) -> bytes:
+    """A module-level (picklable) encoder"""
+    return json.dumps({"tag": True, **doc}).encode("utf-8")
+
+
+@pytest.mark.parametrize("settings", [None, {"processes": 2, "partition_docs": 2}])
+def test_doc_lines_encoder(settings):
+    lines = list(doc_lines(ranged, {"count": 5}, settings=settings, encoder=tagged))
+    assert nums(lines) == list(range(5))
+    assert all(json.loads(line)["tag"] for line in lines)
+
+
+def test_doc_lines_batch_generator():
+    def batches(batch_size=1, count=3):
+        for begin in range(0, count, batch_size):
+            yield {"num": list(range(begin, min(begin + batch_size, count)))}
+
+    lines = doc_lines(ranged, {"count": 3}, batch_generator=batches)
+    assert nums(lines) == [0, 1, 2]
+
+
+def test_doc_lines_processes_resolve_randomness():
+    settings = {"processes": 2, "partition_docs": 3}
+    lines = doc_lines(
+        searchable.doc_generator, {"count": 7, "match": False}, settings=settings
+    )
+    docs = [json.loads(line) for line in lines]
+    assert len(docs) == 7
+    prefixes = {doc["message"][: -len(str(num))] for num, doc in enumerate(docs)}
+    assert len(prefixes) == 1 and prefixes != {"message"}
+    assert len({doc["@timestamp"] for doc in docs}) == 1  # One now for all parts
+
+
+def test_resolve_range_keeps_resolved():
+    options = resolve_range(searchable.doc_generator, {"count": 3, "match": False})
+    assert set(options["matchmap"]) == {"message", "nested", "deep"}
+    assert "first" in options["timestamps"]
+    assert resolve_range(searchable.doc_generator, options) == options
+    assert resolve_range(ranged, {"count": 3}) == {"count": 3}
@@ -15,7 +15,7 @@ from es_testbed.defaults import (
     TIMEOUT_ENVVAR,
 )
 from es_testbed.exceptions import TestbedFailure
-from es_testbed.ilm import IlmTracker
+from es_testbed.ilm import ExplainCache, IlmTracker, PhaseGraph, PolicyCache
 from es_testbed.exceptions import ResultNotExpected, TestbedMisconfig, NameChanged
 from . import INDEX1
 
@@ -433,11 +433,14 @@ def test_advance_from_new_to_hot(tracker_adv):
         tracker_adv, "wait4complete"
     ) as mock_wait4complete, patch(
         "es_testbed.ilm.debug.lv2"
-    ) as mock_debug:
+    ) as mock_debug, patch(
+        "es_testbed.ilm.settle"
+    ) as mock_settle:
 
         tracker_adv.advance(phase=expected)
 
         # Assertions
+        assert mock_settle.call_args.kwargs["key"] == "shards_started"
         mock_phase_wait.assert_called_once_with(expected)
         mock_ilm_move.assert_not_called()
         mock_wait4complete.assert_called_once()
@@ -456,6 +459,8 @@ def test_advance_beyond_hot_to_warm(tracker_adv, caplog):
             tracker_adv, "wait4complete"
         ), patch.object(
             tracker_adv, "_phase_wait"
+        ), patch(
+            "es_testbed.ilm.settle"
         ):
 
             assert tracker_adv.current_step()["phase"] == start
@@ -507,7 +512,9 @@ def test_advance_phase_wait_error_handling(tracker_adv, caplog):
         tracker_adv, "_phase_wait"
     ) as mock_phase_wait, patch.object(
         tracker_adv, "wait4complete"
-    ) as mock_wait4complete:
+    ) as mock_wait4complete, patch(
+        "es_testbed.ilm.settle"
+    ):
 
         mock_phase_wait.side_effect = TestbedFailure("Phase wait failed")
 
@@ -524,3 +531,188 @@ def test_next_step_no_phase(tracker):
     """Test next_step when no phase is provided."""
     with patch.object(tracker, "next_phase", return_value="warm"):
         assert tracker.next_step(phase=None) == {"phase": "warm"}
+
+
+EXPLAINED = {
+    INDEX1: {"index": INDEX1, "phase": "hot", "action": "complete", "step": "complete"},
+    "other": {"index": "other", "phase": "warm", "action": "complete"},
+}
+
+
+@patch("es_testbed.ilm.ilm_explain_all", return_value=EXPLAINED)
+def test_explain_cache_one_call(mock_all, client):
+    cache = ExplainCache(client, "*tb-idx-abc*", ttl=60)
+    assert cache.get(INDEX1)["phase"] == "hot"
+    assert cache.get("other")["phase"] == "warm"
+    mock_all.assert_called_once_with(client, "*tb-idx-abc*")
+    cache.invalidate()
+    cache.get(INDEX1)
+    assert mock_all.call_count == 2 and cache.calls == 2
+
+
+@patch("es_testbed.ilm.ilm_explain_all", return_value=EXPLAINED)
+def test_explain_cache_ttl(mock_all, client):
+    cache = ExplainCache(client, "*tb-idx-abc*", ttl=0)
+    cache.get(INDEX1)
+    with patch("es_testbed.ilm.time.monotonic", return_value=1e12):
+        cache.get(INDEX1)
+    assert mock_all.call_count == 2
+
+
+def test_explain_cache_invalidated_while_fetching(client):
+    cache = ExplainCache(client, "*tb-idx-abc*", ttl=60)
+    moved = {INDEX1: dict(EXPLAINED[INDEX1], phase="warm")}
+
+    def explain_all(*_):
+        if mock_all.call_count == 1:
+            cache.invalidate()  # ILM moves the index while this is in flight
+            return EXPLAINED
+        return moved
+
+    with patch("es_testbed.ilm.ilm_explain_all", side_effect=explain_all) as mock_all:
+        assert cache.get(INDEX1)["phase"] == "hot"
+        assert cache.stale
+        assert cache.get(INDEX1)["phase"] == "warm"
+        assert not cache.stale
+
+
+@patch("es_testbed.ilm.ilm_explain", return_value={"phase": "cold"})
+@patch("es_testbed.ilm.ilm_explain_all", return_value=EXPLAINED)
+def test_explain_cache_missing_index(mock_all, mock_one, client):
+    cache = ExplainCache(client, "*tb-idx-abc*", ttl=60)
+    cache.get(INDEX1)
+    assert cache.get("restored-x") == {"phase": "cold"}
+    # Refetched once, as it may be new, then explained alone
+    assert mock_all.call_count == 2
+    mock_one.assert_called_once_with(client, "restored-x")
+    assert cache.get("restored-x") == {"phase": "cold"}
+    assert mock_one.call_count == 1
+
+
+@patch("es_testbed.ilm.ilm_explain_all", return_value=EXPLAINED)
+def test_trackers_share_the_cache(mock_all, client):
+    cache = ExplainCache(client, "*tb-idx-abc*", ttl=60)
+    with patch("es_testbed.ilm.resolver") as mock_resolver, patch(
+        "es_testbed.ilm.get_ilm_phases", return_value={"hot": {}, "warm": {}}
+    ), patch("es_testbed.ilm.ilm_explain") as mock_one:
+        mock_resolver.side_effect = lambda _, name: {
+            "indices": [{"name": name}],
+            "aliases": [],
+            "data_streams": [],
+        }
+        trackers = [IlmTracker(client, name, cache=cache) for name in EXPLAINED]
+        for tracker in trackers:
+            tracker.update()
+    assert [x.explain.phase for x in trackers] == ["hot", "warm"]
+    mock_one.assert_not_called()
+    mock_all.assert_called_once()
+    trackers[0].invalidate()
+    assert cache.stale
+
+
+def test_advance_waits_for_move(tracker):
+    """advance only waits for the phase once ILM explain shows the move"""
+    hot = {"phase": "hot", "action": "complete", "step": "complete"}
+    warm = {"phase": "warm", "action": "migrate", "step": "branch-check-skip"}
+    done = {"phase": "warm", "action": "complete", "step": "complete"}
+    with patch(
+        "es_testbed.ilm.ilm_explain", side_effect=[hot, hot, hot, warm, done, done]
+    ), patch("es_testbed.ilm.ilm_move") as mock_ilm_move, patch.object(
+        tracker, "_phase_wait"
+    ) as mock_phase_wait, patch(
+        "es_testbed.ilm.IlmStep"
+    ), patch(
+        "es_testbed.waits.time.sleep"
+    ) as mock_sleep:
+        tracker.advance(phase="warm")
+    mock_ilm_move.assert_called_once_with(
+        tracker.client,
+        INDEX1,
+        {"phase": "hot", "action": "complete", "name": "complete"},
+        {"phase": "warm"},
+    )
+    mock_phase_wait.assert_called_once_with("warm")
+    mock_sleep.assert_called_once()  # One short pause, not a fixed second
+    assert mock_sleep.call_args.args[0] < 1.0
+
+
+POLICY = {"phases": {"hot": {"actions": {}}, "delete": {"actions": {"delete": {}}}}}
+
+
+def test_policy_cache_seeded(client):
+    policies = PolicyCache(client)
+    policies.put("my-policy", DotMap(POLICY))
+    assert "my-policy" in policies
+    with patch("es_testbed.ilm.get_ilm_phases") as mock_get_ilm_phases:
+        assert list(policies.phases("my-policy")) == ["hot", "delete"]
+    mock_get_ilm_phases.assert_not_called()
+    assert policies.reads == 0
+
+
+def test_policy_cache_reads_once(client):
+    policies = PolicyCache(client)
+    with patch("es_testbed.ilm.get_ilm_phases", return_value={"hot": {}}) as mock_get:
+        policies.phases("other")
+        policies.phases("other")
+        policies.invalidate("other")
+        assert "other" not in policies
+        policies.phases("other")
+    assert mock_get.call_count == 2 and policies.reads == 2
+
+
+def test_tracker_uses_policy_cache(client):
+    policies = PolicyCache(client)
+    policies.put("my-policy", POLICY)
+    explain = {"policy": "my-policy", "phase": "hot", "action": "complete"}
+    with patch("es_testbed.ilm.resolver", return_value=RESOLVER), patch(
+        "es_testbed.ilm.ilm_explain", return_value=explain
+    ), patch("es_testbed.ilm.get_ilm_phases") as mock_get_ilm_phases:
+        trackers = [IlmTracker(client, INDEX1, policies=policies) for _ in range(3)]
+    mock_get_ilm_phases.assert_not_called()
+    assert all(x.policy_phases == ["hot", "delete"] for x in trackers)
+
+
+def test_phase_graph():
+    graph = PhaseGraph(
+        {
+            "delete": {"actions": {"delete": {}}},
+            "frozen": {"actions": {"searchable_snapshot": {}}},
+            "hot": {"actions": {"forcemerge": {}, "rollover": {}, "custom": {}}},
+            "cold": {"actions": {}},
+        }
+    )
+    assert graph.order == ("hot", "cold", "frozen", "delete")
+    assert graph.next["new"] == "hot" and graph.next["warm"] == "cold"
+    assert graph.next["delete"] is None
+    assert graph.searchable == {"cold", "frozen"}
+    assert [graph.targets[x] for x in ("new", "hot", "cold", "frozen", "delete")] == [
+        "cold",
+        "cold",
+        "frozen",
+        "frozen",
+        "delete",
+    ]
+    assert graph.actions["hot"] == ("rollover", "forcemerge", "custom", "complete")
+    assert graph.actions["cold"] == ("complete",)
+    assert graph.number["frozen"] == 4 and graph.names[4] == "frozen"
+
+
+def test_phase_graph_immutable():
+    graph = PhaseGraph({"hot": {}})
+    with pytest.raises(AttributeError):
+        graph.order = ("warm",)
+    with pytest.raises(TypeError):
+        graph.next["hot"] = "warm"
+
+
+def test_policy_cache_shares_graph(client):
+    policies = PolicyCache(client)
+    policies.put("my-policy", POLICY)
+    explain = {"policy": "my-policy", "phase": "hot", "action": "complete"}
+    with patch("es_testbed.ilm.resolver", return_value=RESOLVER), patch(
+        "es_testbed.ilm.ilm_explain", return_value=explain
+    ):
+        first, second = (IlmTracker(client, INDEX1, policies=policies) for _ in "ab")
+    assert first.graph is second.graph is policies.graph("my-policy")
+    assert first.next_phase() == "delete"
+    assert not first._ssphz("hot") and first._ssphz("frozen")
@@ -0,0 +1,118 @@
+"""Unit tests for the builtin knn_test preset"""
+
+# pylint: disable=C0115,C0116,W0212
+import json
+import pytest
+from dotmap import DotMap
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import doc_lines, preset_mappings
+from es_testbed.presets.knn_test import definitions
+from es_testbed.presets.knn_test.functions import (
+    batch_generator,
+    doc_generator,
+    query_vectors,
+    vector_options,
+)
+
+np = pytest.importorskip("numpy")
+
+PRESET: str = "es_testbed.presets.knn_test"
+"""Module path of the builtin knn_test preset"""
+
+
+def test_vector_options_defaults():
+    assert vector_options() == {
+        "dims": 64,
+        "similarity": "cosine",
+        "element_type": "float",
+        "normalize": True,
+    }
+    assert not vector_options({"similarity": "l2_norm"})["normalize"]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"dims": 0},
+        {"similarity": "hamming"},
+        {"element_type": "bit"},
+        {"similarity": "dot_product", "normalize": False},
+    ],
+)
+def test_vector_options_misconfig(options):
+    with pytest.raises(TestbedMisconfig):
+        vector_options(options)
+
+
+def test_doc_and_batch_generators_agree():
+    options = {
+        "count": 5,
+        "start_at": 10,
+        "dims": 8,
+        "timestamps": {"start": 0, "end": 1000, "seed": 1},
+    }
+    docs = [json.loads(x) for x in doc_lines(doc_generator, options)]
+    batches = [
+        json.loads(x)
+        for x in doc_lines(doc_generator, options, batch_generator=batch_generator)
+    ]
+    assert [x["id"] for x in docs] == list(range(10, 15))
+    for doc, row in zip(docs, batches):
+        assert doc["cluster"] == row["cluster"]
+        assert doc["@timestamp"] == row["@timestamp"]
+        assert np.allclose(doc["vector"], row["vector"], atol=1e-6)
+        assert np.isclose(np.linalg.norm(doc["vector"]), 1.0, atol=1e-5)
+
+
+def test_byte_vectors():
+    batch = next(batch_generator(count=3, dims=16, element_type="byte"))
+    assert batch["vector"].dtype == np.int8
+    assert batch["vector"].shape == (3, 16)
+    assert np.abs(batch["vector"]).max() <= 127
+
+
+def test_clusters_make_recall_meaningful():
+    batch = next(batch_generator(count=2000, dims=32, clusters=8, spread=0.1))
+    queries = np.array(query_vectors(20, dims=32, clusters=8, spread=0.1))
+    nearest = (batch["vector"] @ queries.T).argmax(axis=0)
+    assert len(set(batch["cluster"][nearest].tolist())) > 1
+    centroids = np.array(
+        [batch["vector"][batch["cluster"] == num].mean(axis=0) for num in range(8)]
+    )
+    query_clusters = (queries @ centroids.T).argmax(axis=1)
+    assert (batch["cluster"][nearest] == query_clusters).all()
+
+
+def test_mappings_follow_the_buildlist():
+    plan = DotMap(definitions.get_plan("frozen"))
+    for scheme in plan.index_buildlist:
+        scheme.options.dims = 128
+        scheme.options.element_type = "byte"
+    vector = definitions.mappings(plan)["mappings"]["properties"]["vector"]
+    assert (vector["dims"], vector["element_type"], vector["index"]) == (
+        128,
+        "byte",
+        True,
+    )
+    plan.modpath = PRESET
+    assert preset_mappings(plan) == definitions.mappings(plan)
+
+
+def test_mappings_default_match_generator():
+    vector = definitions.mappings()["mappings"]["properties"]["vector"]
+    assert {key: vector[key] for key in ("dims", "similarity", "element_type")} == {
+        key: value for key, value in vector_options().items() if key != "normalize"
+    }
+
+
+def test_mappings_conflict():
+    plan = {"index_buildlist": [{"options": {"dims": 8}}, {"options": {"dims": 16}}]}
+    with pytest.raises(TestbedMisconfig):
+        definitions.mappings(plan)
+
+
+@pytest.mark.parametrize("scenario", ["hot", "cold_ds", "frozen_ilm"])
+def test_scenarios(scenario):
+    plan = definitions.get_plan(scenario)
+    assert plan["uniq"] == f"scenario-{scenario}"
+    assert all(x["options"]["dims"] == 64 for x in plan["index_buildlist"])
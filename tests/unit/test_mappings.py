@@ -0,0 +1,140 @@
+"""Unit tests for the es_testbed.ingest.mappings module"""
+
+# pylint: disable=C0115,C0116,W0212
+from unittest.mock import patch
+import pytest
+from dotmap import DotMap
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import DocTemplate, infer_mappings, merge_mappings
+from es_testbed.ingest.mappings import preset_mappings, sample_docs, value_type
+from es_testbed.presets.searchable_test import definitions
+from es_testbed.presets.searchable_test.functions import batch_generator, doc_generator
+
+PRESET: str = "es_testbed.presets.searchable_test"
+"""Module path of the builtin searchable_test preset"""
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (True, "boolean"),
+        (3, "long"),
+        (1.5, "double"),
+        ("2024-04-16T16:00:00.000000Z", "date"),
+        ("2024-04-16", "date"),
+        ("2024-04-16T16:00:00+02:00", "date"),
+        ("hello", "keyword"),
+        ("2024", "keyword"),
+        (None, None),
+    ],
+)
+def test_value_type(value, expected):
+    assert value_type(value) == expected
+
+
+def test_infer_mappings():
+    docs = [
+        {"n": 1, "tags": ["a", "b"], "user": {"name": "x"}, "gone": None, "e": []},
+        {"n": 2.5, "user": {"id": 7}, "objs": [{"k": True}, {"v": 1}]},
+    ]
+    assert infer_mappings(docs) == {
+        "properties": {
+            "n": {"type": "double"},
+            "tags": {"type": "keyword"},
+            "user": {
+                "properties": {"name": {"type": "keyword"}, "id": {"type": "long"}}
+            },
+            "objs": {"properties": {"k": {"type": "boolean"}, "v": {"type": "long"}}},
+        }
+    }
+
+
+def test_infer_mappings_date_and_keyword():
+    docs = [{"when": "2024-04-16"}, {"when": "someday"}]
+    assert infer_mappings(docs)["properties"]["when"] == {"type": "keyword"}
+
+
+@pytest.mark.parametrize("docs", [[{"a": 1}, {"a": {"b": 1}}], [{"a": True}, {"a": 1}]])
+def test_infer_mappings_conflict(docs):
+    with pytest.raises(TestbedMisconfig):
+        infer_mappings(docs)
+
+
+def test_merge_mappings_keeps_preset():
+    mappings = {
+        "properties": {
+            "n": {"type": "integer"},
+            "user": {"type": "nested", "properties": {"name": {"type": "text"}}},
+        }
+    }
+    extra = infer_mappings([{"n": 1, "m": "x", "user": {"name": "a", "id": 1}}])
+    merged = merge_mappings(mappings, extra)
+    assert merged["properties"]["n"] == {"type": "integer"}
+    assert merged["properties"]["m"] == {"type": "keyword"}
+    assert merged["properties"]["user"] == {
+        "type": "nested",
+        "properties": {"name": {"type": "text"}, "id": {"type": "long"}},
+    }
+    assert "m" not in mappings["properties"]
+
+
+def test_sample_docs_overrides_count():
+    docs = sample_docs(doc_generator, {"count": 100000, "start_at": 5}, 3)
+    assert [doc["number"] for doc in docs] == [5, 6, 7]
+
+
+def test_sample_docs_encoded_and_columnar_agree():
+    options = {"count": 10, "match": True}
+    tmpl = DocTemplate({"n": "{seq}", "ts": "{ts}"}).doc_generator
+    assert infer_mappings(sample_docs(tmpl, options, 2)) == {
+        "properties": {"n": {"type": "long"}, "ts": {"type": "date"}}
+    }
+    from_docs = infer_mappings(sample_docs(doc_generator, options, 5))
+    from_batches = infer_mappings(
+        sample_docs(doc_generator, options, 5, batch_generator=batch_generator)
+    )
+    assert from_docs == from_batches
+
+
+def test_preset_mappings_searchable_test_is_complete():
+    plan = DotMap(
+        modpath=PRESET,
+        infer_mappings=10,
+        index_buildlist=[{"options": {"count": 10, "match": True}}],
+    )
+    assert preset_mappings(plan) == definitions.mappings()
+
+
+def test_preset_mappings_adds_missing_fields_and_strict():
+    plan = DotMap(
+        modpath=PRESET,
+        infer_mappings=2,
+        strict_mappings=True,
+        index_buildlist=[{"options": {"count": 10}}],
+    )
+    with patch.object(definitions, "mappings", return_value={"mappings": {}}):
+        retval = preset_mappings(plan)
+    mappings = retval["mappings"]
+    assert mappings["dynamic"] == "strict"
+    assert mappings["properties"]["@timestamp"] == {"type": "date"}
+    assert mappings["properties"]["number"] == {"type": "long"}
+    assert mappings["properties"]["deep"]["properties"]["l1"]
+
+
+def test_preset_mappings_disabled():
+    plan = DotMap(modpath=PRESET, index_buildlist=[])
+    with patch("es_testbed.ingest.mappings.preset_generators") as mock_gens:
+        assert preset_mappings(plan) == definitions.mappings()
+    mock_gens.assert_not_called()
+
+
+def test_preset_mappings_pools():
+    plan = DotMap(
+        modpath=PRESET,
+        index_buildlist=[{"options": {"pools": {"host.name": 5, "message": 3}}}],
+    )
+    props = preset_mappings(plan)["mappings"]["properties"]
+    assert props["host"] == {"properties": {"name": {"type": "keyword"}}}
+    assert (
+        props["message"] == definitions.mappings()["mappings"]["properties"]["message"]
+    )
@@ -0,0 +1,301 @@
+"""Unit tests for the es_testbed.mgrs package"""
+
+# pylint: disable=C0115,C0116,R0903,R0913,R0917,W0212
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from dotmap import DotMap
+from es_testbed.exceptions import ResultNotExpected, TestbedFailure
+from es_testbed.mgrs import ComponentMgr, IlmMgr, IndexMgr
+
+
+def test_ingest_settings(client):
+    plan = DotMap({"ingest": {"workers": 2, "bulk_profile": True}})
+    mgr = IndexMgr(client=client, plan=plan)
+    scheme = DotMap({"options": {}, "ingest": {"workers": 4}})
+    assert mgr.ingest_settings(scheme) == {"workers": 4, "bulk_profile": True}
+
+
+def test_ingest_settings_empty(client):
+    mgr = IndexMgr(client=client, plan=DotMap({"ingest": {}}))
+    assert not mgr.ingest_settings({"options": {}})
+
+
+def test_deferred_refresh(client):
+    plan = DotMap(
+        {
+            "prefix": "es-testbed",
+            "uniq": "abc",
+            "ingest": {"defer_refresh": True},
+            "index_buildlist": [{"options": {}}, {"options": {}}],
+        }
+    )
+    mgr = IndexMgr(client=client, plan=plan)
+    with patch("es_testbed.mgrs.index.flush_refresh") as mock_fr:
+        mock_fr.return_value = {"successful": 2}
+        mgr.deferred_refresh()
+    mock_fr.assert_called_once_with(client, "*es-testbed-*-abc*")
+
+
+def test_deferred_refresh_not_deferred(client):
+    plan = DotMap({"ingest": {}, "index_buildlist": [{"options": {}}]})
+    mgr = IndexMgr(client=client, plan=plan)
+    with patch("es_testbed.mgrs.index.flush_refresh") as mock_fr:
+        mgr.deferred_refresh()
+    mock_fr.assert_not_called()
+
+
+def test_log_ingest_stats(client, caplog):
+    caplog.set_level("INFO")
+    item = {
+        "docs": 100,
+        "bytes": 4000,
+        "seconds": 2.0,
+        "docs_per_sec": 50.0,
+        "requests": 1,
+        "retries": 0,
+    }
+    stats = [{"name": "idx-1", **item}, {"name": "idx-2", **item}]
+    mgr = IndexMgr(client=client, plan=DotMap({"ingest_stats": stats}))
+    mgr.log_ingest_stats()
+    assert 'into "idx-2" in 2.0s: 50.0 docs/s' in caplog.text
+    assert "Ingested 200 docs in total in 4.0s: 50.0 docs/s" in caplog.text
+
+
+def buildplan(**kwargs) -> DotMap:
+    plan = {
+        "prefix": "es-testbed",
+        "uniq": "abc",
+        "modpath": "es_testbed.presets.searchable_test",
+        "rollover_alias": None,
+        "ingest": {"concurrency": 3},
+        "indices": [],
+        "ingest_stats": [],
+        "index_buildlist": [{"options": {"count": num}} for num in range(4)],
+    }
+    plan.update(kwargs)
+    return DotMap(plan)
+
+
+def test_add_indices_concurrent(client):
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def fill(_, name, options, **kwargs):
+        with lock:
+            running.append(name)
+            peak.append(len(running))
+        time.sleep(0.05 * (4 - options["count"]))  # First entry finishes last
+        with lock:
+            running.remove(name)
+        keys = ("bytes", "seconds", "docs_per_sec", "requests", "retries")
+        return {"name": name, "docs": options["count"], **dict.fromkeys(keys, 1)}
+
+    mgr = IndexMgr(client=client, plan=buildplan())
+    with patch("es_testbed.mgrs.index.create_index") as mock_create:
+        with patch("es_testbed.mgrs.index.fill_index", side_effect=fill):
+            with patch("es_testbed.mgrs.index.Index") as mock_index:
+                mock_index.side_effect = lambda **kw: MagicMock(name=kw["name"])
+                mgr.add_indices()
+    names = [f"es-testbed-idx-abc-{num:06}" for num in range(1, 5)]
+    assert [x.args[1] for x in mock_create.call_args_list] == names
+    assert [x.track_ilm.call_args.args[0] for x in mgr.entity_list] == names
+    assert [x["docs"] for x in mgr.plan.ingest_stats] == [0, 1, 2, 3]
+    assert max(peak) == 3
+
+
+def test_add_indices_concurrent_failure(client):
+    def fill(_, name, options, **kwargs):
+        if options["count"] == 1:
+            raise TestbedFailure("boom")
+        keys = ("bytes", "seconds", "docs_per_sec", "requests", "retries")
+        return {"name": name, "docs": options["count"], **dict.fromkeys(keys, 1)}
+
+    mgr = IndexMgr(client=client, plan=buildplan())
+    with patch("es_testbed.mgrs.index.create_index"):
+        with patch("es_testbed.mgrs.index.fill_index", side_effect=fill):
+            with patch("es_testbed.mgrs.index.Index") as mock_index:
+                mock_index.side_effect = lambda **kw: MagicMock(name=kw["name"])
+                with pytest.raises(TestbedFailure, match="boom"):
+                    mgr.add_indices()
+    assert len(mgr.entity_list) == 4  # Tracked, so teardown deletes them all
+    assert 1 not in [x["docs"] for x in mgr.plan.ingest_stats]
+
+
+def test_add_indices_concurrent_create_failure(client):
+    def create(_, name, **kwargs):
+        if name.endswith("000003"):
+            raise TestbedFailure("boom")
+
+    mgr = IndexMgr(client=client, plan=buildplan())
+    with patch("es_testbed.mgrs.index.create_index", side_effect=create):
+        with patch("es_testbed.mgrs.index.fill_index") as mock_fill:
+            with patch("es_testbed.mgrs.index.Index") as mock_index:
+                mock_index.side_effect = lambda **kw: MagicMock(name=kw["name"])
+                with pytest.raises(TestbedFailure, match="boom"):
+                    mgr.add_indices()
+    names = [f"es-testbed-idx-abc-{num:06}" for num in range(1, 3)]
+    assert [x.track_ilm.call_args.args[0] for x in mgr.entity_list] == names
+    mock_fill.assert_not_called()
+
+
+def test_concurrency_default(client):
+    mgr = IndexMgr(client=client, plan=buildplan(ingest={}))
+    assert mgr.concurrency == 1
+
+
+def test_fillers_doc_template(client):
+    module = SimpleNamespace(
+        doc_template={"n": "{seq}", "k": "{keyword_pool:pool}"},
+        keyword_pools={"pool": ["a"]},
+    )
+    mgr = IndexMgr(client=client, plan=buildplan())
+    with patch("es_testbed.ingest.generate.import_module", return_value=module):
+        fillers = mgr.fillers()
+    assert fillers["batch_generator"] is None
+    assert list(fillers["doc_generator"](count=1)) == [b'{"n":0,"k":"a"}']
+
+
+def test_components_strict_mappings(client):
+    plan = buildplan(ilm_policies=[None], strict_mappings=True, infer_mappings=2)
+    mappings = ComponentMgr(client=client, plan=plan).components[-1]["mappings"]
+    assert mappings["dynamic"] == "strict"
+    assert mappings["properties"]["@timestamp"] == {"type": "date"}
+
+
+def pooled_mgr(client, pools, count=1000) -> IndexMgr:
+    buildlist = [{"options": {"count": count, "pools": pools}}, {"options": {}}]
+    plan = buildplan(index_buildlist=buildlist, ingest_stats=[{}, {}])
+    mgr = IndexMgr(client=client, plan=plan)
+    mgr.entity_list = [SimpleNamespace(name="idx-1"), SimpleNamespace(name="idx-2")]
+    return mgr
+
+
+def test_verify_cardinality(client):
+    mgr = pooled_mgr(client, {"host": 50, "user": {"cardinality": 9, "exact": False}})
+    with patch("es_testbed.mgrs.index.field_cardinality") as mock_card:
+        mock_card.side_effect = [50, 7]
+        mgr.verify_cardinality()
+    assert [x.args[1:] for x in mock_card.call_args_list] == [
+        ("idx-1", "host"),
+        ("idx-1", "user"),
+    ]
+    assert mgr.plan.ingest_stats[0]["cardinality"] == {"host": 50, "user": 7}
+
+
+@pytest.mark.parametrize("cardinality,achieved", [(50, 49), (100000, 97000)])
+def test_verify_cardinality_mismatch(client, cardinality, achieved):
+    mgr = pooled_mgr(client, {"host": cardinality}, count=200000)
+    with patch("es_testbed.mgrs.index.field_cardinality", return_value=achieved):
+        with pytest.raises(ResultNotExpected, match="distinct values"):
+            mgr.verify_cardinality()
+
+
+def test_verify_cardinality_approximate(client):
+    mgr = pooled_mgr(client, {"host": 100000}, count=200000)
+    with patch("es_testbed.mgrs.index.field_cardinality", return_value=99500):
+        mgr.verify_cardinality()
+
+
+def test_explain_cache_shared(client):
+    mgr = IndexMgr(client=client, plan=buildplan())
+    assert mgr.explain_cache is mgr.explain_cache
+    assert mgr.explain_cache.pattern == "*es-testbed-idx-abc*"
+    with patch("es_testbed.mgrs.index.Index") as mock_index:
+        mgr.track_index("es-testbed-idx-abc-000001")
+    assert mock_index.call_args.kwargs["explain_cache"] is mgr.explain_cache
+
+
+class FakeMount:
+    """An Index whose ILM mount takes longer the earlier it is in the buildlist"""
+
+    def __init__(self, num, order, running, peak, lock):
+        self.num = num
+        self.order = order
+        self.running, self.peak, self.lock = running, peak, lock
+
+    def mount_ss(self, scheme, add_snapshot=True):
+        assert not add_snapshot
+        with self.lock:
+            self.running.append(self.num)
+            self.peak.append(len(self.running))
+        time.sleep(0.05 * (4 - self.num))  # First entry finishes last
+        with self.lock:
+            self.running.remove(self.num)
+        return scheme["target_tier"] == "frozen"
+
+    def record_snapshot(self):
+        self.order.append(self.num)
+
+
+def test_mount_all_concurrent(client):
+    order, running, peak, lock = [], [], [], threading.Lock()
+    plan = buildplan(ilm_policies=["policy"], ilm={"mount_concurrency": 3})
+    mgr = IndexMgr(client=client, plan=plan)
+    tiers = ["frozen", "frozen", "hot", "frozen"]
+    pairs = [
+        (FakeMount(num, order, running, peak, lock), {"target_tier": tier})
+        for num, tier in enumerate(tiers)
+    ]
+    start = time.monotonic()
+    mgr.mount_all(pairs)
+    assert time.monotonic() - start < 0.3  # Not the 0.5 seconds of the sum
+    assert max(peak) == 3
+    assert order == [0, 1, 3]  # Buildlist order, not completion order
+
+
+def test_mount_all_no_policy(client):
+    mgr = IndexMgr(client=client, plan=buildplan(ilm_policies=[]))
+    entities = [MagicMock(), MagicMock()]
+    mgr.mount_all([(entity, {"target_tier": "cold"}) for entity in entities])
+    for entity in entities:
+        entity.mount_ss.assert_called_once_with({"target_tier": "cold"})
+        entity.record_snapshot.assert_not_called()
+    assert mgr.mount_concurrency == 4
+
+
+def test_ilm_mgr_seeds_policy_cache(client):
+    plan = DotMap(
+        {
+            "prefix": "es-testbed",
+            "uniq": "abc",
+            "repository": None,
+            "ilm_policies": [],
+            "ilm": {
+                "enabled": True,
+                "phases": ["hot", "delete"],
+                "forcemerge": False,
+                "max_num_segments": 1,
+                "readonly": None,
+            },
+        }
+    )
+    mgr = IlmMgr(client=client, plan=plan)
+    with patch("es_testbed.mgrs.ilm.put_ilm") as mock_put_ilm, patch(
+        "es_testbed.mgrs.ilm.exists", return_value=True
+    ):
+        mgr.setup()
+        name = mgr.last
+        assert list(mgr.policy_cache.phases(name)) == ["hot", "delete"]
+        client.ilm.get_lifecycle.assert_not_called()
+        policy = {"phases": {"hot": {"actions": {}}, "warm": {"actions": {}}}}
+        mgr.update_policy(policy)
+    assert mock_put_ilm.call_args.kwargs["policy"] == policy
+    assert list(mgr.policy_cache.phases(name)) == ["hot", "warm"]
+    assert mgr.policy_cache.reads == 0
+
+
+def test_ilm_mgr_update_without_policy(client):
+    mgr = IlmMgr(client=client, plan=DotMap({"ilm_policies": []}))
+    with pytest.raises(ResultNotExpected):
+        mgr.update_policy({"phases": {}})
+
+
+def test_policy_cache_passed_to_index(client):
+    mgr = IndexMgr(client=client, plan=buildplan(), policy_cache="policies")
+    with patch("es_testbed.mgrs.index.Index") as mock_index:
+        mgr.track_index("es-testbed-idx-abc-000001")
+    assert mock_index.call_args.kwargs["policy_cache"] == "policies"
@@ -41,6 +41,7 @@ def test_create_lists(plan_builder):
         "ilm_policies",
         "index_templates",
         "component_templates",
+        "ingest_stats",
     ]:
         assert name in plan_builder._plan
         assert plan_builder._plan[name] == []
@@ -0,0 +1,121 @@
+"""Unit tests for the es_testbed.ingest.pools module"""
+
+# pylint: disable=C0115,C0116,W0212
+import json
+from collections import Counter
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import (
+    ValuePool,
+    doc_lines,
+    expected_cardinality,
+    pool_settings,
+    value_pools,
+)
+from es_testbed.ingest.pools import pool_mappings
+from es_testbed.presets.searchable_test.functions import batch_generator, doc_generator
+
+np = pytest.importorskip("numpy")
+
+
+def test_pool_settings():
+    assert pool_settings({"host": 50, "user": {"cardinality": 9, "skew": 1.2}}) == {
+        "host": {"cardinality": 50},
+        "user": {"cardinality": 9, "skew": 1.2},
+    }
+    assert not pool_settings(None)
+
+
+def test_values():
+    pool = ValuePool(120, prefix="host")
+    assert pool.values[0] == "host-000" and pool.values[-1] == "host-119"
+    assert len(set(pool.values.tolist())) == 120
+
+
+@pytest.mark.parametrize("skew", [0.0, 1.5])
+def test_exact_cardinality(skew):
+    pool = ValuePool(300, skew=skew, origin=1000)
+    assert len(set(pool.take(np.arange(1000, 1300)).tolist())) == 300
+    assert len(set(pool.take(np.arange(1000, 1100)).tolist())) == 100
+
+
+def test_not_exact():
+    pool = ValuePool(300, exact=False)
+    assert len(set(pool.take(np.arange(300)).tolist())) < 300
+
+
+def test_skew():
+    uniform = Counter(ValuePool(20, exact=False).take(np.arange(20000)).tolist())
+    skewed = Counter(ValuePool(20, skew=1.0, exact=False).take(np.arange(20000)))
+    assert max(uniform.values()) < 2 * min(uniform.values())
+    assert skewed.most_common(1)[0][0] == "value-00"
+    # Rank 1 is about 20 times as frequent as rank 20
+    assert 10 < skewed["value-00"] / skewed["value-19"] < 40
+
+
+def test_independent_of_batching():
+    pool = ValuePool(50, skew=1.1, seed=3)
+    whole = pool.take(np.arange(0, 200)).tolist()
+    parts = (
+        pool.take(np.arange(0, 70)).tolist() + pool.take(np.arange(70, 200)).tolist()
+    )
+    assert whole == parts
+
+
+def test_fields_not_correlated():
+    pools = value_pools({"a": 100, "b": 100})
+    nums = np.arange(100, 1000)
+    assert pools["a"].ranks(nums).tolist() != pools["b"].ranks(nums).tolist()
+    assert pools["a"].prefix == "a"
+
+
+@pytest.mark.parametrize("kwargs", [{"cardinality": 0}, {"cardinality": 5, "skew": -1}])
+def test_misconfig(kwargs):
+    with pytest.raises(TestbedMisconfig):
+        ValuePool(**kwargs)
+
+
+def test_expected_cardinality():
+    assert expected_cardinality({"cardinality": 50}, 1000) == 50
+    assert expected_cardinality({"cardinality": 50}, 20) == 20
+    assert expected_cardinality({"cardinality": 50, "exact": False}, 1000) is None
+    assert expected_cardinality({"cardinality": 50}, None) is None
+
+
+def test_pool_mappings():
+    buildlist = [
+        {"options": {"pools": {"host": 5}}},
+        {"options": {"pools": {"labels.user": 9}}},
+        {"options": {}},
+    ]
+    assert pool_mappings(buildlist) == {
+        "properties": {
+            "host": {"type": "keyword"},
+            "labels": {"properties": {"user": {"type": "keyword"}}},
+        }
+    }
+    assert not pool_mappings([{"options": {}}])
+
+
+def test_searchable_test_generators_agree():
+    options = {
+        "count": 40,
+        "start_at": 10,
+        "pools": {"host": 25, "labels.user": {"cardinality": 8, "skew": 1.0}},
+    }
+    docs = [json.loads(x) for x in doc_lines(doc_generator, options)]
+    rows = [
+        json.loads(x)
+        for x in doc_lines(doc_generator, options, batch_generator=batch_generator)
+    ]
+    assert [x["host"] for x in docs] == [x["host"] for x in rows]
+    assert [x["labels"] for x in docs] == [x["labels"] for x in rows]
+    assert len({x["host"] for x in docs}) == 25
+    assert len({x["labels"]["user"] for x in docs}) == 8
+
+
+def test_processes_cover_the_whole_range():
+    options = {"count": 60, "start_at": 100, "pools": {"host": 60}}
+    settings = {"processes": 2, "partition_docs": 20}
+    hosts = [json.loads(x)["host"] for x in doc_lines(doc_generator, options, settings)]
+    assert len(set(hosts)) == 60
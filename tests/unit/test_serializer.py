@@ -0,0 +1,69 @@
+"""Unit tests for the es_testbed.ingest.serializer module"""
+
+# pylint: disable=C0115,C0116,W0212
+from unittest.mock import MagicMock, patch
+import json
+import pytest
+from elasticsearch8 import Elasticsearch
+from elasticsearch8.serializer import JsonSerializer, OrjsonSerializer
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import bulk, serializer
+from es_testbed.ingest.serializer import (
+    get_encoder,
+    install_serializer,
+    restore_serializer,
+)
+from es_testbed.presets.searchable_test.functions import doc_generator
+
+PRESET: str = "es_testbed.presets.searchable_test"
+"""Module path of the builtin searchable_test preset"""
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", None])
+def test_encoders_agree(name):
+    doc = next(doc_generator(count=1))
+    assert json.loads(get_encoder(name)(doc)) == doc
+
+
+def test_get_encoder_orjson():
+    assert get_encoder("orjson") is serializer.orjson_doc
+
+
+def test_get_encoder_orjson_missing(caplog):
+    with patch.object(serializer, "orjson", None):
+        assert get_encoder("orjson") is bulk.encode_doc
+    assert "orjson is not installed" in caplog.text
+
+
+def test_get_encoder_callable():
+    func = MagicMock()
+    assert get_encoder(func) is func
+
+
+def test_get_encoder_preset_without_function(caplog):
+    assert get_encoder("preset", modpath=PRESET) is bulk.encode_doc
+    assert "no serializer function" in caplog.text
+
+
+def test_get_encoder_bad_name():
+    with pytest.raises(TestbedMisconfig):
+        get_encoder("yaml")
+
+
+def test_install_and_restore():
+    client = Elasticsearch("http://localhost:9200")
+    collection = client.transport.serializers
+    saved = install_serializer(client, "orjson")
+    assert isinstance(collection.default_serializer, OrjsonSerializer)
+    assert isinstance(
+        client.options().transport.serializers.default_serializer, OrjsonSerializer
+    )
+    restore_serializer(client, saved)
+    assert type(collection.serializers["application/json"]) is JsonSerializer
+    assert collection.default_serializer is collection.serializers["application/json"]
+
+
+def test_install_json_is_noop():
+    client = MagicMock()
+    assert not install_serializer(client, "json")
+    restore_serializer(client, {})
@@ -0,0 +1,86 @@
+"""Unit tests for the es_testbed.ingest.target module"""
+
+# pylint: disable=C0115,C0116,W0212
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import FillTarget
+from es_testbed.ingest.target import parse_size
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(100, 100), ("100", 100), ("1.5kb", 1536), ("5GB", 5 << 30), ("2 mb", 2 << 20)],
+)
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["5 gigs", "kb", "-1mb"])
+def test_parse_size_misconfig(value):
+    with pytest.raises(TestbedMisconfig):
+        parse_size(value)
+
+
+def test_from_settings():
+    assert FillTarget.from_settings(None) is None
+    assert FillTarget.from_settings({"workers": 2, "target_check_docs": 5}) is None
+    target = FillTarget.from_settings(
+        {"target_store_size": "1mb", "target_check_docs": 5, "target_max_docs": None}
+    )
+    assert (target.store_size, target.check_docs, target.max_docs) == (1 << 20, 5, None)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{}, {"docs_per_shard": 0}, {"store_size": "1kb", "check_docs": 0}]
+)
+def test_misconfig(kwargs):
+    with pytest.raises(TestbedMisconfig):
+        FillTarget(**kwargs)
+
+
+def test_reached():
+    stats = {"docs": 3000, "store_bytes": 900, "shards": 3}
+    assert FillTarget(docs_per_shard=1000).reached(stats)
+    assert not FillTarget(docs_per_shard=1001).reached(stats)
+    assert FillTarget(store_size=900, docs_per_shard=5000).reached(stats)
+    assert not FillTarget(store_size=901).reached(stats)
+
+
+class FakeIndex:
+    """Counts the docs generated into it, like indices.stats would"""
+
+    def __init__(self):
+        self.docs = 0
+        self.calls = []
+
+    def generate(self, start_at, count):
+        self.calls.append((start_at, count))
+        for num in range(start_at, start_at + count):
+            self.docs += 1
+            yield str(num).encode()
+
+    def check(self):
+        return {"docs": self.docs, "store_bytes": self.docs * 100, "shards": 2}
+
+
+def test_lines_rounds():
+    index = FakeIndex()
+    target = FillTarget(docs_per_shard=25, check_docs=20)
+    lines = list(target.lines(index.generate, index.check, start_at=10))
+    assert index.calls == [(10, 20), (30, 20), (50, 20)]
+    assert lines == [str(num).encode() for num in range(10, 70)]
+
+
+def test_lines_max_docs(caplog):
+    index = FakeIndex()
+    target = FillTarget(store_size="1gb", check_docs=20, max_docs=30)
+    assert len(list(target.lines(index.generate, index.check))) == 30
+    assert index.calls == [(0, 20), (20, 10)]
+    assert "Stopped at max_docs (30)" in caplog.text
+
+
+def test_lines_generator_exhausted(caplog):
+    index = FakeIndex()
+    target = FillTarget(docs_per_shard=100, check_docs=20)
+    assert not list(target.lines(lambda *_: iter(()), index.check))
+    assert "No more docs were generated" in caplog.text
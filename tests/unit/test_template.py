@@ -0,0 +1,116 @@
+"""Unit tests for the es_testbed.ingest.template module"""
+
+# pylint: disable=C0115,C0116,W0212
+import json
+import re
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import DocTemplate, doc_lines
+from es_testbed.ingest.cache import cacheable, generator_version
+
+TEMPLATE: dict = {
+    "@timestamp": "{ts}",
+    "message": "message{seq}",
+    "number": "{rand_int:1001:32767}",
+    "seq": "{seq}",
+    "user": {"name": "{keyword_pool:names}", "note": "100% {keyword_pool:names}"},
+    "tags": ["fixed", 1, None, True],
+}
+"""A searchable_test-like template using every placeholder"""
+
+POOLS: dict = {"names": ["alice", 'bob "b"', "c%d"]}
+"""Keyword pools for TEMPLATE"""
+
+
+def test_compile():
+    tmpl = DocTemplate(TEMPLATE, POOLS)
+    assert tmpl.fmt == (
+        '{"@timestamp":"%s","message":"message%s","number":%s,"seq":%s,'
+        '"user":{"name":"%s","note":"100%% %s"},"tags":["fixed",1,null,true]}'
+    )
+    assert [kind for kind, _ in tmpl.slots] == [
+        "ts",
+        "seq",
+        "rand_int",
+        "seq",
+        "keyword_pool",
+        "keyword_pool",
+    ]
+
+
+def test_render():
+    tmpl = DocTemplate(json.dumps(TEMPLATE), POOLS)
+    docs = [json.loads(x) for x in tmpl.doc_generator(count=5, start_at=10)]
+    assert [x["seq"] for x in docs] == list(range(10, 15))
+    assert docs[0]["message"] == "message10"
+    for doc in docs:
+        assert 1001 <= doc["number"] <= 32767
+        assert doc["user"]["name"] in POOLS["names"]
+        assert doc["user"]["note"].startswith("100% ")
+        assert doc["tags"] == ["fixed", 1, None, True]
+        assert doc["@timestamp"].endswith("Z")
+
+
+def test_render_timestamps():
+    tmpl = DocTemplate({"t": "{ts}"})
+    settings = {"start": "2024-01-01T00:00:00Z", "end": "2024-01-02T00:00:00Z"}
+    stamps = [json.loads(x)["t"] for x in tmpl.doc_generator(4, 0, settings)]
+    assert stamps == sorted(stamps)
+    assert stamps[0].startswith("2024-01-01")
+
+
+def test_render_static():
+    tmpl = DocTemplate({"a": "100%"})
+    assert list(tmpl.doc_generator(count=2)) == [b'{"a":"100%"}'] * 2
+
+
+def test_render_ignores_other_options():
+    tmpl = DocTemplate({"n": "{seq}"})
+    assert list(tmpl.doc_generator(count=1, match=True)) == [b'{"n":0}']
+
+
+@pytest.mark.parametrize(
+    "template,pools,match",
+    [
+        ("{not json", None, "not valid JSON"),
+        ({"a": "{keyword_pool:x}"}, {}, "undefined keyword_pool"),
+        ({"a": "{keyword_pool:x}"}, {"x": []}, "{keyword_pool:x}"),
+        ({"a": "n{rand_int:9:1}"}, None, "{rand_int:9:1}"),
+    ],
+)
+def test_bad_template(template, pools, match):
+    with pytest.raises(TestbedMisconfig, match=re.escape(match)):
+        DocTemplate(template, pools)
+
+
+def test_version():
+    first = DocTemplate(TEMPLATE, POOLS)
+    assert generator_version(first.doc_generator) == first.version
+    assert DocTemplate(TEMPLATE, POOLS).version == first.version
+    assert DocTemplate({"other": "{seq}"}).version != first.version
+
+
+def test_cacheable():
+    assert not DocTemplate(TEMPLATE, POOLS).cacheable
+    assert not DocTemplate({"n": "{rand_int:1:9}"}).cacheable
+    tmpl = DocTemplate({"@timestamp": "{ts}", "n": "{seq}"})
+    assert tmpl.cacheable
+    assert cacheable(tmpl.doc_generator, {})
+
+
+def never(_):
+    """A module-level (picklable) encoder that must not be called"""
+    raise AssertionError("Encoded docs must not be encoded again")
+
+
+@pytest.mark.parametrize("settings", [None, {"processes": 2, "partition_docs": 3}])
+def test_doc_lines_passes_bytes_through(settings):
+    tmpl = DocTemplate({"n": "{seq}"})
+    lines = doc_lines(
+        tmpl.doc_generator, {"count": 7}, settings=settings, encoder=never
+    )
+    assert [json.loads(x)["n"] for x in lines] == list(range(7))
+
+
+def test_doc_lines_empty_generator():
+    assert not list(doc_lines(lambda: iter(()), {}))
@@ -0,0 +1,81 @@
+"""Unit tests for the builtin text_test preset"""
+
+# pylint: disable=C0115,C0116,W0212
+import json
+from collections import Counter
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import doc_lines
+from es_testbed.presets.text_test import definitions
+from es_testbed.presets.text_test.functions import (
+    batch_generator,
+    doc_generator,
+    lengths,
+    vocabulary,
+    word,
+)
+
+np = pytest.importorskip("numpy")
+
+
+def test_word():
+    assert [word(0), word(69), word(70), word(70 + 70 * 70)] == [
+        "ba",
+        "zu",
+        "baba",
+        "bababa",
+    ]
+    assert len(set(vocabulary(10000))) == 10000
+
+
+def test_zipf_frequencies():
+    docs = list(doc_generator(count=2000, vocab_size=1000, phrase_rate=0))
+    counts = Counter(w for doc in docs for w in doc["message"].split())
+    vocab = vocabulary(1000)
+    assert counts.most_common(1)[0][0] == vocab[0]
+    # Rank 1 is about 2 ** 1.1 times as frequent as rank 2, and far above the tail
+    assert 1.5 < counts[vocab[0]] / counts[vocab[1]] < 3
+    assert counts[vocab[0]] > 50 * counts[vocab[500]]
+    assert sum(counts.values()) == sum(doc["length"] for doc in docs)
+
+
+@pytest.mark.parametrize("distribution", ["lognormal", "poisson", "fixed"])
+def test_lengths(distribution):
+    rng = np.random.default_rng(1)
+    sizes = lengths(rng, 5000, distribution, mean=12, minimum=2, maximum=40)
+    assert sizes.min() >= 2 and sizes.max() <= 40
+    assert abs(sizes.mean() - 12) < 0.5
+
+
+def test_lengths_misconfig():
+    with pytest.raises(TestbedMisconfig):
+        lengths(np.random.default_rng(), 1, "uniform")
+
+
+def test_phrase_injection():
+    docs = list(doc_generator(count=500, phrases=["disk on fire"], phrase_rate=0.2))
+    hits = [doc for doc in docs if "disk on fire" in doc["message"]]
+    assert 50 < len(hits) < 150
+    for doc in hits:
+        assert doc["length"] == len(doc["message"].split())
+
+
+def test_doc_and_batch_generators_agree():
+    options = {"count": 30, "start_at": 5, "timestamps": {"start": 0, "end": 9}}
+    options["timestamps"]["seed"] = 3
+    docs = [json.loads(x) for x in doc_lines(doc_generator, options)]
+    rows = [
+        json.loads(x)
+        for x in doc_lines(doc_generator, options, batch_generator=batch_generator)
+    ]
+    assert docs == rows
+    assert [doc["id"] for doc in docs] == list(range(5, 35))
+    assert {doc["level"] for doc in docs} <= {"INFO", "WARN", "ERROR"}
+
+
+def test_scenarios():
+    plan = definitions.get_plan("cold")
+    assert [x["options"]["start_at"] for x in plan["index_buildlist"]] == [0, 100, 200]
+    assert definitions.mappings()["mappings"]["properties"]["message"] == {
+        "type": "text"
+    }
@@ -0,0 +1,130 @@
+"""Unit tests for the es_testbed.ingest.timestamps module"""
+
+# pylint: disable=C0115,C0116,W0212
+import json
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from es_testbed.exceptions import TestbedMisconfig
+from es_testbed.ingest import doc_lines
+from es_testbed.ingest.timestamps import (
+    DISTRIBUTIONS,
+    TimestampSeries,
+    format_epoch,
+    parse_time,
+    timestamp_series,
+)
+from es_testbed.presets.searchable_test.functions import doc_generator
+
+NOW: float = 1700000000.0
+"""2023-11-14T22:13:20Z"""
+
+DAY: int = 86400
+
+
+def test_format_epoch():
+    assert format_epoch(NOW) == "2023-11-14T22:13:20.000000Z"
+    assert format_epoch(NOW + 0.25) == "2023-11-14T22:13:20.250000Z"
+    assert format_epoch(0.9999999) == "1970-01-01T00:00:00.999999Z"
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        (None, NOW),
+        ("now", NOW),
+        ("now-2d", NOW - 2 * DAY),
+        ("-6h", NOW - 6 * 3600),
+        ("now+30m", NOW + 1800),
+        (12.5, 12.5),
+        ("2023-11-14T22:13:20Z", NOW),
+        ("2023-11-14T22:13:20", NOW),
+    ],
+)
+def test_parse_time(value, expected):
+    assert parse_time(value, NOW) == expected
+
+
+def test_parse_time_bad():
+    with pytest.raises(TestbedMisconfig):
+        parse_time("yesterday", NOW)
+
+
+def test_window_from_rate():
+    series = TimestampSeries(100, end=NOW, rate=10)
+    assert (series.start, series.end) == (NOW - 10, NOW)
+    series = TimestampSeries(100, start=NOW, rate=10)
+    assert (series.start, series.end) == (NOW, NOW + 10)
+
+
+def test_no_window():
+    series = TimestampSeries(3, end=NOW)
+    assert series.strings(0, 3) == [format_epoch(NOW)] * 3
+
+
+def test_bad_settings():
+    with pytest.raises(TestbedMisconfig):
+        TimestampSeries(10, distribution="gaussian")
+    with pytest.raises(TestbedMisconfig):
+        TimestampSeries(10, start=NOW, end=NOW - 1)
+
+
+@pytest.mark.parametrize("distribution", DISTRIBUTIONS)
+def test_series_sorted_and_bounded(distribution):
+    series = TimestampSeries(
+        1000, start=NOW - DAY, end=NOW, distribution=distribution, first=50, seed=7
+    )
+    epochs = [series.epoch(num) for num in range(50, 1050)]
+    assert epochs == sorted(epochs)
+    assert NOW - DAY <= epochs[0] and epochs[-1] <= NOW
+    stamps = series.datetime64(50, 1050)
+    assert stamps.dtype == np.dtype("datetime64[us]")
+    micros = stamps.astype(np.int64)
+    assert np.all(np.abs(micros - np.array(epochs) * 1e6) <= 1)
+
+
+def test_bursty_is_concentrated():
+    series = TimestampSeries(
+        10000, start=NOW - DAY, end=NOW, distribution="bursty", bursts=2, seed=3
+    )
+    hours = np.bincount(
+        ((np.array([series.epoch(n) for n in range(10000)]) - series.start) // 3600)
+        .astype(int)
+        .clip(0, 23),
+        minlength=24,
+    )
+    assert hours.max() > 5 * np.median(hours)
+
+
+def test_diurnal_peaks():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    series = TimestampSeries(
+        24000, start=start, end=start + DAY, distribution="diurnal", peak_hour=14
+    )
+    hours = [int((series.epoch(n) - start) // 3600) for n in range(24000)]
+    counts = np.bincount(hours, minlength=24)
+    assert counts.argmax() in (13, 14)
+    assert counts[2] < counts[14] / 3
+
+
+def test_resolve_is_idempotent():
+    settings = TimestampSeries.resolve({"start": "now-1d"}, 100, 20)
+    assert (settings["count"], settings["first"]) == (100, 20)
+    assert TimestampSeries.resolve(settings, 5, 0) == settings
+    series = timestamp_series(settings, 5, 60)
+    assert series.epoch(60) == TimestampSeries(**settings).epoch(60)
+
+
+def test_doc_lines_resolves_once():
+    options = {"count": 40, "timestamps": {"start": "now-1h", "seed": 1}}
+
+    def stamps(settings):
+        lines = doc_lines(doc_generator, options, settings=settings)
+        return [json.loads(line)["@timestamp"] for line in lines]
+
+    single = stamps(None)
+    assert single == sorted(single)
+    assert len(set(single)) == 40
+    parts = stamps({"processes": 2, "partition_docs": 10})
+    # Both runs resolve "now-1h" separately, so compare the spacing of the docs
+    assert len(parts) == 40 and parts == sorted(parts)
@@ -0,0 +1,96 @@
+"""Unit tests for the es_testbed.waits module"""
+
+# pylint: disable=C0115,C0116,W0212
+from itertools import islice
+from unittest.mock import patch
+import pytest
+from es_testbed.exceptions import TestbedFailure
+from es_testbed.waits import (
+    HISTORY,
+    Backoff,
+    WaitHistory,
+    adaptive,
+    settle,
+    wait_for,
+)
+
+
+@pytest.fixture(autouse=True)
+def history():
+    HISTORY.reset()
+    yield HISTORY
+    HISTORY.reset()
+
+
+def test_backoff_pauses():
+    pauses = list(islice(Backoff(0.1, 2.0, 1.0).pauses(), 6))
+    assert pauses == pytest.approx([0.1, 0.2, 0.4, 0.8, 1.0, 1.0])
+
+
+def test_backoff_expected():
+    pauses = list(islice(Backoff(0.1, 2.0, 5.0, expected=3.0).pauses(), 3))
+    assert pauses == pytest.approx([2.4, 0.1, 0.2])
+    assert next(Backoff(0.1, 2.0, 1.0, expected=30.0).pauses()) == 1.0
+
+
+def test_history():
+    hist = WaitHistory(size=3)
+    assert hist.expected("step") is None
+    for seconds in (1.0, 9.0, 2.0, 3.0):
+        hist.record("step", seconds)
+    assert hist.expected("step") == 3.0  # 1.0 is forgotten
+    hist.record_settle(0.25)
+    hist.record_settle(1.5)
+    assert (hist.waits, hist.settles, hist.saved) == (4, 2, 0.75)
+    assert "saving 0.75 seconds" in hist.summary()
+
+
+def test_wait_for():
+    answers = iter([False, False, True])
+    with patch("es_testbed.waits.time.sleep") as mock_sleep:
+        wait_for(lambda: next(answers), "for a test", key="test")
+    assert [x.args[0] for x in mock_sleep.call_args_list] == pytest.approx([0.1, 0.15])
+    assert HISTORY.expected("test") is not None
+
+
+def test_wait_for_timeout(caplog):
+    with pytest.raises(TestbedFailure):
+        wait_for(lambda: False, "for nothing", timeout=0.05)
+    assert "Condition not met within 0.05 seconds, waiting for nothing" in caplog.text
+
+
+def test_settle():
+    settle(lambda: True, "for a settled test")
+    assert HISTORY.settles == 1 and HISTORY.saved > 0.9
+
+
+class FakeWaiter:
+    """Has what adaptive uses of an es_wait Waiter"""
+
+    def __init__(self, answers, stuck=None):
+        self.pause = 1.0
+        self.answers = iter(answers)
+        self.stuck = iter(stuck or [])
+        self.stuck_count = 0
+        self.pauses = []
+
+    def check(self):
+        self.stuck_count = next(self.stuck, self.stuck_count)
+        return next(self.answers)
+
+    def wait(self):
+        while not self.check():
+            self.pauses.append(self.pause)
+
+
+def test_adaptive():
+    waiter = adaptive(FakeWaiter([False, False, False, True]), key="fake")
+    waiter.wait()
+    assert waiter.pauses == pytest.approx([0.1, 0.15, 0.225])
+    assert HISTORY.waits == 1 and HISTORY.expected("fake") is not None
+
+
+def test_adaptive_stuck_count():
+    waiter = adaptive(FakeWaiter([False, False, False, True], stuck=[0, 1, 2]))
+    waiter.wait()
+    assert waiter.pauses == [0.1, 1.0, 1.0]